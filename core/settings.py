@@ -68,8 +68,52 @@ STATICFILES_DIRS = [
 # Media (uploads de usuários)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'uploads'       # já usamos uploads/ antes no projeto
+# tamanho máximo de cada anexo enviado (crediario/anexos.py)
+CREDIARIO_ANEXO_MAX_BYTES = int(os.getenv('ANEXO_MAX_BYTES', str(20 * 1024 * 1024)))
+# entrega dos anexos pelo servidor web: '' (Django), 'x-sendfile' (Apache)
+# ou 'x-accel-redirect' (nginx, com um location internal em ANEXO_ACCEL_PREFIXO
+# apontando para MEDIA_ROOT)
+CREDIARIO_ANEXO_OFFLOAD = os.getenv('ANEXO_OFFLOAD', '')
+CREDIARIO_ANEXO_ACCEL_PREFIXO = os.getenv('ANEXO_ACCEL_PREFIXO', '/protegido/')
+
+# máximo de pagamentos por requisição em /pagamentos/lote/ (crediario/lote_pagamentos.py)
+CREDIARIO_LOTE_PAGAMENTOS_MAX = int(os.getenv('LOTE_PAGAMENTOS_MAX', '5000'))
+
+# Multa e juros das notas vencidas (crediario/encargos.py, comando
+# acumular_encargos): percentuais da loja
+CREDIARIO_ENCARGOS = {
+    'multa_percentual': os.getenv('MULTA_PERCENTUAL', '2.00'),
+    'juros_mensal_percentual': os.getenv('JUROS_MENSAL_PERCENTUAL', '1.00'),
+    'carencia_dias': int(os.getenv('ENCARGOS_CARENCIA_DIAS', '0')),
+}
+
+# Canais de envio das notificações (ver crediario/notificacoes.py)
+CREDIARIO_CANAIS = {
+    'log': 'crediario.notificacoes.CanalLog',
+}
+
+# Cache (páginas de nota e cliente, ver crediario/cache.py). Padrão em
+# memória local; ex.: CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# e CACHE_LOCATION=redis://127.0.0.1:6379/1
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'crediario'),
+    }
+}
+CREDIARIO_CACHE = 'default'
+CREDIARIO_CACHE_TIMEOUT = int(os.getenv('CREDIARIO_CACHE_TIMEOUT', '300'))
+
+# Métricas por requisição (crediario/metricas.py): METRICAS=True liga o
+# middleware; requisições acima do limite vão para logs/lentas.log e os
+# agregados ficam em /metricas/ (só staff, ou quem mandar METRICAS_TOKEN)
+if os.getenv('METRICAS', 'False') == 'True':
+    MIDDLEWARE.insert(0, 'crediario.metricas.MetricasMiddleware')
+CREDIARIO_METRICAS_LIMITE_MS = int(os.getenv('METRICAS_LIMITE_MS', '500'))
+CREDIARIO_METRICAS_TOKEN = os.getenv('METRICAS_TOKEN', '')
 
 # Opcional: configuração de logging mínima (útil)
+(BASE_DIR / 'logs').mkdir(exist_ok=True)
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -79,25 +123,65 @@ LOGGING = {
             'class': 'logging.FileHandler',
             'filename': str(BASE_DIR / 'logs' / 'django.log'),
         },
+        'lentas': {
+            'class': 'logging.FileHandler',
+            'filename': str(BASE_DIR / 'logs' / 'lentas.log'),
+        },
     },
     'root': {
         'handlers': ['console', 'file'],
         'level': 'INFO',
     },
+    'loggers': {
+        'crediario.lentas': {
+            'handlers': ['lentas'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
 }
 
 # --------------------------
 #     DATABASE CORRETO
 # --------------------------
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': os.getenv("DB_NAME"),
-        'USER': os.getenv("DB_USER"),
-        'PASSWORD': os.getenv("DB_PASS"),
-        'HOST': os.getenv("DB_HOST", "localhost"),
-        'PORT': os.getenv("DB_PORT", "5432"),
+# DB_ENGINE=sqlite roda localmente (testes e benchmarks) sem PostgreSQL
+if os.getenv("DB_ENGINE", "postgresql") == "sqlite":
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv("DB_NAME") or str(BASE_DIR / 'db.sqlite3'),
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv("DB_NAME"),
+            'USER': os.getenv("DB_USER"),
+            'PASSWORD': os.getenv("DB_PASS"),
+            'HOST': os.getenv("DB_HOST", "localhost"),
+            'PORT': os.getenv("DB_PORT", "5432"),
+        }
     }
-}
 
+# Réplicas de leitura (crediario/replicas.py), separadas por vírgula em
+# DB_REPLICAS: host ou host:porta no PostgreSQL (mesmo banco, usuário e
+# senha do primário) ou o arquivo do banco no SQLite. As views de leitura vão
+# para uma delas; quem acabou de escrever fica DB_REPLICA_ATRASO segundos no
+# primário. Nos testes as réplicas espelham o banco default.
+CREDIARIO_REPLICAS = []
+for _i, _destino in enumerate(filter(None, (r.strip() for r in os.getenv('DB_REPLICAS', '').split(','))), 1):
+    _replica = dict(DATABASES['default'], TEST={'MIRROR': 'default'})
+    if _replica['ENGINE'].endswith('sqlite3'):
+        _replica['NAME'] = _destino
+    else:
+        _replica['HOST'], _, _porta = _destino.partition(':')
+        _replica['PORT'] = _porta or _replica['PORT']
+    DATABASES[f'replica_{_i}'] = _replica
+    CREDIARIO_REPLICAS.append(f'replica_{_i}')
+CREDIARIO_REPLICA_ATRASO = int(os.getenv('DB_REPLICA_ATRASO', '5'))
+if CREDIARIO_REPLICAS:
+    DATABASE_ROUTERS = ['crediario.replicas.RoteadorReplicas']
+    # por último: as gravações da sessão, na volta, não contam como escrita
+    MIDDLEWARE.append('crediario.replicas.ReplicaMiddleware')
@@ -1,30 +1,194 @@
 from django.contrib import admin
-from .models import Cliente, Nota, ItemNota, Pagamento, Anexo, Notificacao
+from django.db import transaction
+from .models import (
+    Cliente, Nota, ItemNota, Pagamento, AlocacaoPagamento, Encargo, Anexo, Notificacao, Lancamento, NotaArquivada,
+)
+from .paginacao import PaginadorEstimado
+
+
+def filtro_fixo(campo, titulo, opcoes):
+    """
+    Filtro com opções fixas. O filtro padrão de um CharField sem choices faz
+    SELECT DISTINCT na tabela inteira a cada carga da listagem.
+    """
+    class Filtro(admin.SimpleListFilter):
+        title = titulo
+        parameter_name = campo
+
+        def lookups(self, request, model_admin):
+            return [(valor, valor) for valor in opcoes]
+
+        def queryset(self, request, queryset):
+            if self.value():
+                return queryset.filter(**{campo: self.value()})
+            return queryset
+
+    return Filtro
+
+
+class AdminEscalavel(admin.ModelAdmin):
+    """Listagens sem COUNT(*) completo (ver PaginadorEstimado)."""
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+
+
+class ExclusaoPorObjeto:
+    """
+    "Excluir selecionados" apaga um objeto por vez, pelo delete() do modelo
+    (Pagamento.delete e Nota.delete estornam o livro), tudo numa transação. O
+    padrão do admin é um queryset.delete(), que não passa pelo delete().
+    """
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            for obj in queryset.order_by('pk'):
+                obj.delete()
+
 
 @admin.register(Cliente)
-class ClienteAdmin(admin.ModelAdmin):
-    list_display = ('id', 'nome', 'telefone', 'limite_crediario', 'saldo_devedor')
+class ClienteAdmin(AdminEscalavel):
+    list_display = ('id', 'nome', 'telefone', 'limite_crediario', 'saldo_atual')
     search_fields = ('nome', 'telefone')
+    # (nome, id): ordem total, usa o índice idx_clientes_nome_id
+    ordering = ('nome', 'id')
+    # o saldo é mantido pelo livro de lançamentos, não editável à mão
+    readonly_fields = ('saldo_devedor', 'saldo_lancamento_id')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).com_saldo_atual()
+
+    @admin.display(description='Saldo', ordering='saldo_corrente')
+    def saldo_atual(self, obj):
+        return obj.saldo_atual()
 
 @admin.register(Nota)
-class NotaAdmin(admin.ModelAdmin):
+class NotaAdmin(ExclusaoPorObjeto, AdminEscalavel):
     list_display = ('id', 'cliente', 'data_nota', 'vencimento', 'total', 'status')
     list_filter = ('status',)
+    list_select_related = ('cliente',)
     search_fields = ('cliente__nome', 'numero_nota')
+    autocomplete_fields = ('cliente',)
+    date_hierarchy = 'data_nota'
+    # total vem dos itens e encargos; o resto é mantido pelos pagamentos,
+    # alocações e encargos (ver Nota.CAMPOS_DERIVADOS), não editável à mão
+    readonly_fields = ('total',) + Nota.CAMPOS_DERIVADOS
+
+    def get_deleted_objects(self, objs, request):
+        excluidos, contagem, sem_permissao, protegidos = super().get_deleted_objects(objs, request)
+        # encargos e alocações não se apagam à mão, mas Nota.delete os estorna
+        sem_permissao.discard(Encargo._meta.verbose_name)
+        sem_permissao.discard(AlocacaoPagamento._meta.verbose_name)
+        return excluidos, contagem, sem_permissao, protegidos
 
 @admin.register(ItemNota)
-class ItemNotaAdmin(admin.ModelAdmin):
+class ItemNotaAdmin(AdminEscalavel):
     list_display = ('id', 'nota', 'descricao', 'quantidade', 'preco_unitario', 'subtotal')
+    # Nota.__str__ usa o cliente
+    list_select_related = ('nota__cliente',)
+    autocomplete_fields = ('nota',)
+    ordering = ('-id',)
 
 @admin.register(Pagamento)
-class PagamentoAdmin(admin.ModelAdmin):
+class PagamentoAdmin(ExclusaoPorObjeto, AdminEscalavel):
     list_display = ('id', 'cliente', 'nota', 'valor_pagamento', 'data_pagamento')
+    # nota é opcional (select_related() automático não a segue) e Nota.__str__ usa o cliente
+    list_select_related = ('cliente', 'nota__cliente')
+    autocomplete_fields = ('cliente', 'nota')
+    date_hierarchy = 'data_pagamento'
+
+    def get_deleted_objects(self, objs, request):
+        excluidos, contagem, sem_permissao, protegidos = super().get_deleted_objects(objs, request)
+        # as alocações não se apagam à mão, mas Pagamento.delete as desfaz
+        sem_permissao.discard(AlocacaoPagamento._meta.verbose_name)
+        return excluidos, contagem, sem_permissao, protegidos
+
+@admin.register(AlocacaoPagamento)
+class AlocacaoPagamentoAdmin(AdminEscalavel):
+    list_display = ('id', 'pagamento', 'nota', 'valor', 'criado_em')
+    list_select_related = ('pagamento', 'nota__cliente')
+    ordering = ('-id',)
+
+    # gravadas só pelo motor de alocação (alocacao.py)
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(Encargo)
+class EncargoAdmin(AdminEscalavel):
+    list_display = ('id', 'nota', 'tipo', 'data', 'dias', 'base', 'valor')
+    list_filter = (filtro_fixo('tipo', 'tipo', [Encargo.TIPO_MULTA, Encargo.TIPO_JUROS]),)
+    list_select_related = ('nota__cliente',)
+    date_hierarchy = 'data'
+    ordering = ('-data', '-id')
+
+    # gravados só pelo comando acumular_encargos (encargos.py)
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
 
 @admin.register(Anexo)
-class AnexoAdmin(admin.ModelAdmin):
+class AnexoAdmin(AdminEscalavel):
     list_display = ('id', 'nota', 'arquivo', 'criado_em')
+    list_select_related = ('nota__cliente',)
+    autocomplete_fields = ('nota',)
+    ordering = ('-id',)
 
 @admin.register(Notificacao)
-class NotificacaoAdmin(admin.ModelAdmin):
+class NotificacaoAdmin(AdminEscalavel):
     list_display = ('id', 'tipo', 'cliente', 'nota', 'status', 'data_agendada', 'enviado_em')
-    list_filter = ('status', 'tipo')
\ No newline at end of file
+    list_filter = (
+        filtro_fixo('status', 'status', [
+            Notificacao.STATUS_PENDENTE, Notificacao.STATUS_PROCESSANDO,
+            Notificacao.STATUS_ENVIADA, Notificacao.STATUS_FALHOU,
+        ]),
+        filtro_fixo('tipo', 'tipo', [Notificacao.TIPO_VENCIMENTO]),
+    )
+    list_select_related = ('cliente', 'nota__cliente')
+    autocomplete_fields = ('cliente', 'nota')
+    date_hierarchy = 'data_agendada'
+    ordering = ('-data_agendada', '-id')
+
+@admin.register(Lancamento)
+class LancamentoAdmin(AdminEscalavel):
+    list_display = ('id', 'cliente', 'tipo', 'valor', 'nota', 'pagamento', 'criado_em')
+    list_filter = (
+        filtro_fixo('tipo', 'tipo', [
+            Lancamento.TIPO_NOTA, Lancamento.TIPO_PAGAMENTO,
+            Lancamento.TIPO_AJUSTE, Lancamento.TIPO_IMPORTACAO, Lancamento.TIPO_ENCARGO,
+        ]),
+    )
+    list_select_related = ('cliente', 'nota__cliente', 'pagamento')
+    ordering = ('-id',)
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(NotaArquivada)
+class NotaArquivadaAdmin(AdminEscalavel):
+    list_display = ('id', 'cliente', 'data_nota', 'total', 'arquivada_em')
+    list_select_related = ('cliente',)
+    search_fields = ('numero_nota',)
+    ordering = ('-data_nota', '-id')
+
+    # gravadas só pelo comando arquivar_notas (arquivo.py)
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,176 @@
+# crediario/alocacao.py
+"""
+Alocação dos pagamentos feitos ao cliente (Pagamento sem nota) entre as
+notas em aberto.
+
+O crédito ainda não alocado do cliente é distribuído pelas notas abertas ou
+parciais do vencimento mais antigo para o mais novo (sem vencimento por
+último, depois data_nota e id). Tudo acontece numa transação com um único
+lock no cliente: uma consulta para o crédito, uma para as notas (travadas),
+um bulk_create das alocações e um bulk_update das notas — em vez de um
+Pagamento.save() por nota, cada um com suas agregações.
+
+O cliente é sempre travado antes das notas, na mesma ordem de
+criar_nota_com_itens, para não haver deadlock entre os dois caminhos.
+"""
+from decimal import Decimal
+from django.db import models, transaction
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Round
+from django.utils import timezone
+from .models import AlocacaoPagamento, Cliente, Nota, Pagamento
+
+CENTAVOS = Decimal('0.01')
+DINHEIRO = models.DecimalField(max_digits=12, decimal_places=2)
+ZERO = Value(Decimal('0.00'), output_field=DINHEIRO)
+CAMPOS_NOTA = ['total_pago', 'saldo_restante', 'status', 'atualizado_em']
+
+
+def _travar_cliente(cliente_id):
+    list(Cliente.objects.select_for_update().filter(pk=cliente_id).order_by().values_list('pk'))
+
+
+def creditos_por_cliente(cliente_ids):
+    """Como creditos_disponiveis, para vários clientes: {cliente_id: [(pagamento_id, disponível)]}."""
+    alocado = (
+        AlocacaoPagamento.objects.filter(pagamento=OuterRef('pk'))
+        .order_by()
+        .values('pagamento')
+        .annotate(s=Sum('valor'))
+        .values('s')
+    )
+    linhas = (
+        Pagamento.objects.filter(cliente_id__in=cliente_ids, nota__isnull=True)
+        .annotate(alocado=Coalesce(Subquery(alocado, output_field=DINHEIRO), ZERO))
+        # Round: no SQLite os decimais viram REAL e a soma deixa resíduo
+        .filter(valor_pagamento__gt=Round(F('alocado'), 2))
+        .order_by('cliente_id', 'data_pagamento', 'id')
+        .values_list('cliente_id', 'pk', 'valor_pagamento', 'alocado')
+    )
+    creditos = {}
+    for cliente_id, pk, valor, alocado in linhas:
+        creditos.setdefault(cliente_id, []).append((pk, (valor - alocado).quantize(CENTAVOS)))
+    return creditos
+
+
+def creditos_disponiveis(cliente_id):
+    """
+    Pagamentos sem nota do cliente que ainda têm valor a alocar, como
+    [(pagamento_id, disponível)], do mais antigo para o mais novo.
+    """
+    return creditos_por_cliente([cliente_id]).get(cliente_id, [])
+
+
+def notas_em_aberto(cliente_ids, incluir=()):
+    """
+    Notas abertas/parciais dos clientes (mais as de pk em `incluir`),
+    travadas, como {cliente_id: [notas na ordem de alocação]}.
+    """
+    notas = (
+        Nota.objects.select_for_update()
+        .filter(
+            models.Q(cliente_id__in=cliente_ids, status__in=[Nota.STATUS_ABERTA, Nota.STATUS_PARCIAL])
+            | models.Q(pk__in=incluir)
+        )
+        .order_by('cliente_id', F('vencimento').asc(nulls_last=True), 'data_nota', 'id')
+        .only('id', 'cliente_id', 'vencimento', 'data_nota', 'total', 'total_pago', 'saldo_restante',
+              'status', 'atualizado_em')
+    )
+    por_cliente = {}
+    for nota in notas:
+        por_cliente.setdefault(nota.cliente_id, []).append(nota)
+    return por_cliente
+
+
+def aplicar(nota, valor, agora):
+    """Soma `valor` ao total pago da nota em memória (gravar com bulk_update em CAMPOS_NOTA)."""
+    nota.total_pago = ((nota.total_pago or Decimal('0.00')) + valor).quantize(CENTAVOS)
+    nota.saldo_restante = (nota.total or Decimal('0.00')) - nota.total_pago
+    nota.status = Nota.status_por_pagamento(nota.total, nota.total_pago)
+    nota.atualizado_em = agora
+
+
+def distribuir(creditos, notas, agora, alteradas):
+    """
+    Distribui os créditos [(pagamento_id, valor)] pelas `notas` (já na ordem
+    de alocação), em memória. Devolve as AlocacaoPagamento a gravar e
+    acumula em `alteradas` (pk -> nota) as notas a atualizar.
+    """
+    alocacoes = []
+    abertas = (n for n in notas if n.status in (Nota.STATUS_ABERTA, Nota.STATUS_PARCIAL))
+    nota = next(abertas, None)
+    for pagamento_id, disponivel in creditos:
+        while disponivel > 0 and nota is not None:
+            falta = (nota.total or Decimal('0.00')) - (nota.total_pago or Decimal('0.00'))
+            parte = min(disponivel, falta)
+            if parte > 0:
+                alocacoes.append(AlocacaoPagamento(pagamento_id=pagamento_id, nota_id=nota.pk, valor=parte))
+                aplicar(nota, parte, agora)
+                alteradas[nota.pk] = nota
+                disponivel -= parte
+            if nota.status == Nota.STATUS_PAGA or parte <= 0:
+                nota = next(abertas, None)
+        if nota is None:
+            break
+    return alocacoes
+
+
+def alocar_pagamentos(cliente_id, travado=False):
+    """
+    Distribui o crédito não alocado do cliente pelas notas em aberto e
+    devolve as alocações criadas. O que sobrar (pagamento maior que a
+    dívida) fica como crédito e é alocado quando surgir nota nova (ver
+    criar_nota_com_itens e o comando alocar_pagamentos). `travado=True`
+    quando quem chama já travou o cliente nesta transação.
+    """
+    with transaction.atomic():
+        if not travado:
+            _travar_cliente(cliente_id)
+        creditos = creditos_disponiveis(cliente_id)
+        if not creditos:
+            return []
+
+        alteradas = {}
+        notas = notas_em_aberto([cliente_id]).get(cliente_id, [])
+        alocacoes = distribuir(creditos, notas, timezone.now(), alteradas)
+        AlocacaoPagamento.objects.bulk_create(alocacoes)
+        Nota.objects.bulk_update(list(alteradas.values()), CAMPOS_NOTA)
+    return alocacoes
+
+
+def desfazer_alocacoes(pagamento_ids):
+    """
+    Remove as alocações dos pagamentos e devolve os valores às notas (um
+    bulk_update). Deve ser chamada com o cliente já travado, dentro da
+    transação de quem vai editar ou apagar os pagamentos.
+    """
+    somas = dict(
+        AlocacaoPagamento.objects.filter(pagamento_id__in=pagamento_ids)
+        .order_by()
+        .values('nota_id')
+        .annotate(s=Sum('valor'))
+        .values_list('nota_id', 's')
+    )
+    if not somas:
+        return 0
+    agora = timezone.now()
+    notas = list(Nota.objects.select_for_update().filter(pk__in=list(somas)).order_by('pk'))
+    for nota in notas:
+        aplicar(nota, -somas[nota.pk], agora)
+    Nota.objects.bulk_update(notas, CAMPOS_NOTA)
+    AlocacaoPagamento.objects.filter(pagamento_id__in=pagamento_ids).delete()
+    return len(notas)
+
+
+def clientes_a_alocar():
+    """Ids dos clientes com pagamentos sem nota e alguma nota em aberto."""
+    return (
+        Cliente.objects.filter(
+            models.Exists(Pagamento.objects.filter(cliente=OuterRef('pk'), nota__isnull=True)),
+            models.Exists(Nota.objects.filter(
+                cliente=OuterRef('pk'), status__in=[Nota.STATUS_ABERTA, Nota.STATUS_PARCIAL]
+            )),
+        )
+        .order_by('pk')
+        .values_list('pk', flat=True)
+    )
@@ -0,0 +1,238 @@
+# crediario/anexos.py
+"""
+Upload de anexos (fotos das notas) em streaming.
+
+AnexoUploadHandler recebe o arquivo em blocos e, numa passada só, grava num
+arquivo temporário, calcula o SHA-256 e o tamanho e guarda os primeiros
+bytes para identificar o tipo. No fim o arquivo vai para um caminho derivado
+do conteúdo (notas/ab/cd/<sha256>.<ext>): se já existir, o temporário é
+descartado e os dois anexos apontam para o mesmo arquivo. A memória usada é
+um bloco por vez, qualquer que seja o tamanho do arquivo.
+
+Como o handler precisa ser instalado antes de o corpo da requisição ser lido,
+a view usa o par csrf_exempt + csrf_protect (ver views.anexo_upload).
+
+resposta_de_arquivo() entrega anexos e miniaturas (geradas pelo comando
+gerar_miniaturas) com Range, ETag e, opcionalmente, X-Sendfile ou
+X-Accel-Redirect.
+"""
+import hashlib
+import os
+import tempfile
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+TAMANHO_BLOCO = 64 * 1024
+BYTES_ASSINATURA = 32
+
+# (assinatura, deslocamento, mime, extensão)
+ASSINATURAS = [
+    (b'\xff\xd8\xff', 0, 'image/jpeg', '.jpg'),
+    (b'\x89PNG\r\n\x1a\n', 0, 'image/png', '.png'),
+    (b'GIF87a', 0, 'image/gif', '.gif'),
+    (b'GIF89a', 0, 'image/gif', '.gif'),
+    (b'%PDF-', 0, 'application/pdf', '.pdf'),
+    (b'WEBP', 8, 'image/webp', '.webp'),
+    (b'ftypheic', 4, 'image/heic', '.heic'),
+    (b'ftypmif1', 4, 'image/heic', '.heic'),
+]
+MIME_PERMITIDOS = {'image/jpeg', 'image/png', 'image/gif', 'image/webp', 'image/heic', 'application/pdf'}
+
+
+def identificar_tipo(inicio):
+    """(mime, extensão) pelos primeiros bytes do arquivo (não confia no nome nem no Content-Type)."""
+    for assinatura, deslocamento, mime, extensao in ASSINATURAS:
+        if inicio[deslocamento:deslocamento + len(assinatura)] == assinatura:
+            return mime, extensao
+    return 'application/octet-stream', ''
+
+
+def caminho_do_conteudo(sha256, extensao):
+    return f'notas/{sha256[:2]}/{sha256[2:4]}/{sha256}{extensao}'
+
+
+def _max_bytes():
+    return getattr(settings, 'CREDIARIO_ANEXO_MAX_BYTES', 20 * 1024 * 1024)
+
+
+class ArquivoRecebido:
+    """Resultado de um upload: já está no storage em `nome`."""
+
+    def __init__(self, nome, nome_original, sha256, tamanho, mime, duplicado):
+        self.nome = nome
+        self.nome_original = nome_original
+        self.sha256 = sha256
+        self.tamanho = tamanho
+        self.mime = mime
+        self.duplicado = duplicado
+
+
+class AnexoUploadHandler(FileUploadHandler):
+    chunk_size = TAMANHO_BLOCO
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.erros = []
+        self._temporario = None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        pasta = default_storage.path('notas/.tmp')
+        os.makedirs(pasta, exist_ok=True)
+        # mesma partição do destino: o os.replace final é atômico
+        self._temporario = tempfile.NamedTemporaryFile(dir=pasta, delete=False)
+        self._hash = hashlib.sha256()
+        self._tamanho = 0
+        self._inicio = b''
+
+    def receive_data_chunk(self, raw_data, start):
+        self._tamanho += len(raw_data)
+        if self._tamanho > _max_bytes():
+            self._descartar()
+            self.erros.append(f'{self.file_name}: maior que o limite de {_max_bytes()} bytes')
+            raise SkipFile
+        if len(self._inicio) < BYTES_ASSINATURA:
+            self._inicio += raw_data[:BYTES_ASSINATURA - len(self._inicio)]
+        self._hash.update(raw_data)
+        self._temporario.write(raw_data)
+        # devolve None: nenhum outro handler precisa do bloco
+
+    def file_complete(self, file_size):
+        self._temporario.close()
+        mime, extensao = identificar_tipo(self._inicio)
+        if mime not in MIME_PERMITIDOS:
+            self._descartar()
+            self.erros.append(f'{self.file_name}: tipo de arquivo não aceito')
+            return None
+
+        sha256 = self._hash.hexdigest()
+        nome = caminho_do_conteudo(sha256, extensao)
+        destino = default_storage.path(nome)
+        duplicado = os.path.exists(destino)
+        if duplicado:
+            os.unlink(self._temporario.name)
+        else:
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            os.chmod(self._temporario.name, 0o644)
+            os.replace(self._temporario.name, destino)
+        self._temporario = None
+        return ArquivoRecebido(nome, self.file_name, sha256, file_size, mime, duplicado)
+
+    def upload_interrupted(self):
+        self._descartar()
+
+    def _descartar(self):
+        if self._temporario is not None:
+            self._temporario.close()
+            try:
+                os.unlink(self._temporario.name)
+            except FileNotFoundError:
+                pass
+            self._temporario = None
+
+
+# --- Entrega dos arquivos ---
+
+def caminho_da_miniatura(sha256):
+    return f'miniaturas/{sha256[:2]}/{sha256[2:4]}/{sha256}.jpg'
+
+
+def _intervalo(cabecalho, tamanho):
+    """
+    (inicio, fim) inclusivo de um cabeçalho Range de um único intervalo;
+    None para ignorar (ausente, inválido ou vários intervalos: responde
+    inteiro) e False se for insatisfazível.
+    """
+    if not cabecalho or not cabecalho.startswith('bytes=') or ',' in cabecalho:
+        return None
+    inicio, _, fim = cabecalho[6:].strip().partition('-')
+    try:
+        if inicio == '':
+            # sufixo: os últimos N bytes
+            n = int(fim)
+            if n <= 0:
+                return False
+            return max(tamanho - n, 0), tamanho - 1
+        inicio = int(inicio)
+        fim = int(fim) if fim else tamanho - 1
+    except ValueError:
+        return None
+    if inicio >= tamanho:
+        return False
+    if inicio > fim:
+        return None
+    return inicio, min(fim, tamanho - 1)
+
+
+def _ler(caminho, inicio, quantidade):
+    with open(caminho, 'rb') as f:
+        f.seek(inicio)
+        while quantidade > 0:
+            bloco = f.read(min(TAMANHO_BLOCO, quantidade))
+            if not bloco:
+                break
+            quantidade -= len(bloco)
+            yield bloco
+
+
+def resposta_de_arquivo(request, nome, content_type, etag=None):
+    """
+    Entrega o arquivo `nome` do storage com ETag/If-None-Match, Last-Modified,
+    Range/If-Range e, se configurado, repassando o envio ao servidor web
+    (CREDIARIO_ANEXO_OFFLOAD = 'x-sendfile' ou 'x-accel-redirect').
+    `etag` sem aspas; quando é o SHA-256 o conteúdo nunca muda e a resposta
+    pode ficar em cache para sempre.
+    """
+    caminho = default_storage.path(nome)
+    try:
+        info = os.stat(caminho)
+    except FileNotFoundError:
+        raise Http404('Arquivo não encontrado')
+    imutavel = etag is not None
+    etag = quote_etag(etag or f'{info.st_size:x}-{int(info.st_mtime):x}')
+    ultima_modificacao = int(info.st_mtime)
+
+    nao_modificado = get_conditional_response(request, etag=etag, last_modified=ultima_modificacao)
+    if nao_modificado is not None:
+        return nao_modificado
+
+    offload = getattr(settings, 'CREDIARIO_ANEXO_OFFLOAD', '')
+    if offload:
+        # o servidor web lê o arquivo e trata o Range
+        response = HttpResponse(content_type=content_type)
+        if offload == 'x-accel-redirect':
+            prefixo = getattr(settings, 'CREDIARIO_ANEXO_ACCEL_PREFIXO', '/protegido/')
+            response['X-Accel-Redirect'] = prefixo + nome
+        else:
+            response['X-Sendfile'] = caminho
+    else:
+        intervalo = _intervalo(request.headers.get('Range'), info.st_size)
+        se_intervalo = request.headers.get('If-Range')
+        if intervalo and se_intervalo and se_intervalo != etag:
+            intervalo = None  # o cliente tem outra versão: manda inteiro
+        if intervalo is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{info.st_size}'
+            return response
+        if intervalo:
+            inicio, fim = intervalo
+            response = StreamingHttpResponse(_ler(caminho, inicio, fim - inicio + 1),
+                                             status=206, content_type=content_type)
+            response['Content-Range'] = f'bytes {inicio}-{fim}/{info.st_size}'
+            response['Content-Length'] = str(fim - inicio + 1)
+        else:
+            response = FileResponse(open(caminho, 'rb'), content_type=content_type)
+            response['Content-Length'] = str(info.st_size)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(ultima_modificacao)
+    if imutavel:
+        patch_cache_control(response, private=True, max_age=365 * 24 * 3600, immutable=True)
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -0,0 +1,187 @@
+# crediario/api.py
+"""
+API JSON somente leitura (app de cobrança), com views assíncronas.
+
+    GET /api/<recurso>/            lista paginada por cursor ({results, proximo})
+    GET /api/<recurso>/?formato=ndjson   todas as linhas em streaming, uma por linha
+    GET /api/<recurso>/<id>/       um registro
+
+Recursos: clientes, notas, itens e pagamentos. `?fields=id,total` limita as
+colunas (só elas saem do banco, via .values()); os filtros de cada recurso
+estão em RECURSOS. As consultas usam o ORM assíncrono (aiterator, afirst):
+servido por core/asgi.py, um worker atende muitos clientes lentos sem
+prender uma thread por conexão.
+"""
+import json
+from dataclasses import dataclass, field
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_date
+from django.views.decorators.http import require_safe
+from .models import Cliente, ItemNota, Nota, Pagamento
+from .paginacao import CursorInvalido, apaginar, limite_da_requisicao
+from .replicas import somente_leitura
+
+TAMANHO_LOTE = 2000
+COMPACTO = {'separators': (',', ':'), 'ensure_ascii': False}
+
+
+class ErroDaApi(ValueError):
+    pass
+
+
+def _data(valor):
+    data = parse_date(valor)
+    if data is None:
+        raise ValueError(valor)
+    return data
+
+
+@dataclass(frozen=True)
+class Recurso:
+    consulta: object
+    # nome na API -> campo (ou anotação) do ORM
+    campos: dict
+    # ordem da paginação: termina no id e segue um índice
+    ordem: list
+    # parâmetro -> (lookup, conversão)
+    filtros: dict = field(default_factory=dict)
+
+
+RECURSOS = {
+    'clientes': Recurso(
+        lambda: Cliente.objects.com_saldo_atual(),
+        {
+            'id': 'id', 'nome': 'nome', 'telefone': 'telefone', 'endereco': 'endereco',
+            'limite_crediario': 'limite_crediario', 'saldo': 'saldo_corrente', 'atualizado_em': 'atualizado_em',
+        },
+        ['nome', 'id'],
+        {'q': ('nome__istartswith', str), 'telefone': ('telefone', str)},
+    ),
+    'notas': Recurso(
+        lambda: Nota.objects.all(),
+        {
+            'id': 'id', 'cliente_id': 'cliente_id', 'numero_nota': 'numero_nota', 'data_nota': 'data_nota',
+            'vencimento': 'vencimento', 'total': 'total', 'total_pago': 'total_pago',
+            'saldo_restante': 'saldo_restante', 'total_encargos': 'total_encargos', 'status': 'status',
+            'atualizado_em': 'atualizado_em',
+        },
+        ['-data_nota', '-id'],
+        {
+            'cliente': ('cliente_id', int), 'status': ('status', str),
+            'de': ('data_nota__gte', _data), 'ate': ('data_nota__lte', _data),
+        },
+    ),
+    'itens': Recurso(
+        lambda: ItemNota.objects.all(),
+        {
+            'id': 'id', 'nota_id': 'nota_id', 'descricao': 'descricao', 'quantidade': 'quantidade',
+            'preco_unitario': 'preco_unitario', 'subtotal': 'subtotal',
+        },
+        ['id'],
+        {'nota': ('nota_id', int), 'cliente': ('nota__cliente_id', int)},
+    ),
+    'pagamentos': Recurso(
+        lambda: Pagamento.objects.all(),
+        {
+            'id': 'id', 'cliente_id': 'cliente_id', 'nota_id': 'nota_id', 'valor_pagamento': 'valor_pagamento',
+            'data_pagamento': 'data_pagamento', 'metodo': 'metodo',
+        },
+        ['-data_pagamento', '-id'],
+        {
+            'cliente': ('cliente_id', int), 'nota': ('nota_id', int),
+            'de': ('data_pagamento__gte', _data), 'ate': ('data_pagamento__lte', _data),
+        },
+    ),
+}
+
+
+def _recurso(nome):
+    try:
+        return RECURSOS[nome]
+    except KeyError:
+        raise Http404('Recurso inexistente')
+
+
+def _campos(recurso, request):
+    pedidos = [c.strip() for c in request.GET.get('fields', '').split(',') if c.strip()]
+    if not pedidos:
+        return list(recurso.campos)
+    invalidos = [c for c in pedidos if c not in recurso.campos]
+    if invalidos:
+        raise ErroDaApi(f'campos inválidos: {", ".join(invalidos)} (disponíveis: {", ".join(recurso.campos)})')
+    return list(dict.fromkeys(pedidos))
+
+
+def _consulta(recurso, request, campos, filtrar=True):
+    qs = recurso.consulta()
+    if filtrar:
+        for parametro, (lookup, converter) in recurso.filtros.items():
+            valor = request.GET.get(parametro)
+            if not valor:
+                continue
+            try:
+                qs = qs.filter(**{lookup: converter(valor)})
+            except ValueError:
+                raise ErroDaApi(f'valor inválido em {parametro!r}: {valor!r}')
+    # a ordem entra no SELECT para montar o cursor, mesmo se não foi pedida
+    orm = dict.fromkeys([recurso.campos[c] for c in campos] + [c.lstrip('-') for c in recurso.ordem])
+    return qs.values(*orm)
+
+
+def _serializar(recurso, campos, linha):
+    return {nome: linha[recurso.campos[nome]] for nome in campos}
+
+
+async def _ndjson(qs, recurso, campos):
+    async for linha in qs.aiterator(chunk_size=TAMANHO_LOTE):
+        yield json.dumps(_serializar(recurso, campos, linha), cls=DjangoJSONEncoder, **COMPACTO) + '\n'
+
+
+def _erro(mensagem, status=400):
+    return JsonResponse({'erro': mensagem}, status=status, json_dumps_params=COMPACTO)
+
+
+@require_safe
+@somente_leitura()
+async def listar(request, recurso):
+    nome, recurso = recurso, _recurso(recurso)
+    try:
+        campos = _campos(recurso, request)
+        qs = _consulta(recurso, request, campos)
+    except ErroDaApi as e:
+        return _erro(str(e))
+
+    if request.GET.get('formato') == 'ndjson':
+        qs = qs.order_by(*recurso.ordem)
+        # o banco é fixado aqui: as linhas são lidas depois que a view terminou
+        response = StreamingHttpResponse(
+            _ndjson(qs.using(qs.db), recurso, campos), content_type='application/x-ndjson; charset=utf-8'
+        )
+        response['Content-Disposition'] = f'inline; filename="{nome}.ndjson"'
+        return response
+
+    try:
+        pagina = await apaginar(
+            qs, recurso.ordem, request.GET.get('cursor'), limite_da_requisicao(request), estrito=True,
+        )
+    except CursorInvalido as e:
+        return _erro(str(e))
+    return JsonResponse(
+        {'results': [_serializar(recurso, campos, l) for l in pagina.itens], 'proximo': pagina.proximo_cursor},
+        json_dumps_params=COMPACTO,
+    )
+
+
+@require_safe
+@somente_leitura()
+async def detalhe(request, recurso, pk):
+    recurso = _recurso(recurso)
+    try:
+        campos = _campos(recurso, request)
+    except ErroDaApi as e:
+        return _erro(str(e))
+    linha = await _consulta(recurso, request, campos, filtrar=False).filter(pk=pk).afirst()
+    if linha is None:
+        return _erro('não encontrado', status=404)
+    return JsonResponse(_serializar(recurso, campos, linha), json_dumps_params=COMPACTO)
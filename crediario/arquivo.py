@@ -0,0 +1,141 @@
+# crediario/arquivo.py
+"""
+Arquivamento de notas pagas antigas (comando arquivar_notas).
+
+Notas pagas com data_nota anterior ao corte saem das tabelas quentes, com
+itens, anexos, encargos, pagamentos, alocações e notificações, para as
+tabelas *_arquivo (ver os modelos ...Arquivada/...Arquivado), com os mesmos
+ids. Assim as tabelas e os índices usados no dia a dia (idx_notas_status_data,
+idx_notas_vencimento, fila de notificações...) acompanham só a carteira
+ativa.
+
+O trabalho é feito por grupos de clientes, cada grupo numa transação: trava
+os clientes (em ordem de id, como lote_pagamentos) e as notas, copia as
+linhas com INSERT ... SELECT e apaga as originais. O saldo dos clientes não
+muda: uma nota paga e os pagamentos que a quitaram somam zero, e o livro de
+lançamentos não é tocado (só perde a referência à nota/pagamento apagados).
+
+Um pagamento sem nota só vai para o arquivo se foi todo alocado e todas as
+notas em que caiu vão junto; senão, essas notas ficam nas tabelas quentes.
+"""
+from decimal import Decimal
+from django.db import DEFAULT_DB_ALIAS, connections, models, transaction
+from django.db.models import Value
+from django.utils import timezone
+from .models import (
+    AlocacaoArquivada, AlocacaoPagamento, Anexo, AnexoArquivado, Cliente, Encargo, EncargoArquivado, ItemNota,
+    ItemNotaArquivado, Nota, NotaArquivada, Notificacao, NotificacaoArquivada, Pagamento, PagamentoArquivado,
+)
+
+CLIENTES_POR_TRANSACAO = 200
+
+
+def notas_arquivaveis(corte):
+    """Notas pagas com data_nota anterior a `corte` (antes da regra dos pagamentos sem nota)."""
+    return Nota.objects.filter(status=Nota.STATUS_PAGA, data_nota__lt=corte)
+
+
+def _copiar(origem, destino, **extras):
+    """INSERT INTO <tabela de destino> SELECT ... das linhas de `origem`, sem passar pelo Python."""
+    campos = [f.attname for f in destino._meta.concrete_fields]
+    colunas = ', '.join(connections[DEFAULT_DB_ALIAS].ops.quote_name(f.column) for f in destino._meta.concrete_fields)
+    consulta = origem.order_by().annotate(**extras).values_list(*campos)
+    sql, params = consulta.query.sql_with_params()
+    with connections[DEFAULT_DB_ALIAS].cursor() as c:
+        c.execute(f'INSERT INTO {destino._meta.db_table} ({colunas}) {sql}', params)
+        return c.rowcount
+
+
+def _fora_do_arquivo(notas, alocacoes):
+    """
+    Tira de `notas` (set de ids) as que receberam parte de um pagamento sem
+    nota que não pode ir junto: não foi todo alocado ou caiu também em nota
+    que fica. Repete até estabilizar (tirar uma nota pode prender outro
+    pagamento). Devolve os ids dos pagamentos sem nota que vão para o arquivo.
+    """
+    por_pagamento = {}
+    for pagamento_id, nota_id, valor, valor_pagamento in alocacoes:
+        alocado, destinos, _ = por_pagamento.get(pagamento_id, (Decimal('0.00'), set(), valor_pagamento))
+        destinos.add(nota_id)
+        por_pagamento[pagamento_id] = (alocado + valor, destinos, valor_pagamento)
+
+    presos = set()
+    mudou = True
+    while mudou:
+        mudou = False
+        for pagamento_id, (alocado, destinos, valor_pagamento) in por_pagamento.items():
+            if pagamento_id in presos:
+                continue
+            if alocado != valor_pagamento or not destinos <= notas:
+                presos.add(pagamento_id)
+                notas -= destinos
+                mudou = True
+    return set(por_pagamento) - presos
+
+
+def _arquivar_clientes(cliente_ids, corte, agora):
+    """Arquiva as notas de um grupo de clientes numa transação. Devolve {tabela: linhas}."""
+    with transaction.atomic():
+        # trava: clientes (em ordem de id) antes das notas, como nos pagamentos
+        list(Cliente.objects.select_for_update().filter(pk__in=cliente_ids).order_by('pk').values_list('pk', flat=True))
+        notas = set(
+            notas_arquivaveis(corte).filter(cliente_id__in=cliente_ids)
+            .select_for_update().order_by('pk').values_list('pk', flat=True)
+        )
+        alocacoes = (
+            AlocacaoPagamento.objects.filter(
+                pagamento_id__in=AlocacaoPagamento.objects.filter(nota_id__in=notas).values('pagamento_id')
+            )
+            .order_by()
+            .values_list('pagamento_id', 'nota_id', 'valor', 'pagamento__valor_pagamento')
+        )
+        sem_nota = _fora_do_arquivo(notas, list(alocacoes))
+        if not notas:
+            return {}
+
+        notas = sorted(notas)
+        pagamentos = Pagamento.objects.filter(models.Q(nota_id__in=notas) | models.Q(pk__in=sem_nota))
+        linhas = {
+            'notas': _copiar(
+                Nota.objects.filter(pk__in=notas), NotaArquivada,
+                arquivada_em=Value(agora, output_field=models.DateTimeField()),
+            ),
+            'itens': _copiar(ItemNota.objects.filter(nota_id__in=notas), ItemNotaArquivado),
+            'anexos': _copiar(Anexo.objects.filter(nota_id__in=notas), AnexoArquivado),
+            'encargos': _copiar(Encargo.objects.filter(nota_id__in=notas), EncargoArquivado),
+            'pagamentos': _copiar(pagamentos, PagamentoArquivado),
+            'alocacoes': _copiar(AlocacaoPagamento.objects.filter(nota_id__in=notas), AlocacaoArquivada),
+            'notificacoes': _copiar(Notificacao.objects.filter(nota_id__in=notas), NotificacaoArquivada),
+        }
+
+        # notificações e pagamentos antes (nas notas seriam só desvinculados);
+        # itens, anexos, encargos e alocações vão em cascata com as notas, e
+        # os sinais de Nota/Pagamento invalidam o cache das páginas
+        Notificacao.objects.filter(nota_id__in=notas).delete()
+        pagamentos.delete()
+        Nota.objects.filter(pk__in=notas).delete()
+    return linhas
+
+
+def arquivar_notas(corte, clientes_por_transacao=CLIENTES_POR_TRANSACAO, progresso=None):
+    """
+    Arquiva as notas pagas com data_nota anterior a `corte`, em transações
+    de `clientes_por_transacao` clientes. Devolve o total de linhas movidas
+    por tabela.
+    """
+    agora = timezone.now()
+    totais = dict.fromkeys(
+        ['notas', 'itens', 'anexos', 'encargos', 'pagamentos', 'alocacoes', 'notificacoes'], 0
+    )
+    clientes = notas_arquivaveis(corte).order_by('cliente_id').values_list('cliente_id', flat=True).distinct()
+    ultimo = 0
+    while True:
+        grupo = list(clientes.filter(cliente_id__gt=ultimo)[:clientes_por_transacao])
+        if not grupo:
+            break
+        ultimo = grupo[-1]
+        for tabela, n in _arquivar_clientes(grupo, corte, agora).items():
+            totais[tabela] += n
+        if progresso:
+            progresso(totais)
+    return totais
@@ -0,0 +1,96 @@
+# crediario/cache.py
+"""
+Cache dos trechos renderizados de nota_detail e cliente_detail.
+
+Cada entrada guarda (versão, html) numa chave por objeto. A versão vem de
+uma consulta curta pela PK (atualizado_em e afins): se não bate, a entrada
+é ignorada e refeita. Isso cobre até as escritas em massa (queryset.update)
+que atualizam atualizado_em. O que não mexe em atualizado_em (itens, anexos,
+pagamentos editados pelo admin...) invalida a entrada pelos sinais em
+signals.py ou por chamadas explícitas a invalidar_notas/invalidar_clientes.
+
+O backend é o cache CREDIARIO_CACHE (padrão 'default') de settings.CACHES.
+Acertos e falhas são contados no próprio cache (ver estatisticas()).
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+NOTA = 'nota'
+CLIENTE = 'cliente'
+TIPOS = (NOTA, CLIENTE)
+
+PREFIXO = 'crediario'
+
+
+def _cache():
+    return caches[getattr(settings, 'CREDIARIO_CACHE', 'default')]
+
+
+def _timeout():
+    return getattr(settings, 'CREDIARIO_CACHE_TIMEOUT', 300)
+
+
+def _chave(tipo, pk):
+    return f'{PREFIXO}:{tipo}:{pk}'
+
+
+def _chave_contador(tipo, evento):
+    return f'{PREFIXO}:contador:{tipo}:{evento}'
+
+
+def _contar(tipo, evento):
+    cache = _cache()
+    chave = _chave_contador(tipo, evento)
+    # add() só grava se não existir; incr() falha se a chave sumiu
+    cache.add(chave, 0, None)
+    try:
+        cache.incr(chave)
+    except ValueError:
+        cache.set(chave, 1, None)
+
+
+def obter(tipo, pk, versao, gerar):
+    """
+    Devolve o trecho em cache de (tipo, pk) se a versão bate; senão chama
+    gerar(), guarda o resultado com a versão atual e o devolve.
+    """
+    cache = _cache()
+    chave = _chave(tipo, pk)
+    entrada = cache.get(chave)
+    if entrada is not None and entrada[0] == versao:
+        _contar(tipo, 'hits')
+        return entrada[1]
+    _contar(tipo, 'misses')
+    valor = gerar()
+    cache.set(chave, (versao, valor), _timeout())
+    return valor
+
+
+def invalidar(tipo, pks):
+    """Remove as entradas de `pks` depois do commit da transação atual."""
+    chaves = [_chave(tipo, pk) for pk in set(pks) if pk is not None]
+    if chaves:
+        transaction.on_commit(lambda: _cache().delete_many(chaves))
+
+
+def invalidar_notas(pks):
+    invalidar(NOTA, pks)
+
+
+def invalidar_clientes(pks):
+    invalidar(CLIENTE, pks)
+
+
+def estatisticas():
+    """{tipo: {'hits': n, 'misses': n}} desde o último zerar_estatisticas()."""
+    chaves = {(t, e): _chave_contador(t, e) for t in TIPOS for e in ('hits', 'misses')}
+    valores = _cache().get_many(list(chaves.values()))
+    return {
+        tipo: {evento: valores.get(chaves[(tipo, evento)], 0) for evento in ('hits', 'misses')}
+        for tipo in TIPOS
+    }
+
+
+def zerar_estatisticas():
+    _cache().delete_many([_chave_contador(t, e) for t in TIPOS for e in ('hits', 'misses')])
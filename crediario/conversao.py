@@ -0,0 +1,59 @@
+# crediario/conversao.py
+"""
+Leitura de campos de texto vindos de fora (CSV da importação, entradas do
+lote de pagamentos). Cada função recebe a linha (dict campo -> texto) e o
+nome do campo e devolve o valor convertido, None para campo vazio ou
+levanta LinhaInvalida.
+
+Valores aceitam ponto decimal (1234.56) ou o formato brasileiro (1.234,56):
+o ponto só é separador de milhar quando há vírgula, então 0.250 é um quarto
+e 1.500 é um e meio. Datas em AAAA-MM-DD ou DD/MM/AAAA.
+"""
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+
+class LinhaInvalida(ValueError):
+    pass
+
+
+def ler_texto(linha, campo, obrigatorio=False):
+    valor = (linha.get(campo) or '').strip()
+    if obrigatorio and not valor:
+        raise LinhaInvalida(f'campo {campo!r} vazio')
+    return valor or None
+
+
+def ler_decimal(linha, campo, padrao=None):
+    valor = ler_texto(linha, campo, obrigatorio=padrao is None)
+    if valor is None:
+        return padrao
+    if ',' in valor:
+        # formato brasileiro: 1.234,56
+        valor = valor.replace('.', '').replace(',', '.')
+    try:
+        return Decimal(valor)
+    except InvalidOperation:
+        raise LinhaInvalida(f'valor inválido em {campo!r}: {valor!r}')
+
+
+def ler_inteiro(linha, campo, obrigatorio=False):
+    valor = ler_texto(linha, campo, obrigatorio)
+    if valor is None:
+        return None
+    try:
+        return int(valor)
+    except ValueError:
+        raise LinhaInvalida(f'valor inválido em {campo!r}: {valor!r}')
+
+
+def ler_data(linha, campo, obrigatorio=False):
+    valor = ler_texto(linha, campo, obrigatorio)
+    if valor is None:
+        return None
+    for formato in ('%Y-%m-%d', '%d/%m/%Y'):
+        try:
+            return datetime.strptime(valor, formato).date()
+        except ValueError:
+            pass
+    raise LinhaInvalida(f'data inválida em {campo!r}: {valor!r}')
@@ -0,0 +1,181 @@
+# crediario/encargos.py
+"""
+Multa e juros das notas vencidas (comando acumular_encargos, uma vez por dia).
+
+As notas abertas/parciais vencidas (além da carência) são separadas em lotes
+por id. Cada lote é uma transação que trava os clientes (em ordem de id) e
+depois as notas, como nos pagamentos, e só então relê as notas, só com as
+colunas necessárias: uma nota paga entre a seleção e a trava sai do lote. O
+cálculo é feito em Decimal por linha. Os Encargo entram com um bulk_create,
+o acréscimo vai para total, saldo_restante e total_encargos das notas num
+único UPDATE (F() + a soma dos encargos do dia), que recalcula também o
+status, e o lote registra um lançamento por cliente no livro de saldos.
+
+Regras:
+  - multa: uma vez por nota, taxas.multa % sobre o principal em aberto;
+  - juros: simples, taxas.juros_mes % ao mês pro rata por dia (mês de 30
+    dias), do vencimento (ou do último juros lançado) até a data;
+  - principal em aberto: o saldo da nota sem os encargos ainda não pagos
+    (os pagamentos quitam primeiro os encargos), então não há juros sobre
+    juros.
+
+Rodar de novo na mesma data não cobra duas vezes: notas que já têm encargo
+nessa data (ou depois) ficam de fora da leitura, e a restrição única (nota, tipo, data)
+barra um lote repetido por duas execuções simultâneas.
+"""
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Exists, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Round
+from django.utils import timezone
+from .models import Cliente, Encargo, Lancamento, Nota
+from .services import status_por_pagamento_sql
+
+CENTAVOS = Decimal('0.01')
+DINHEIRO = models.DecimalField(max_digits=12, decimal_places=2)
+TAMANHO_LOTE = 1000
+DIAS_NO_MES = 30
+CAMPOS_LEITURA = (
+    'pk', 'cliente_id', 'vencimento', 'total', 'total_encargos', 'saldo_restante', 'ultimo_juros', 'tem_multa',
+)
+
+
+@dataclass(frozen=True)
+class Taxas:
+    multa: Decimal
+    juros_mes: Decimal
+    carencia_dias: int = 0
+
+    @classmethod
+    def da_configuracao(cls):
+        """Taxas da loja, de settings.CREDIARIO_ENCARGOS."""
+        config = getattr(settings, 'CREDIARIO_ENCARGOS', {})
+        return cls(
+            multa=Decimal(str(config.get('multa_percentual', '2.00'))),
+            juros_mes=Decimal(str(config.get('juros_mensal_percentual', '1.00'))),
+            carencia_dias=int(config.get('carencia_dias', 0)),
+        )
+
+
+def _percentual(base, taxa):
+    return (base * taxa / 100).quantize(CENTAVOS, rounding=ROUND_HALF_UP)
+
+
+def calcular(principal, vencimento, ultimo_juros, tem_multa, data, taxas):
+    """Encargos devidos por uma nota na `data`, como [(tipo, base, dias, valor)]."""
+    if principal <= 0:
+        return []
+    encargos = []
+    if not tem_multa:
+        valor = _percentual(principal, taxas.multa)
+        if valor > 0:
+            encargos.append((Encargo.TIPO_MULTA, principal, 0, valor))
+    dias = (data - (ultimo_juros or vencimento)).days
+    if dias > 0:
+        valor = _percentual(principal, taxas.juros_mes * dias / DIAS_NO_MES)
+        # abaixo de um centavo não lança: os dias ficam para a próxima execução
+        if valor > 0:
+            encargos.append((Encargo.TIPO_JUROS, principal, dias, valor))
+    return encargos
+
+
+def notas_vencidas(data, taxas):
+    """Notas em aberto vencidas na `data` (após a carência) e sem encargo nessa data ou depois."""
+    encargos = Encargo.objects.filter(nota=OuterRef('pk'))
+    ultimo_juros = encargos.filter(tipo=Encargo.TIPO_JUROS).order_by('-data').values('data')[:1]
+    return (
+        Nota.objects.filter(
+            status__in=[Nota.STATUS_ABERTA, Nota.STATUS_PARCIAL],
+            vencimento__lt=data - timedelta(days=taxas.carencia_dias),
+        )
+        .annotate(
+            ultimo_juros=Subquery(ultimo_juros, output_field=models.DateField()),
+            tem_multa=Exists(encargos.filter(tipo=Encargo.TIPO_MULTA)),
+        )
+        # qualquer encargo na data (até uma multa sozinha, com juros abaixo de
+        # um centavo) encerra a nota no dia: a multa muda o principal
+        .exclude(Exists(encargos.filter(data__gte=data)))
+    )
+
+
+def _gravar_lote(lote, data, taxas, totais):
+    """Lança os encargos das notas `lote` ([(nota_id, cliente_id)]) numa transação."""
+    with transaction.atomic():
+        # trava: clientes (em ordem de id) antes das notas, como nos pagamentos
+        clientes = sorted({cliente_id for _, cliente_id in lote})
+        list(Cliente.objects.select_for_update().filter(pk__in=clientes).order_by('pk').values_list('pk', flat=True))
+        # relida com as linhas travadas: uma nota paga (ou já com encargo na
+        # data) desde a seleção não entra
+        linhas = list(
+            notas_vencidas(data, taxas).filter(pk__in=[pk for pk, _ in lote])
+            .select_for_update().order_by('pk')
+            .values_list(*CAMPOS_LEITURA)
+        )
+        _lancar(linhas, data, taxas, totais)
+
+
+def _lancar(linhas, data, taxas, totais):
+    """Calcula e grava os encargos das `linhas` (CAMPOS_LEITURA), já travadas."""
+    encargos = []
+    por_nota = {}
+    por_cliente = {}
+    for pk, cliente_id, vencimento, total, total_encargos, saldo, ultimo_juros, tem_multa in linhas:
+        principal = min(saldo, total - total_encargos)
+        for tipo, base, dias, valor in calcular(principal, vencimento, ultimo_juros, tem_multa, data, taxas):
+            encargos.append(Encargo(
+                nota_id=pk, cliente_id=cliente_id, tipo=tipo, data=data, base=base, dias=dias, valor=valor,
+            ))
+            por_nota[pk] = por_nota.get(pk, Decimal('0.00')) + valor
+            por_cliente[cliente_id] = por_cliente.get(cliente_id, Decimal('0.00')) + valor
+    if not encargos:
+        return
+
+    # o acréscimo de cada nota é a soma dos encargos que acabaram de entrar (as
+    # notas lidas não tinham nenhum nessa data): o banco faz a conta por linha
+    acrescimo = Subquery(
+        Encargo.objects.filter(nota=OuterRef('pk'), data=data)
+        .order_by().values('nota').annotate(soma=Sum('valor')).values('soma'),
+        output_field=DINHEIRO,
+    )
+    Encargo.objects.bulk_create(encargos)
+    # Round: no SQLite os decimais viram REAL e a soma deixaria resíduo
+    novo_total = Round(F('total') + acrescimo, 2)
+    Nota.objects.filter(pk__in=list(por_nota)).update(
+        total=novo_total,
+        saldo_restante=Round(F('saldo_restante') + acrescimo, 2),
+        total_encargos=Round(F('total_encargos') + acrescimo, 2),
+        status=status_por_pagamento_sql(novo_total),
+        atualizado_em=timezone.now(),
+    )
+    Lancamento.objects.bulk_create([
+        Lancamento(cliente_id=cliente_id, tipo=Lancamento.TIPO_ENCARGO, valor=valor)
+        for cliente_id, valor in sorted(por_cliente.items())
+    ])
+    totais['notas'] += len(por_nota)
+    totais['encargos'] += len(encargos)
+    totais['valor'] += sum(por_nota.values())
+
+
+def acumular_encargos(data=None, taxas=None, lote=TAMANHO_LOTE, progresso=None):
+    """
+    Lança multa e juros de todas as notas vencidas na `data` (hoje, por
+    padrão). Cada lote de `lote` notas é uma transação. Devolve os totais
+    {'notas', 'encargos', 'valor'}.
+    """
+    data = data or timezone.localdate()
+    taxas = taxas or Taxas.da_configuracao()
+    totais = {'notas': 0, 'encargos': 0, 'valor': Decimal('0.00')}
+    vencidas = notas_vencidas(data, taxas).order_by('pk').values_list('pk', 'cliente_id')
+    ultimo = 0
+    while True:
+        notas = list(vencidas.filter(pk__gt=ultimo)[:lote])
+        if not notas:
+            break
+        ultimo = notas[-1][0]
+        _gravar_lote(notas, data, taxas, totais)
+        if progresso:
+            progresso(totais)
+    return totais
@@ -0,0 +1,122 @@
+# crediario/exportacao.py
+"""
+Exportação em CSV para a contabilidade (views exportar e comando
+exportar_crediario).
+
+As linhas saem de .values_list().iterator(chunk_size=...), sem instanciar
+modelos e sem carregar a exportação inteira na memória: cada linha é
+formatada e entregue assim que lida do banco.
+
+As notas pagas antigas movidas para o arquivo (ver arquivo.py) continuam na
+exportação: a mesma consulta é feita nas tabelas *_arquivo e as duas
+sequências, cada uma já em ordem, são intercaladas (heapq.merge).
+"""
+import csv
+import heapq
+from operator import itemgetter
+
+TAMANHO_LOTE = 2000
+
+# tipo -> [(cabeçalho, campo)]
+COLUNAS = {
+    'notas': [
+        ('id', 'id'),
+        ('cliente_id', 'cliente_id'),
+        ('cliente', 'cliente__nome'),
+        ('numero_nota', 'numero_nota'),
+        ('data_nota', 'data_nota'),
+        ('vencimento', 'vencimento'),
+        ('total', 'total'),
+        ('total_pago', 'total_pago'),
+        ('saldo_restante', 'saldo_restante'),
+        ('status', 'status'),
+    ],
+    'itens': [
+        ('id', 'id'),
+        ('nota_id', 'nota_id'),
+        ('cliente_id', 'nota__cliente_id'),
+        ('data_nota', 'nota__data_nota'),
+        ('descricao', 'descricao'),
+        ('quantidade', 'quantidade'),
+        ('preco_unitario', 'preco_unitario'),
+        ('subtotal', 'subtotal'),
+    ],
+    'pagamentos': [
+        ('id', 'id'),
+        ('cliente_id', 'cliente_id'),
+        ('cliente', 'cliente__nome'),
+        ('nota_id', 'nota_id'),
+        ('data_pagamento', 'data_pagamento'),
+        ('valor_pagamento', 'valor_pagamento'),
+        ('metodo', 'metodo'),
+    ],
+}
+TIPOS = list(COLUNAS)
+
+# tipo -> ordem cronológica (campos que também estão em COLUNAS)
+ORDEM = {
+    'notas': ('data_nota', 'id'),
+    'itens': ('nota__data_nota', 'nota_id', 'id'),
+    'pagamentos': ('data_pagamento', 'id'),
+}
+
+
+def consulta(tipo, cliente=None, status=None, de=None, ate=None, arquivo=False):
+    """
+    Queryset (values_list) da exportação `tipo`, já filtrado e em ordem
+    cronológica. `status` é o status da nota; `de`/`ate` filtram a data da
+    nota (notas e itens) ou a data do pagamento. Com `arquivo`, a mesma
+    consulta nas tabelas *_arquivo.
+    """
+    from .models import ItemNota, ItemNotaArquivado, Nota, NotaArquivada, Pagamento, PagamentoArquivado
+
+    if tipo == 'notas':
+        qs = (NotaArquivada if arquivo else Nota).objects.all()
+        prefixo, campo_data = '', 'data_nota'
+    elif tipo == 'itens':
+        qs = (ItemNotaArquivado if arquivo else ItemNota).objects.all()
+        prefixo, campo_data = 'nota__', 'nota__data_nota'
+    elif tipo == 'pagamentos':
+        qs = (PagamentoArquivado if arquivo else Pagamento).objects.all()
+        prefixo, campo_data = 'nota__', 'data_pagamento'
+    else:
+        raise ValueError(f'tipo de exportação inválido: {tipo!r}')
+
+    if cliente:
+        qs = qs.filter(**{'cliente_id' if tipo != 'itens' else 'nota__cliente_id': cliente})
+    if status:
+        qs = qs.filter(**{f'{prefixo}status': status})
+    if de:
+        qs = qs.filter(**{f'{campo_data}__gte': de})
+    if ate:
+        qs = qs.filter(**{f'{campo_data}__lte': ate})
+    return qs.order_by(*ORDEM[tipo]).values_list(*[campo for _, campo in COLUNAS[tipo]])
+
+
+class Eco:
+    """Pseudo-arquivo para csv.writer: devolve a linha em vez de guardá-la."""
+
+    def write(self, valor):
+        return valor
+
+
+def _gerar(consultas, tipo, tamanho_lote):
+    colunas = COLUNAS[tipo]
+    campos = [campo for _, campo in colunas]
+    chave = itemgetter(*[campos.index(campo) for campo in ORDEM[tipo]])
+    escritor = csv.writer(Eco())
+    yield escritor.writerow([cabecalho for cabecalho, _ in colunas])
+    for linha in heapq.merge(*(qs.iterator(chunk_size=tamanho_lote) for qs in consultas), key=chave):
+        yield escritor.writerow(linha)
+
+
+def linhas_csv(tipo, tamanho_lote=TAMANHO_LOTE, **filtros):
+    """
+    Gera o CSV linha a linha (cabeçalho primeiro). O banco da consulta é
+    escolhido já na chamada: numa StreamingHttpResponse as linhas só são
+    lidas depois que a view (e o somente_leitura dela, ver replicas.py)
+    terminou.
+    """
+    qs = consulta(tipo, **filtros)
+    arquivadas = consulta(tipo, arquivo=True, **filtros)
+    return _gerar([qs.using(qs.db), arquivadas.using(qs.db)], tipo, tamanho_lote)
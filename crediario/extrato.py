@@ -0,0 +1,154 @@
+# crediario/extrato.py
+"""
+Extrato do cliente: notas e encargos (débitos) e pagamentos (créditos) em
+ordem cronológica, com o saldo acumulado calculado no banco.
+
+Uma única consulta junta notas, pagamentos e encargos (UNION ALL), soma
+tudo o que vem antes do cursor para obter o saldo anterior da página e aplica
+SUM() OVER só nas linhas da página (o LEFT JOIN garante o saldo anterior
+mesmo com a página vazia). Assim o Python recebe apenas LIMITE + 1 linhas,
+por mais longa que seja a história do cliente. As tabelas do arquivo (ver
+arquivo.py) só entram na UNION quando pedidas.
+"""
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+from django.db import connections, router
+from django.utils.dateparse import parse_date
+from .models import Encargo, EncargoArquivado, Nota, NotaArquivada, Pagamento, PagamentoArquivado
+from .paginacao import LIMITE_PADRAO, Pagina, codificar_cursor, decodificar_cursor
+
+CENTAVOS = Decimal('0.01')
+
+# notas antes dos pagamentos do mesmo dia; multa e juros (lançados no fim
+# do dia) depois deles
+ORDEM_NOTA = 0
+ORDEM_PAGAMENTO = 1
+ORDEM_ENCARGO = 2
+
+MOVIMENTOS = """
+    SELECT data_nota AS data, {ORDEM_NOTA} AS ordem, id, 'nota' AS tipo,
+           numero_nota AS descricao, status, total - total_encargos AS valor
+      FROM {notas}
+     WHERE cliente_id = %(cliente)s
+    UNION ALL
+    SELECT data_pagamento, {ORDEM_PAGAMENTO}, id, 'pagamento',
+           metodo, NULL, -valor_pagamento
+      FROM {pagamentos}
+     WHERE cliente_id = %(cliente)s
+    UNION ALL
+    SELECT data, {ORDEM_ENCARGO}, id, 'encargo',
+           tipo, NULL, valor
+      FROM {encargos}
+     WHERE cliente_id = %(cliente)s
+"""
+
+SQL_EXTRATO = """
+WITH movimentos AS ({movimentos}),
+anterior AS (
+    SELECT COALESCE(SUM(valor), 0) AS saldo
+      FROM movimentos
+     WHERE (data, ordem, id) <= (%(data)s, %(ordem)s, %(id)s)
+),
+pagina AS (
+    SELECT *
+      FROM movimentos
+     WHERE (data, ordem, id) > (%(data)s, %(ordem)s, %(id)s)
+     ORDER BY data, ordem, id
+     LIMIT %(limite)s
+)
+SELECT p.data, p.ordem, p.id, p.tipo, p.descricao, p.status, p.valor,
+       a.saldo + SUM(p.valor) OVER (ORDER BY p.data, p.ordem, p.id) AS saldo,
+       a.saldo AS saldo_anterior
+  FROM anterior a LEFT JOIN pagina p ON 1 = 1
+ ORDER BY p.data, p.ordem, p.id
+"""
+
+
+def _sql_extrato(arquivo):
+    tabelas = [(Nota, Pagamento, Encargo)]
+    if arquivo:
+        # os ids arquivados são os mesmos de antes: não colidem com os das tabelas quentes
+        tabelas.append((NotaArquivada, PagamentoArquivado, EncargoArquivado))
+    movimentos = '    UNION ALL'.join(
+        MOVIMENTOS.format(
+            ORDEM_NOTA=ORDEM_NOTA, ORDEM_PAGAMENTO=ORDEM_PAGAMENTO, ORDEM_ENCARGO=ORDEM_ENCARGO,
+            notas=notas._meta.db_table, pagamentos=pagamentos._meta.db_table, encargos=encargos._meta.db_table,
+        )
+        for notas, pagamentos, encargos in tabelas
+    )
+    return SQL_EXTRATO.format(movimentos=movimentos)
+
+# antes de qualquer movimento
+INICIO = (date.min, -1, 0)
+
+
+@dataclass
+class PaginaExtrato(Pagina):
+    saldo_anterior: Decimal = Decimal('0.00')
+
+
+def _dinheiro(valor):
+    # o SQLite devolve float/int em expressões; o PostgreSQL, Decimal
+    return Decimal(str(valor or 0)).quantize(CENTAVOS)
+
+
+def _data(valor):
+    return parse_date(valor) if isinstance(valor, str) else valor
+
+
+def _posicao(cursor):
+    valores = decodificar_cursor(cursor)
+    if not valores or len(valores) != 3:
+        return INICIO
+    data, ordem, pk = valores
+    try:
+        data = parse_date(data) if isinstance(data, str) else None
+    except ValueError:
+        data = None
+    if data is None or not isinstance(ordem, int) or not isinstance(pk, int):
+        return INICIO
+    return data, ordem, pk
+
+
+def extrato_do_cliente(cliente_id, cursor=None, limite=LIMITE_PADRAO, arquivo=False):
+    """
+    Página do extrato do cliente a partir de `cursor`. Cada item é um dict
+    com data, tipo ('nota', 'pagamento' ou 'encargo'), id, descricao,
+    status, valor (positivo para notas e encargos, negativo para pagamentos)
+    e saldo acumulado. A nota entra pelo valor dos itens; a multa e os juros
+    lançados depois aparecem como encargos, na data em que foram cobrados.
+    Com `arquivo`, inclui as notas arquivadas (ver arquivo.py) e o que foi
+    arquivado com elas; sem ele o saldo é o mesmo, já que uma nota paga e os
+    pagamentos que a quitaram somam zero.
+    """
+    data, ordem, pk = _posicao(cursor)
+    # SQL cru não passa pelo router: o banco (primário ou réplica) é pedido a ele
+    with connections[router.db_for_read(Nota)].cursor() as c:
+        c.execute(_sql_extrato(arquivo), {
+            'cliente': cliente_id, 'data': data, 'ordem': ordem, 'id': pk, 'limite': limite + 1,
+        })
+        linhas = c.fetchall()
+
+    saldo_anterior = _dinheiro(linhas[0][8]) if linhas else Decimal('0.00')
+    itens = [
+        {
+            'data': _data(data),
+            'tipo': tipo,
+            'id': pk,
+            'descricao': descricao or '',
+            'status': status,
+            'valor': _dinheiro(valor),
+            'saldo': _dinheiro(saldo),
+            'ordem': ordem,
+        }
+        for data, ordem, pk, tipo, descricao, status, valor, saldo, _ in linhas
+        if pk is not None
+    ]
+
+    proximo = None
+    if len(itens) > limite:
+        itens = itens[:limite]
+        ultimo = itens[-1]
+        proximo = codificar_cursor([ultimo['data'], ultimo['ordem'], ultimo['id']])
+    return PaginaExtrato(itens, proximo, saldo_anterior)
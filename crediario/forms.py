@@ -3,8 +3,55 @@ from decimal import Decimal
 from django import forms
 from django.forms import inlineformset_factory
 from django.db import transaction
+from django.urls import reverse
+from django.utils.http import urlencode
+from django.core.exceptions import ValidationError
 from .models import Cliente, Nota, ItemNota, Pagamento
 
+class AutocompleteSelect(forms.Select):
+    """
+    Select que renderiza apenas a opção selecionada. As demais opções são
+    buscadas no endpoint `url_name` conforme o usuário digita (ver
+    templates/crediario/_autocomplete.html), então o formulário não percorre
+    a tabela inteira ao ser renderizado.
+    """
+
+    def __init__(self, url_name, attrs=None, params=None, depende=None):
+        super().__init__(attrs)
+        self.url_name = url_name
+        # parâmetros fixos da busca, ex.: {'abertas': '1'}
+        self.params = params or {}
+        # {parâmetro: id do outro campo}: o valor do campo filtra a busca e,
+        # ao escolher um resultado que traga esse parâmetro, o campo é preenchido
+        self.depende = depende or {}
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        widget_attrs = context['widget']['attrs']
+        widget_attrs['data-autocomplete-url'] = reverse(self.url_name)
+        if self.params:
+            widget_attrs['data-autocomplete-params'] = urlencode(self.params)
+        if self.depende:
+            widget_attrs['data-autocomplete-depende'] = ','.join(
+                f'{param}:{campo}' for param, campo in self.depende.items()
+            )
+        return context
+
+    def optgroups(self, name, value, attrs=None):
+        valores = [v for v in value if v not in (None, '')]
+        opcoes = [self.create_option(name, '', self.choices.field.empty_label or '', not valores, 0)]
+        if valores:
+            field = self.choices.field
+            try:
+                selecionados = list(field.queryset.filter(pk__in=valores))
+            except (ValueError, TypeError, ValidationError):
+                selecionados = []
+            for index, obj in enumerate(selecionados, start=1):
+                opcoes.append(self.create_option(
+                    name, field.prepare_value(obj), field.label_from_instance(obj), True, index
+                ))
+        return [(None, opcoes, 0)]
+
 class ClienteForm(forms.ModelForm):
     class Meta:
         model = Cliente
@@ -15,6 +62,9 @@ class NotaForm(forms.ModelForm):
     class Meta:
         model = Nota
         fields = ['cliente', 'numero_nota', 'data_nota', 'vencimento']
+        widgets = {
+            'cliente': AutocompleteSelect('crediario:cliente_buscar'),
+        }
 
 ItemFormSet = inlineformset_factory(
     Nota,
@@ -27,4 +77,17 @@ ItemFormSet = inlineformset_factory(
 class PagamentoForm(forms.ModelForm):
     class Meta:
         model = Pagamento
-        fields = ['cliente', 'nota', 'valor_pagamento', 'metodo']
\ No newline at end of file
+        fields = ['cliente', 'nota', 'valor_pagamento', 'metodo']
+        widgets = {
+            'cliente': AutocompleteSelect('crediario:cliente_buscar'),
+            'nota': AutocompleteSelect(
+                'crediario:nota_buscar',
+                params={'abertas': '1'},
+                depende={'cliente': 'id_cliente'},
+            ),
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Nota.__str__ usa cliente.nome: evita a consulta extra ao renderizar a selecionada
+        self.fields['nota'].queryset = Nota.objects.select_related('cliente')
\ No newline at end of file
@@ -0,0 +1,321 @@
+# crediario/importacao.py
+"""
+Importação em massa de crediário antigo a partir de CSV (comando
+importar_crediario).
+
+Os arquivos são lidos em streaming, linha a linha, e gravados em lotes com
+bulk_create, sem passar por Nota.save()/ItemNota.save()/Pagamento.save().
+Os clientes são resolvidos pelo telefone e as notas por (telefone,
+numero_nota) através de índices em memória. Totais, total pago, status e os
+lançamentos de saldo são recalculados uma única vez no final, com SQL
+set-based. Cada lote é uma transação que grava também o progresso (tabela
+importacao_estado), então uma importação interrompida pode ser retomada sem
+perder nem repetir linhas. O progresso guarda os arquivos de entrada
+(caminho e tamanho): retomar com outros arquivos é recusado. Ao terminar, o
+progresso é apagado.
+
+Valores e datas são lidos como descrito em conversao.py (1234.56 ou
+1.234,56; AAAA-MM-DD ou DD/MM/AAAA).
+
+Colunas esperadas (cabeçalho na primeira linha):
+  clientes.csv:   nome, telefone, endereco, limite_crediario
+  notas.csv:      telefone, numero_nota, data_nota, vencimento
+  itens.csv:      telefone, numero_nota, descricao, quantidade, preco_unitario
+  pagamentos.csv: telefone, numero_nota (opcional), valor_pagamento, data_pagamento, metodo
+"""
+import csv
+import os
+import time
+from decimal import Decimal
+from itertools import islice
+from django.db import transaction
+from django.db.models import Exists, Max, OuterRef, Sum
+from .alocacao import alocar_pagamentos
+from .conversao import LinhaInvalida, ler_data, ler_decimal, ler_texto
+from .models import Cliente, ImportacaoEstado, Nota, ItemNota, Pagamento, Lancamento
+from .services import CENTAVOS, recalcular_pagamentos_notas, soma_itens
+
+ORDEM_ARQUIVOS = ['clientes', 'notas', 'itens', 'pagamentos']
+
+
+class EstadoIncompativel(Exception):
+    pass
+
+
+class Estado:
+    """
+    Progresso da importação (linhas já gravadas por arquivo), na tabela
+    importacao_estado sob `chave`. `arquivos` é a lista [(tipo, caminho)] da
+    execução: um progresso salvo para outros arquivos (ou para os mesmos com
+    outro tamanho) levanta EstadoIncompativel em vez de pular linhas erradas.
+    """
+
+    def __init__(self, chave, arquivos):
+        self.chave = chave
+        entrada = {tipo: [os.path.abspath(caminho), os.path.getsize(caminho)] for tipo, caminho in arquivos}
+        self.dados = {'arquivos': entrada, 'linhas': {}, 'nota_id_inicial': None, 'pagamento_id_inicial': None}
+        salvo = ImportacaoEstado.objects.filter(chave=chave).values_list('dados', flat=True).first()
+        if salvo is not None:
+            if salvo.get('arquivos') != entrada:
+                raise EstadoIncompativel(
+                    f'há uma importação {chave!r} em andamento com outros arquivos: {salvo.get("arquivos")}'
+                )
+            self.dados.update(salvo)
+
+    def __getitem__(self, chave):
+        return self.dados[chave]
+
+    def __setitem__(self, chave, valor):
+        self.dados[chave] = valor
+        self.salvar()
+
+    def linhas(self, tipo):
+        return self.dados['linhas'].get(tipo, 0)
+
+    def avancar(self, tipo, quantidade):
+        """Soma `quantidade` linhas a `tipo`; chamar na transação do lote."""
+        self.dados['linhas'][tipo] = self.linhas(tipo) + quantidade
+        self.salvar()
+
+    def salvar(self):
+        ImportacaoEstado.objects.update_or_create(chave=self.chave, defaults={'dados': self.dados})
+
+    def apagar(self):
+        ImportacaoEstado.objects.filter(chave=self.chave).delete()
+
+
+class Importador:
+    def __init__(self, estado, lote=2000, relatar=None):
+        self.estado = estado
+        self.lote = lote
+        self.relatar = relatar or (lambda mensagem: None)
+        self._clientes = None
+        self._notas = None
+        self.rejeitadas = 0
+
+    # --- índices em memória -------------------------------------------------
+
+    @property
+    def clientes(self):
+        """telefone -> cliente_id"""
+        if self._clientes is None:
+            self._clientes = dict(
+                Cliente.objects.exclude(telefone__isnull=True).order_by()
+                .values_list('telefone', 'pk').iterator(chunk_size=10000)
+            )
+        return self._clientes
+
+    @property
+    def notas(self):
+        """(cliente_id, numero_nota) -> nota_id"""
+        if self._notas is None:
+            self._notas = {
+                (cliente_id, numero): pk
+                for cliente_id, numero, pk in Nota.objects.exclude(numero_nota__isnull=True).order_by()
+                .values_list('cliente_id', 'numero_nota', 'pk').iterator(chunk_size=10000)
+            }
+        return self._notas
+
+    def _cliente_id(self, linha):
+        telefone = ler_texto(linha, 'telefone', obrigatorio=True)
+        try:
+            return self.clientes[telefone]
+        except KeyError:
+            raise LinhaInvalida(f'cliente com telefone {telefone!r} não encontrado')
+
+    def _nota_id(self, cliente_id, linha, obrigatorio=True):
+        numero = ler_texto(linha, 'numero_nota', obrigatorio)
+        if numero is None:
+            return None
+        try:
+            return self.notas[(cliente_id, numero)]
+        except KeyError:
+            raise LinhaInvalida(f'nota {numero!r} não encontrada')
+
+    # --- conversão de linhas ------------------------------------------------
+    # Cada conversor devolve a instância a gravar, None para linhas já
+    # importadas (idempotência) ou levanta LinhaInvalida.
+
+    def _cliente(self, linha):
+        telefone = ler_texto(linha, 'telefone', obrigatorio=True)
+        if telefone in self.clientes:
+            return None
+        cliente = Cliente(
+            nome=ler_texto(linha, 'nome', obrigatorio=True),
+            telefone=telefone,
+            endereco=ler_texto(linha, 'endereco'),
+            limite_crediario=ler_decimal(linha, 'limite_crediario', Decimal('0.00')),
+        )
+        self.clientes[telefone] = None  # reserva: telefone repetido no mesmo lote
+        return cliente
+
+    def _nota(self, linha):
+        cliente_id = self._cliente_id(linha)
+        numero = ler_texto(linha, 'numero_nota', obrigatorio=True)
+        if (cliente_id, numero) in self.notas:
+            return None
+        nota = Nota(
+            cliente_id=cliente_id,
+            numero_nota=numero,
+            data_nota=ler_data(linha, 'data_nota', obrigatorio=True),
+            vencimento=ler_data(linha, 'vencimento'),
+        )
+        self.notas[(cliente_id, numero)] = None
+        return nota
+
+    def _item(self, linha):
+        nota_id = self._nota_id(self._cliente_id(linha), linha)
+        if nota_id is None or nota_id < (self.estado['nota_id_inicial'] or 0):
+            # o total de notas antigas não é recalculado pela importação
+            raise LinhaInvalida('itens só podem ser importados para notas da própria importação')
+        quantidade = ler_decimal(linha, 'quantidade', Decimal('1'))
+        preco = ler_decimal(linha, 'preco_unitario')
+        return ItemNota(
+            nota_id=nota_id,
+            descricao=ler_texto(linha, 'descricao', obrigatorio=True),
+            quantidade=quantidade,
+            preco_unitario=preco,
+            subtotal=(quantidade * preco).quantize(CENTAVOS),
+        )
+
+    def _pagamento(self, linha):
+        cliente_id = self._cliente_id(linha)
+        return Pagamento(
+            cliente_id=cliente_id,
+            nota_id=self._nota_id(cliente_id, linha, obrigatorio=False),
+            valor_pagamento=ler_decimal(linha, 'valor_pagamento'),
+            data_pagamento=ler_data(linha, 'data_pagamento', obrigatorio=True),
+            metodo=ler_texto(linha, 'metodo'),
+        )
+
+    # --- execução -----------------------------------------------------------
+
+    def importar_arquivo(self, tipo, caminho):
+        """Importa um arquivo em lotes; devolve (linhas processadas, segundos)."""
+        if tipo in ('notas', 'itens') and self.estado['nota_id_inicial'] is None:
+            self.estado['nota_id_inicial'] = (Nota.objects.aggregate(m=Max('pk'))['m'] or 0) + 1
+        if tipo == 'pagamentos' and self.estado['pagamento_id_inicial'] is None:
+            self.estado['pagamento_id_inicial'] = (Pagamento.objects.aggregate(m=Max('pk'))['m'] or 0) + 1
+
+        ja_gravadas = self.estado.linhas(tipo)
+        inicio = time.monotonic()
+        processadas = 0
+        with open(caminho, newline='', encoding='utf-8-sig') as f:
+            leitor = csv.DictReader(f)
+            # retomada: pula as linhas de lotes já confirmados
+            for _ in islice(leitor, ja_gravadas):
+                pass
+            while True:
+                linhas = list(islice(leitor, self.lote))
+                if not linhas:
+                    break
+                # +2: cabeçalho e numeração a partir de 1, como num editor
+                self._gravar_lote(tipo, ja_gravadas + processadas + 2, linhas)
+                processadas += len(linhas)
+                decorrido = time.monotonic() - inicio
+                self.relatar(
+                    f'{tipo}: {ja_gravadas + processadas} linhas '
+                    f'({processadas / decorrido if decorrido else 0:.0f} linhas/s)'
+                )
+        return processadas, time.monotonic() - inicio
+
+    def _gravar_lote(self, tipo, primeira_linha, linhas):
+        """
+        Converte o lote e grava tudo num único bulk_create, numa transação
+        que também avança o progresso. Linhas inválidas são relatadas (com o
+        número da linha no arquivo) e ignoradas, sem derrubar o lote.
+        """
+        converter, modelo = {
+            'clientes': (self._cliente, Cliente),
+            'notas': (self._nota, Nota),
+            'itens': (self._item, ItemNota),
+            'pagamentos': (self._pagamento, Pagamento),
+        }[tipo]
+        objs = []
+        for numero, linha in enumerate(linhas, start=primeira_linha):
+            try:
+                obj = converter(linha)
+            except LinhaInvalida as e:
+                self.relatar(f'{tipo}: linha {numero} ignorada ({e})')
+                self.rejeitadas += 1
+                continue
+            if obj is not None:
+                objs.append(obj)
+
+        ja_gravadas = self.estado.linhas(tipo)
+        try:
+            with transaction.atomic():
+                modelo.objects.bulk_create(objs)
+                self.estado.avancar(tipo, len(linhas))
+        except Exception:
+            # desfaz as reservas do lote nos índices e o avanço em memória
+            # (o do banco voltou com a transação) antes de propagar
+            self.estado.dados['linhas'][tipo] = ja_gravadas
+            if tipo == 'clientes':
+                for obj in objs:
+                    self.clientes.pop(obj.telefone, None)
+            elif tipo == 'notas':
+                for obj in objs:
+                    self.notas.pop((obj.cliente_id, obj.numero_nota), None)
+            raise
+
+        # bulk_create devolve as PKs (PostgreSQL, SQLite >= 3.35): completa os índices
+        if tipo == 'clientes':
+            for obj in objs:
+                self.clientes[obj.telefone] = obj.pk
+        elif tipo == 'notas':
+            for obj in objs:
+                self.notas[(obj.cliente_id, obj.numero_nota)] = obj.pk
+
+    def recalcular(self):
+        """
+        Recalcula de uma vez, com SQL set-based, o que os save() fariam linha a
+        linha: total das notas importadas, total pago/saldo restante/status e
+        um lançamento por cliente com o saldo importado. Na mesma transação,
+        apaga o progresso: a importação está concluída.
+        """
+        nota_inicial = self.estado['nota_id_inicial']
+        pagamento_inicial = self.estado['pagamento_id_inicial']
+        with transaction.atomic():
+            # registros criados pelo sistema durante a importação já têm seus
+            # lançamentos (via save()) e não podem ser contados de novo
+            notas_importadas = (
+                Nota.objects.filter(pk__gte=nota_inicial).exclude(Exists(Lancamento.objects.filter(nota=OuterRef('pk'))))
+                if nota_inicial else Nota.objects.none()
+            )
+            pagamentos_importados = (
+                Pagamento.objects.filter(pk__gte=pagamento_inicial)
+                .exclude(Exists(Lancamento.objects.filter(pagamento=OuterRef('pk'))))
+                if pagamento_inicial else Pagamento.objects.none()
+            )
+            notas_importadas.update(total=soma_itens())
+            # notas que receberam pagamentos importados (novas ou já existentes)
+            notas_afetadas = Nota.objects.filter(pk__in=notas_importadas.values('pk')) | Nota.objects.filter(
+                pk__in=pagamentos_importados.exclude(nota__isnull=True).values('nota_id')
+            )
+            recalcular_pagamentos_notas(notas_afetadas)
+
+            saldos = {}
+            for cliente_id, total in notas_importadas.order_by().values('cliente_id').annotate(
+                s=Sum('total')
+            ).values_list('cliente_id', 's'):
+                saldos[cliente_id] = saldos.get(cliente_id, Decimal('0.00')) + (total or 0)
+            for cliente_id, pago in pagamentos_importados.order_by().values('cliente_id').annotate(
+                s=Sum('valor_pagamento')
+            ).values_list('cliente_id', 's'):
+                saldos[cliente_id] = saldos.get(cliente_id, Decimal('0.00')) - (pago or 0)
+            Lancamento.objects.bulk_create(
+                [
+                    Lancamento(cliente_id=cliente_id, tipo=Lancamento.TIPO_IMPORTACAO, valor=valor)
+                    for cliente_id, valor in saldos.items() if valor
+                ],
+                batch_size=self.lote,
+            )
+
+            # pagamentos importados sem nota: distribuídos entre as notas em
+            # aberto (clientes em ordem de id, como em qualquer lock múltiplo)
+            for cliente_id in sorted(set(
+                pagamentos_importados.filter(nota__isnull=True).values_list('cliente_id', flat=True)
+            )):
+                alocar_pagamentos(cliente_id)
+            self.estado.apagar()
@@ -0,0 +1,61 @@
+# crediario/lancamentos.py
+"""
+Consolidação (checkpoint) do livro de lançamentos.
+
+Nota.save() e Pagamento.save() só inserem Lancamento; o saldo do cliente é
+Cliente.saldo_devedor (snapshot) + lançamentos com id > saldo_lancamento_id.
+consolidar_saldos() incorpora periodicamente essa cauda ao snapshot para que
+a leitura do saldo continue barata.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from django.db import models, transaction
+from django.db.models import Exists, F, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import Cliente, Lancamento
+
+DINHEIRO = models.DecimalField(max_digits=12, decimal_places=2)
+
+# Só consolidamos lançamentos mais velhos que a margem: uma transação ainda
+# aberta pode ter reservado um id menor do que outro já commitado, e não pode
+# ficar para trás do checkpoint.
+MARGEM_PADRAO = timedelta(minutes=10)
+
+
+def consolidar_saldos(margem=MARGEM_PADRAO, lote=1000):
+    """
+    Soma a cauda de lançamentos (até a marca d'água) ao saldo_devedor de cada
+    cliente com pendências, em UPDATEs por faixa de id de cliente. Devolve a
+    quantidade de clientes consolidados.
+    """
+    marca = (
+        Lancamento.objects.filter(criado_em__lt=timezone.now() - margem)
+        .aggregate(m=Max('id'))['m']
+    )
+    if marca is None:
+        return 0
+
+    cauda = Lancamento.objects.filter(
+        cliente=OuterRef('pk'), pk__gt=OuterRef('saldo_lancamento_id'), pk__lte=marca
+    )
+    soma_cauda = cauda.order_by().values('cliente').annotate(s=Sum('valor')).values('s')
+    pendentes = Cliente.objects.filter(saldo_lancamento_id__lt=marca).filter(Exists(cauda))
+
+    consolidados = 0
+    ultimo_id = 0
+    while True:
+        ids = list(pendentes.filter(pk__gt=ultimo_id).order_by('pk').values_list('pk', flat=True)[:lote])
+        if not ids:
+            break
+        ultimo_id = ids[-1]
+        with transaction.atomic():
+            # um único UPDATE por lote: snapshot e checkpoint mudam juntos
+            consolidados += Cliente.objects.filter(pk__in=ids).update(
+                saldo_devedor=F('saldo_devedor') + Coalesce(
+                    Subquery(soma_cauda, output_field=DINHEIRO),
+                    Value(Decimal('0.00'), output_field=DINHEIRO),
+                ),
+                saldo_lancamento_id=marca,
+            )
+    return consolidados
@@ -0,0 +1,148 @@
+# crediario/lote_pagamentos.py
+"""
+Pagamentos em lote, como no fechamento do dia com o relatório da maquininha
+(view pagamentos_lote e comando lancar_pagamentos).
+
+Os pagamentos são agrupados por cliente. Cada transação trava os clientes de
+um grupo numa única consulta, em ordem de id: dois lotes simultâneos pedem os
+locks sempre na mesma ordem, então um não espera pelo outro em ciclo
+(deadlock). Depois, para o grupo inteiro, uma leitura das notas em aberto
+(travadas) e uma do crédito a alocar, bulk_create de pagamentos, lançamentos
+e alocações, e um bulk_update das notas. O número de consultas não cresce
+com o tamanho do lote.
+
+Cada entrada é um objeto com cliente_id, nota_id (opcional), valor_pagamento,
+data_pagamento (opcional, hoje por padrão), metodo e ref (opcional, devolvido
+no resultado). Entradas inválidas ou acima do que falta na nota são recusadas
+uma a uma, sem derrubar o resto do lote.
+"""
+from dataclasses import asdict, dataclass
+from django.db import transaction
+from django.utils import timezone
+from .alocacao import CAMPOS_NOTA, aplicar, creditos_por_cliente, distribuir, notas_em_aberto
+from .conversao import LinhaInvalida, ler_data, ler_decimal, ler_inteiro, ler_texto
+from .models import AlocacaoPagamento, Cliente, Lancamento, Nota, Pagamento
+from .services import CENTAVOS
+
+CLIENTES_POR_TRANSACAO = 500
+
+ACEITO = 'aceito'
+RECUSADO = 'recusado'
+
+
+@dataclass
+class Resultado:
+    indice: int
+    ref: str | None
+    status: str
+    pagamento_id: int | None = None
+    erro: str | None = None
+
+    def como_dict(self):
+        return asdict(self)
+
+
+def ler_pagamento(dados):
+    """Monta o Pagamento (não salvo) de uma entrada; levanta LinhaInvalida."""
+    if not isinstance(dados, dict):
+        raise LinhaInvalida('cada pagamento deve ser um objeto')
+    linha = {campo: '' if valor is None else str(valor) for campo, valor in dados.items()}
+    valor = ler_decimal(linha, 'valor_pagamento')
+    if not valor.is_finite() or valor <= 0 or valor != valor.quantize(CENTAVOS):
+        raise LinhaInvalida('valor_pagamento deve ser positivo, com até 2 casas decimais')
+    metodo = ler_texto(linha, 'metodo')
+    if metodo and len(metodo) > Pagamento._meta.get_field('metodo').max_length:
+        raise LinhaInvalida('metodo muito longo')
+    return Pagamento(
+        cliente_id=ler_inteiro(linha, 'cliente_id', obrigatorio=True),
+        nota_id=ler_inteiro(linha, 'nota_id'),
+        valor_pagamento=valor,
+        data_pagamento=ler_data(linha, 'data_pagamento') or timezone.localdate(),
+        metodo=metodo,
+    )
+
+
+def _motivo_recusa(pagamento, clientes, notas):
+    if pagamento.cliente_id not in clientes:
+        return 'cliente inexistente'
+    if pagamento.nota_id is None:
+        return None
+    nota = notas.get(pagamento.nota_id)
+    if nota is None or nota.cliente_id != pagamento.cliente_id:
+        return 'nota inexistente para este cliente'
+    if nota.status == Nota.STATUS_CANCELADA:
+        return 'nota cancelada'
+    falta = nota.total - nota.total_pago
+    if pagamento.valor_pagamento > falta:
+        # mesma mensagem de Pagamento.save
+        valor_formatado = f"{falta:.2f}".replace('.', ',')
+        return f'Pagamento excede o valor devido. Falta pagar apenas R$ {valor_formatado}.'
+    return None
+
+
+def _gravar_grupos(grupos, resultados):
+    """Grava os pagamentos de `grupos` ({cliente_id: [(indice, ref, pagamento)]}) numa transação."""
+    ids = sorted(grupos)
+    with transaction.atomic():
+        clientes = set(
+            Cliente.objects.select_for_update().filter(pk__in=ids).order_by('pk').values_list('pk', flat=True)
+        )
+        nota_ids = {p.nota_id for grupo in grupos.values() for _, _, p in grupo if p.nota_id}
+        notas_por_cliente = notas_em_aberto(clientes, incluir=nota_ids)
+        notas = {n.pk: n for lista in notas_por_cliente.values() for n in lista}
+
+        agora = timezone.now()
+        alteradas = {}
+        aceitos = []
+        for cliente_id in ids:
+            for indice, ref, pagamento in grupos[cliente_id]:
+                erro = _motivo_recusa(pagamento, clientes, notas)
+                if erro:
+                    resultados[indice] = Resultado(indice, ref, RECUSADO, erro=erro)
+                    continue
+                if pagamento.nota_id:
+                    # os pagamentos anteriores do lote já contam no que falta
+                    nota = notas[pagamento.nota_id]
+                    aplicar(nota, pagamento.valor_pagamento, agora)
+                    alteradas[nota.pk] = nota
+                aceitos.append((indice, ref, pagamento))
+
+        pagamentos = [p for _, _, p in aceitos]
+        Pagamento.objects.bulk_create(pagamentos)
+        Lancamento.objects.bulk_create([
+            Lancamento(cliente_id=p.cliente_id, pagamento=p, tipo=Lancamento.TIPO_PAGAMENTO, valor=-p.valor_pagamento)
+            for p in pagamentos
+        ])
+
+        # pagamentos sem nota (os novos e créditos antigos) entram nas notas em aberto
+        alocacoes = []
+        com_credito = {p.cliente_id for p in pagamentos if p.nota_id is None}
+        for cliente_id, creditos in creditos_por_cliente(com_credito).items():
+            alocacoes += distribuir(creditos, notas_por_cliente.get(cliente_id, []), agora, alteradas)
+        AlocacaoPagamento.objects.bulk_create(alocacoes)
+        Nota.objects.bulk_update(list(alteradas.values()), CAMPOS_NOTA)
+
+    for indice, ref, pagamento in aceitos:
+        resultados[indice] = Resultado(indice, ref, ACEITO, pagamento_id=pagamento.pk)
+
+
+def registrar_lote(entradas, clientes_por_transacao=CLIENTES_POR_TRANSACAO):
+    """
+    Grava os pagamentos de `entradas` e devolve um Resultado por entrada, na
+    mesma ordem. Cada transação cobre até `clientes_por_transacao` clientes.
+    """
+    resultados = [None] * len(entradas)
+    grupos = {}
+    for indice, dados in enumerate(entradas):
+        ref = dados.get('ref') if isinstance(dados, dict) else None
+        try:
+            pagamento = ler_pagamento(dados)
+        except LinhaInvalida as e:
+            resultados[indice] = Resultado(indice, ref, RECUSADO, erro=str(e))
+            continue
+        grupos.setdefault(pagamento.cliente_id, []).append((indice, ref, pagamento))
+
+    ids = sorted(grupos)
+    for i in range(0, len(ids), clientes_por_transacao):
+        _gravar_grupos({cliente_id: grupos[cliente_id] for cliente_id in ids[i:i + clientes_por_transacao]}, resultados)
+    return resultados
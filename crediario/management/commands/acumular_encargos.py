@@ -0,0 +1,43 @@
+from dataclasses import replace
+from decimal import Decimal, InvalidOperation
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from crediario.encargos import TAMANHO_LOTE, Taxas, acumular_encargos
+
+
+def _percentual(valor):
+    try:
+        return Decimal(valor)
+    except InvalidOperation:
+        raise CommandError(f'Percentual inválido: {valor}')
+
+
+class Command(BaseCommand):
+    help = 'Lança multa e juros do dia nas notas vencidas (pode rodar de novo na mesma data sem cobrar duas vezes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data', help='Data do cálculo (AAAA-MM-DD); padrão: hoje')
+        parser.add_argument('--multa', help='Multa em %% (padrão: CREDIARIO_ENCARGOS)')
+        parser.add_argument('--juros', help='Juros ao mês em %% (padrão: CREDIARIO_ENCARGOS)')
+        parser.add_argument('--carencia', type=int, help='Dias de carência após o vencimento')
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help='Notas por transação')
+
+    def handle(self, *args, **options):
+        data = None
+        if options['data']:
+            data = parse_date(options['data'])
+            if data is None:
+                raise CommandError(f"Data inválida: {options['data']} (use AAAA-MM-DD)")
+
+        taxas = Taxas.da_configuracao()
+        if options['multa'] is not None:
+            taxas = replace(taxas, multa=_percentual(options['multa']))
+        if options['juros'] is not None:
+            taxas = replace(taxas, juros_mes=_percentual(options['juros']))
+        if options['carencia'] is not None:
+            taxas = replace(taxas, carencia_dias=options['carencia'])
+
+        totais = acumular_encargos(data=data, taxas=taxas, lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Notas com encargos: {totais['notas']} — encargos: {totais['encargos']} — total: R$ {totais['valor']}"
+        ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from crediario.alocacao import alocar_pagamentos, clientes_a_alocar
+
+
+class Command(BaseCommand):
+    help = 'Aloca os pagamentos sem nota entre as notas em aberto de cada cliente (vencimento mais antigo primeiro)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cliente', type=int, action='append', help='Só estes clientes (pode repetir)')
+
+    def handle(self, *args, **options):
+        ids = options['cliente'] or list(clientes_a_alocar().iterator(chunk_size=2000))
+        clientes = alocacoes = 0
+        # uma transação (e um lock) por cliente
+        for cliente_id in ids:
+            criadas = alocar_pagamentos(cliente_id)
+            if criadas:
+                clientes += 1
+                alocacoes += len(criadas)
+        self.stdout.write(self.style.SUCCESS(f'Clientes alocados: {clientes} — alocações: {alocacoes}'))
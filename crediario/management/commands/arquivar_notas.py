@@ -0,0 +1,37 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from crediario.arquivo import CLIENTES_POR_TRANSACAO, arquivar_notas, notas_arquivaveis
+
+
+class Command(BaseCommand):
+    help = 'Move as notas pagas antigas (com itens, pagamentos, alocações, encargos, anexos e notificações) para o arquivo'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--antes-de', help='Arquiva notas com data_nota anterior a esta data (AAAA-MM-DD)')
+        parser.add_argument('--dias', type=int, default=730, help='Sem --antes-de: notas com mais de N dias (padrão: 730)')
+        parser.add_argument(
+            '--clientes-por-transacao', type=int, default=CLIENTES_POR_TRANSACAO, help='Clientes por transação'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Só conta as notas candidatas')
+
+    def handle(self, *args, **options):
+        if options['antes_de']:
+            corte = parse_date(options['antes_de'])
+            if corte is None:
+                raise CommandError(f"Data inválida: {options['antes_de']} (use AAAA-MM-DD)")
+        else:
+            corte = timezone.localdate() - timedelta(days=options['dias'])
+
+        if options['dry_run']:
+            self.stdout.write(f'Notas pagas antes de {corte}: {notas_arquivaveis(corte).count()}')
+            return
+
+        def progresso(totais):
+            self.stdout.write(f"  {totais['notas']} notas arquivadas...")
+
+        totais = arquivar_notas(corte, options['clientes_por_transacao'], progresso=progresso)
+        self.stdout.write(self.style.SUCCESS(
+            'Arquivados: ' + ', '.join(f'{tabela}: {n}' for tabela, n in totais.items())
+        ))
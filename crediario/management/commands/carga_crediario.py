@@ -0,0 +1,227 @@
+import json
+import logging
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, connections
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from crediario.models import Cliente, Nota
+
+
+def percentil(valores, p):
+    """Percentil p (0-100) por posição mais próxima; None se vazio."""
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    # posição mais próxima: o menor valor com pelo menos p% dos valores até ele
+    indice = min(len(ordenados), max(1, math.ceil(p / 100 * len(ordenados)))) - 1
+    return ordenados[indice]
+
+
+def classificar_erro(erro):
+    """Tipo do erro de banco: deadlock, espera de trava, serialização ou genérico."""
+    causa = erro.__cause__ or erro
+    codigo = getattr(causa, 'pgcode', None)
+    if codigo == '40P01':
+        return 'deadlock'
+    if codigo in ('55P03', '57014'):  # lock_not_available, statement/lock timeout
+        return 'timeout_trava'
+    if codigo == '40001':
+        return 'serializacao'
+    if 'database is locked' in str(erro):  # SQLite
+        return 'banco_travado'
+    return 'erro_banco'
+
+
+class MedidorDeTravas:
+    """execute_wrapper que mede o tempo das consultas SELECT ... FOR UPDATE."""
+
+    def __init__(self):
+        self.esperas = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if 'FOR UPDATE' not in sql:
+            return execute(sql, params, many, context)
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.esperas.append(time.perf_counter() - inicio)
+
+
+class Command(BaseCommand):
+    help = (
+        'Dispara nota_create/pagamento_create em paralelo contra os mesmos clientes e mede vazão, '
+        'latência, deadlocks e espera de travas'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--operacoes', type=int, default=500, help='Total de operações')
+        parser.add_argument('--duracao', type=float, help='Roda por N segundos em vez de --operacoes')
+        parser.add_argument('--clientes', type=int, default=5,
+                            help='Quantos clientes (os de menor id) recebem a carga; poucos = mais disputa')
+        parser.add_argument('--pagamentos', type=float, default=0.7, help='Fração de operações que são pagamentos')
+        parser.add_argument('--semente', type=int, default=42)
+        parser.add_argument('--relatorio', help="Grava o relatório em JSON neste arquivo ('-' para stdout)")
+
+    def handle(self, *args, **options):
+        self.alvos = list(Cliente.objects.order_by('pk').values_list('pk', flat=True)[:options['clientes']])
+        if not self.alvos:
+            raise CommandError('Nenhum cliente no banco (rode seed_crediario antes)')
+        self.options = options
+        self.trava = threading.Lock()
+        self.restantes = options['operacoes']
+        self.fim = time.monotonic() + options['duracao'] if options['duracao'] else None
+        self.resultados = []
+        self.esperas = []
+
+        # os erros de banco são contados no relatório; sem traceback por requisição
+        logger = logging.getLogger('django.request')
+        nivel = logger.level
+        logger.setLevel(logging.CRITICAL)
+        inicio = time.monotonic()
+        try:
+            with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+                for n in range(options['threads']):
+                    pool.submit(self.trabalhar, random.Random(options['semente'] + n))
+        finally:
+            logger.setLevel(nivel)
+        duracao = time.monotonic() - inicio
+
+        relatorio = self.montar_relatorio(duracao)
+        self.escrever(relatorio)
+        if options['relatorio']:
+            if options['relatorio'] == '-':
+                self.stdout.write(json.dumps(relatorio, indent=2))
+            else:
+                with open(options['relatorio'], 'w', encoding='utf-8') as f:
+                    json.dump(relatorio, f, indent=2)
+
+    def proxima(self):
+        with self.trava:
+            if self.fim is not None:
+                return time.monotonic() < self.fim
+            if self.restantes <= 0:
+                return False
+            self.restantes -= 1
+            return True
+
+    def trabalhar(self, rnd):
+        cliente_http = Client()
+        medidor = MedidorDeTravas()
+        resultados = []
+        try:
+            with connection.execute_wrapper(medidor):
+                while self.proxima():
+                    cliente_id = rnd.choice(self.alvos)
+                    if rnd.random() < self.options['pagamentos']:
+                        resultados.append(self.pagamento(cliente_http, rnd, cliente_id))
+                    else:
+                        resultados.append(self.nota(cliente_http, rnd, cliente_id))
+        except Exception as e:  # noqa: BLE001 - reporta e deixa as outras threads seguirem
+            self.stderr.write(f'Thread interrompida: {e!r}')
+        finally:
+            connections.close_all()
+            with self.trava:
+                self.resultados.extend(resultados)
+                self.esperas.extend(medidor.esperas)
+
+    def executar(self, tipo, cliente_http, url, dados):
+        inicio = time.perf_counter()
+        try:
+            resposta = cliente_http.post(url, dados)
+            resultado = 'ok' if resposta.status_code == 302 else 'rejeitada'
+        except DatabaseError as e:
+            resultado = classificar_erro(e)
+        return tipo, time.perf_counter() - inicio, resultado
+
+    def nota(self, cliente_http, rnd, cliente_id):
+        n_itens = rnd.randint(1, 3)
+        dados = {
+            'cliente': cliente_id, 'numero_nota': 'carga', 'data_nota': timezone.localdate().isoformat(),
+            'vencimento': '', 'itens-TOTAL_FORMS': n_itens, 'itens-INITIAL_FORMS': 0,
+            'itens-MIN_NUM_FORMS': 0, 'itens-MAX_NUM_FORMS': 1000,
+        }
+        for i in range(n_itens):
+            dados.update({
+                f'itens-{i}-descricao': 'Carga',
+                f'itens-{i}-quantidade': '1',
+                f'itens-{i}-preco_unitario': f'{rnd.randint(1, 500) / 100:.2f}',
+            })
+        return self.executar('nota', cliente_http, reverse('crediario:nota_create'), dados)
+
+    def pagamento(self, cliente_http, rnd, cliente_id):
+        abertas = list(
+            Nota.objects.filter(cliente_id=cliente_id, saldo_restante__gt=0)
+            .values_list('pk', 'saldo_restante')[:20]
+        )
+        if not abertas:
+            return self.nota(cliente_http, rnd, cliente_id)
+        nota_id, falta = rnd.choice(abertas)
+        valor = min(falta, Decimal(rnd.randint(1, 100)) / 100)
+        dados = {'cliente': cliente_id, 'nota': nota_id, 'valor_pagamento': str(valor), 'metodo': 'carga'}
+        return self.executar('pagamento', cliente_http, reverse('crediario:pagamento_create'), dados)
+
+    def montar_relatorio(self, duracao):
+        por_tipo = {}
+        for tipo, latencia, resultado in self.resultados:
+            dados = por_tipo.setdefault(tipo, {'latencias': [], 'resultados': {}})
+            dados['latencias'].append(latencia)
+            dados['resultados'][resultado] = dados['resultados'].get(resultado, 0) + 1
+
+        def ms(valor):
+            return None if valor is None else round(valor * 1000, 2)
+
+        return {
+            'gerado_em': timezone.now().isoformat(),
+            'banco': connection.vendor,
+            'threads': self.options['threads'],
+            'clientes': len(self.alvos),
+            'operacoes': len(self.resultados),
+            'duracao_s': round(duracao, 3),
+            'vazao_ops_s': round(len(self.resultados) / duracao, 2) if duracao else None,
+            'por_tipo': {
+                tipo: {
+                    'operacoes': len(dados['latencias']),
+                    'resultados': dados['resultados'],
+                    'p50_ms': ms(percentil(dados['latencias'], 50)),
+                    'p90_ms': ms(percentil(dados['latencias'], 90)),
+                    'p99_ms': ms(percentil(dados['latencias'], 99)),
+                    'max_ms': ms(max(dados['latencias'])),
+                }
+                for tipo, dados in sorted(por_tipo.items())
+            },
+            'deadlocks': sum(d['resultados'].get('deadlock', 0) for d in por_tipo.values()),
+            'travas': {
+                'consultas_for_update': len(self.esperas),
+                'espera_total_s': round(sum(self.esperas), 3),
+                'p99_ms': ms(percentil(self.esperas, 99)),
+                'max_ms': ms(max(self.esperas, default=None) if self.esperas else None),
+            },
+        }
+
+    def escrever(self, r):
+        self.stdout.write(
+            f"{r['operacoes']} operações em {r['duracao_s']}s — {r['vazao_ops_s']} ops/s "
+            f"({r['threads']} threads, {r['clientes']} clientes)"
+        )
+        for tipo, dados in r['por_tipo'].items():
+            resultados = ', '.join(f'{k}={v}' for k, v in sorted(dados['resultados'].items()))
+            self.stdout.write(
+                f"  {tipo}: {dados['operacoes']} ({resultados}) — p50 {dados['p50_ms']}ms, "
+                f"p90 {dados['p90_ms']}ms, p99 {dados['p99_ms']}ms, máx {dados['max_ms']}ms"
+            )
+        travas = r['travas']
+        self.stdout.write(
+            f"  travas: {travas['consultas_for_update']} SELECT FOR UPDATE, espera total {travas['espera_total_s']}s, "
+            f"p99 {travas['p99_ms']}ms"
+        )
+        estilo = self.style.ERROR if r['deadlocks'] else self.style.SUCCESS
+        self.stdout.write(estilo(f"Deadlocks: {r['deadlocks']}"))
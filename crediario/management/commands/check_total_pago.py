@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Round
+from crediario.models import AlocacaoArquivada, Nota, NotaArquivada, PagamentoArquivado
+from crediario.services import recalcular_pagamentos_notas, soma_pagamentos
+
+
+class Command(BaseCommand):
+    help = 'Confere total_pago/saldo_restante das notas contra a soma dos pagamentos (e alocações) e corrige divergências'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Corrige as notas divergentes')
+        parser.add_argument('--lote', type=int, default=1000, help='Notas corrigidas por transação')
+
+    def handle(self, *args, **options):
+        divergentes = self.divergentes(Nota.objects.annotate(pago_real=soma_pagamentos()))
+
+        ids = []
+        for pk, total_pago, pago_real in divergentes.iterator(chunk_size=2000):
+            self.stdout.write(f'Nota {pk}: total_pago={total_pago} pagamentos={pago_real}')
+            ids.append(pk)
+
+        if options['fix']:
+            lote = options['lote']
+            for i in range(0, len(ids), lote):
+                self.corrigir(ids[i:i + lote])
+
+        acao = 'corrigidas' if options['fix'] else 'divergentes'
+        self.stdout.write(self.style.SUCCESS(f'Notas {acao}: {len(ids)}'))
+
+        # o arquivo só é conferido: as notas de lá não são mais alteradas
+        arquivadas = self.divergentes(
+            NotaArquivada.objects.annotate(pago_real=soma_pagamentos(PagamentoArquivado, AlocacaoArquivada))
+        )
+        n = 0
+        for pk, total_pago, pago_real in arquivadas.iterator(chunk_size=2000):
+            self.stdout.write(f'Nota arquivada {pk}: total_pago={total_pago} pagamentos={pago_real}')
+            n += 1
+        self.stdout.write(self.style.SUCCESS(f'Notas arquivadas divergentes: {n}'))
+
+    def divergentes(self, notas):
+        return (
+            notas.filter(
+                # Round: no SQLite os decimais viram REAL e somas/subtrações deixam resíduo
+                ~Q(total_pago=Round(F('pago_real'), 2))
+                | ~Q(saldo_restante=Round(F('total') - F('pago_real'), 2))
+            )
+            .order_by('pk')
+            .values_list('pk', 'total_pago', 'pago_real')
+        )
+
+    def corrigir(self, ids):
+        with transaction.atomic():
+            notas = Nota.objects.filter(pk__in=ids)
+            # trava as notas para não competir com pagamentos em andamento
+            list(notas.select_for_update().values_list('pk', flat=True))
+            recalcular_pagamentos_notas(notas)
@@ -1,37 +1,83 @@
+import argparse
+from datetime import timedelta
 from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef
 from django.utils import timezone
-from datetime import timedelta
 from crediario.models import Nota, Notificacao
 
+TIPO_AVISO = Notificacao.TIPO_VENCIMENTO
+
+
+def lista_de_dias(valor):
+    """Converte '1,3,7' em [1, 3, 7] (ordenado, sem repetições)."""
+    try:
+        dias = sorted({int(d) for d in valor.split(',') if d.strip()})
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'lista de dias inválida: {valor!r}')
+    if not dias or any(d < 0 for d in dias):
+        raise argparse.ArgumentTypeError(f'lista de dias inválida: {valor!r}')
+    return dias
+
+
 class Command(BaseCommand):
-    help = 'Checa notas que vencem em X dias e cria notificações mock'
+    help = 'Checa notas que vencem em X dias e agenda notificações (enviadas por enviar_notificacoes)'
 
     def add_arguments(self, parser):
-        parser.add_argument('--dias', type=int, default=3, help='Dias até o vencimento')
+        parser.add_argument('--dias', type=lista_de_dias, default=[3],
+                            help='Dias até o vencimento, um ou vários separados por vírgula (ex.: 1,3,7)')
+        parser.add_argument('--lote', type=int, default=500, help='Notificações gravadas por transação')
 
     def handle(self, *args, **options):
         dias = options['dias']
-        target = timezone.localdate() + timedelta(days=dias)
-        notas = Nota.objects.filter(vencimento=target, status__in=['aberta','parcial'])
+        lote = options['lote']
+        hoje = timezone.localdate()
+        alvos = [hoje + timedelta(days=d) for d in dias]
+
+        agora = timezone.now()
+        inicio_dia = timezone.localtime(agora).replace(hour=0, minute=0, second=0, microsecond=0)
+
+        # uma notificação por nota por dia: anti-join com as criadas hoje
+        # (criado_em, pois o despachante reagenda data_agendada em caso de falha)
+        ja_avisadas = Notificacao.objects.filter(
+            nota=OuterRef('pk'),
+            tipo=TIPO_AVISO,
+            criado_em__gte=inicio_dia,
+            criado_em__lt=inicio_dia + timedelta(days=1),
+        )
+        notas = (
+            Nota.objects.filter(vencimento__in=alvos, status__in=[Nota.STATUS_ABERTA, Nota.STATUS_PARCIAL])
+            .exclude(Exists(ja_avisadas))
+            .select_related('cliente')
+            .only('id', 'total', 'vencimento', 'cliente__id', 'cliente__nome', 'cliente__telefone')
+            .order_by('pk')
+        )
+
         created = 0
-        for n in notas:
-            exists = Notificacao.objects.filter(nota=n, tipo='vencimento_aviso', data_agendada__date=target).exists()
-            if exists:
-                continue
-            conteudo = f"Olá {n.cliente.nome}, sua nota #{n.id} de R$ {n.total} vence em {n.vencimento}."
-            noti = Notificacao.objects.create(
+        ultimo_id = 0
+        while True:
+            # paginação por PK: cada lote é uma consulta curta e independente
+            bloco = list(notas.filter(pk__gt=ultimo_id)[:lote])
+            if not bloco:
+                break
+            ultimo_id = bloco[-1].pk
+            created += self.processar_lote(bloco, agora)
+
+        self.stdout.write(self.style.SUCCESS(f'Notificações agendadas: {created}'))
+
+    def processar_lote(self, notas, agora):
+        notificacoes = [
+            Notificacao(
                 cliente=n.cliente,
                 nota=n,
-                tipo='vencimento_aviso',
+                tipo=TIPO_AVISO,
                 canal='log',
                 destinatario=n.cliente.telefone or '',
-                conteudo=conteudo,
-                status='pendente',
-                data_agendada=timezone.now()
+                conteudo=f"Olá {n.cliente.nome}, sua nota #{n.id} de R$ {n.total} vence em {n.vencimento}.",
+                status=Notificacao.STATUS_PENDENTE,
+                data_agendada=agora,
             )
-            print("MOCK enviar:", noti.destinatario, "|", noti.conteudo)
-            noti.status = 'enviada'
-            noti.enviado_em = timezone.now()
-            noti.save(update_fields=['status', 'enviado_em'])
-            created += 1
-        self.stdout.write(self.style.SUCCESS(f'Notificações processadas: {created}'))
\ No newline at end of file
+            for n in notas
+        ]
+        # o envio fica com o comando enviar_notificacoes
+        Notificacao.objects.bulk_create(notificacoes)
+        return len(notificacoes)
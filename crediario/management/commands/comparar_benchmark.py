@@ -0,0 +1,44 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Compara dois relatórios de benchmark (logs/benchmark.json) gerados pelos testes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('antes')
+        parser.add_argument('depois')
+        parser.add_argument('--tolerancia', type=float, default=0.25,
+                            help='Aumento relativo de tempo aceito antes de marcar como piora (padrão 0.25)')
+
+    def carregar(self, caminho):
+        try:
+            with open(caminho, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'{caminho}: {e}')
+
+    def handle(self, *args, **options):
+        antes = self.carregar(options['antes'])
+        depois = self.carregar(options['depois'])
+        self.stdout.write(f"{antes.get('commit')} -> {depois.get('commit')}")
+
+        pioras = 0
+        nomes = sorted(set(antes['resultados']) | set(depois['resultados']))
+        for nome in nomes:
+            a = antes['resultados'].get(nome)
+            d = depois['resultados'].get(nome)
+            if a is None or d is None:
+                self.stdout.write(f"{nome}: {'novo' if a is None else 'removido'}")
+                continue
+            piorou = d['consultas'] > a['consultas'] or (
+                a['segundos'] and d['segundos'] > a['segundos'] * (1 + options['tolerancia'])
+            )
+            pioras += piorou
+            linha = (
+                f"{nome}: consultas {a['consultas']} -> {d['consultas']}, "
+                f"tempo {a['segundos'] * 1000:.1f}ms -> {d['segundos'] * 1000:.1f}ms"
+            )
+            self.stdout.write(self.style.WARNING(linha) if piorou else linha)
+
+        self.stdout.write(self.style.SUCCESS(f'Pioras: {pioras}') if not pioras else self.style.ERROR(f'Pioras: {pioras}'))
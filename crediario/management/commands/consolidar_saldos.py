@@ -0,0 +1,16 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from crediario.lancamentos import consolidar_saldos
+
+
+class Command(BaseCommand):
+    help = 'Incorpora os lançamentos recentes ao saldo_devedor dos clientes (checkpoint do livro)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--margem', type=int, default=600,
+                            help='Só consolida lançamentos mais antigos que N segundos')
+        parser.add_argument('--lote', type=int, default=1000, help='Clientes por UPDATE')
+
+    def handle(self, *args, **options):
+        total = consolidar_saldos(margem=timedelta(seconds=options['margem']), lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'Clientes consolidados: {total}'))
@@ -0,0 +1,26 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from crediario.notificacoes import despachar
+
+
+class Command(BaseCommand):
+    help = 'Envia as notificações pendentes (pode rodar em vários processos ao mesmo tempo)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=100, help='Notificações reservadas por vez')
+        parser.add_argument('--concorrencia', type=int, default=10, help='Envios simultâneos por lote')
+        parser.add_argument('--timeout', type=float, default=30, help='Tempo máximo de cada envio (segundos)')
+        parser.add_argument('--max-tentativas', type=int, default=5, help='Tentativas antes de marcar como falhou')
+        parser.add_argument('--backoff', type=int, default=60, help='Espera base entre tentativas (segundos)')
+        parser.add_argument('--max-lotes', type=int, default=None, help='Para depois de N lotes')
+
+    def handle(self, *args, **options):
+        enviadas, falhas = despachar(
+            tamanho_lote=options['lote'],
+            concorrencia=options['concorrencia'],
+            timeout=options['timeout'],
+            max_tentativas=options['max_tentativas'],
+            backoff=timedelta(seconds=options['backoff']),
+            max_lotes=options['max_lotes'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Notificações enviadas: {enviadas} — falhas: {falhas}'))
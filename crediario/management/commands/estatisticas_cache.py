@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from crediario.cache import estatisticas, zerar_estatisticas
+
+
+class Command(BaseCommand):
+    help = 'Mostra acertos e falhas do cache das páginas de nota e cliente'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--zerar', action='store_true', help='Zera os contadores depois de mostrar')
+
+    def handle(self, *args, **options):
+        for tipo, contadores in estatisticas().items():
+            total = contadores['hits'] + contadores['misses']
+            taxa = f'{100 * contadores["hits"] / total:.1f}%' if total else '-'
+            self.stdout.write(f'{tipo}: hits={contadores["hits"]} misses={contadores["misses"]} taxa={taxa}')
+        if options['zerar']:
+            zerar_estatisticas()
+            self.stdout.write(self.style.SUCCESS('Contadores zerados'))
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from crediario.exportacao import TAMANHO_LOTE, TIPOS, linhas_csv
+from crediario.replicas import somente_leitura
+
+
+def _data(valor):
+    if valor is None:
+        return None
+    data = parse_date(valor)
+    if data is None:
+        raise CommandError(f'Data inválida: {valor} (use AAAA-MM-DD)')
+    return data
+
+
+class Command(BaseCommand):
+    help = 'Exporta notas, itens ou pagamentos em CSV para a contabilidade'
+
+    def add_arguments(self, parser):
+        parser.add_argument('tipo', choices=TIPOS)
+        parser.add_argument('--saida', default='-', help="Arquivo de saída ('-' para stdout)")
+        parser.add_argument('--cliente', type=int, help='Só deste cliente (id)')
+        parser.add_argument('--status', help='Só notas com este status')
+        parser.add_argument('--de', help='Data inicial (AAAA-MM-DD)')
+        parser.add_argument('--ate', help='Data final (AAAA-MM-DD)')
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help='Linhas lidas do banco por vez')
+
+    def handle(self, *args, **options):
+        # lê de uma réplica, se houver (DB_REPLICAS)
+        with somente_leitura():
+            linhas = linhas_csv(
+                options['tipo'],
+                tamanho_lote=options['lote'],
+                cliente=options['cliente'],
+                status=options['status'],
+                de=_data(options['de']),
+                ate=_data(options['ate']),
+            )
+        if options['saida'] == '-':
+            for linha in linhas:
+                self.stdout.write(linha, ending='')
+            return
+
+        total = -1  # sem contar o cabeçalho
+        with open(options['saida'], 'w', encoding='utf-8', newline='') as f:
+            for linha in linhas:
+                f.write(linha)
+                total += 1
+        self.stdout.write(self.style.SUCCESS(f'{total} linhas exportadas em {options["saida"]}'))
@@ -0,0 +1,68 @@
+import os
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from crediario.anexos import caminho_da_miniatura
+from crediario.cache import invalidar_notas
+from crediario.models import Anexo
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow é opcional: sem ele o comando só avisa
+    Image = None
+
+
+class Command(BaseCommand):
+    help = 'Gera as miniaturas JPEG dos anexos de imagem que ainda não têm (rodar periodicamente)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanho', type=int, default=320, help='Lado maior da miniatura, em pixels')
+        parser.add_argument('--lote', type=int, default=200, help='Anexos lidos por vez')
+
+    def handle(self, *args, **options):
+        if Image is None:
+            raise CommandError('Pillow não está instalado (pip install Pillow)')
+
+        pendentes = (
+            Anexo.objects.filter(miniatura_gerada=False, sha256__isnull=False, mime_type__startswith='image/')
+            .order_by('pk')
+            .values_list('pk', 'sha256', 'arquivo')
+        )
+        geradas = falhas = 0
+        ultimo_id = 0
+        feitos = set()
+        while True:
+            bloco = list(pendentes.filter(pk__gt=ultimo_id)[:options['lote']])
+            if not bloco:
+                break
+            ultimo_id = bloco[-1][0]
+            for _, sha256, nome in bloco:
+                if sha256 in feitos:
+                    continue
+                feitos.add(sha256)
+                try:
+                    self.gerar(nome, sha256, options['tamanho'])
+                except (OSError, ValueError) as e:
+                    # ex.: HEIC sem plugin, arquivo corrompido
+                    falhas += 1
+                    self.stderr.write(f'{nome}: {e}')
+                    continue
+                # o mesmo conteúdo pode estar em vários anexos/notas
+                notas = list(Anexo.objects.filter(sha256=sha256).values_list('nota_id', flat=True))
+                Anexo.objects.filter(sha256=sha256).update(miniatura_gerada=True)
+                invalidar_notas(notas)
+                geradas += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Miniaturas geradas: {geradas} — falhas: {falhas}'))
+
+    def gerar(self, nome, sha256, tamanho):
+        destino = default_storage.path(caminho_da_miniatura(sha256))
+        if not os.path.exists(destino):
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            with Image.open(default_storage.path(nome)) as imagem:
+                # reduz na decodificação quando o formato permite (JPEG)
+                imagem.draft('RGB', (tamanho, tamanho))
+                imagem = ImageOps.exif_transpose(imagem).convert('RGB')
+                imagem.thumbnail((tamanho, tamanho))
+                temporario = destino + '.tmp'
+                imagem.save(temporario, 'JPEG', quality=80, optimize=True)
+            os.replace(temporario, destino)
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+from crediario.importacao import ORDEM_ARQUIVOS, Estado, EstadoIncompativel, Importador
+from crediario.models import ImportacaoEstado
+
+
+class Command(BaseCommand):
+    help = 'Importa clientes, notas, itens e pagamentos de arquivos CSV (ver crediario/importacao.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', help='CSV de clientes')
+        parser.add_argument('--notas', help='CSV de notas')
+        parser.add_argument('--itens', help='CSV de itens das notas')
+        parser.add_argument('--pagamentos', help='CSV de pagamentos')
+        parser.add_argument('--lote', type=int, default=2000, help='Linhas por transação')
+        parser.add_argument('--estado', default='importacao',
+                            help='Nome do progresso salvo no banco; rodar de novo com os mesmos arquivos retoma a importação')
+        parser.add_argument('--recomecar', action='store_true',
+                            help='Descarta o progresso salvo em --estado antes de começar')
+
+    def handle(self, *args, **options):
+        arquivos = [(tipo, options[tipo]) for tipo in ORDEM_ARQUIVOS if options[tipo]]
+        if not arquivos:
+            raise CommandError('Informe ao menos um arquivo (--clientes, --notas, --itens, --pagamentos).')
+
+        self.verbosity = options['verbosity']
+        if options['recomecar']:
+            ImportacaoEstado.objects.filter(chave=options['estado']).delete()
+        try:
+            estado = Estado(options['estado'], arquivos)
+        except EstadoIncompativel as e:
+            raise CommandError(f'{e}. Use outro --estado, ou --recomecar para descartar o progresso.')
+        except OSError as e:
+            raise CommandError(str(e))
+        importador = Importador(estado, lote=options['lote'], relatar=self.relatar)
+        for tipo, caminho in arquivos:
+            linhas, segundos = importador.importar_arquivo(tipo, caminho)
+            taxa = linhas / segundos if segundos else 0
+            self.stdout.write(f'{tipo}: {linhas} linhas em {segundos:.1f}s ({taxa:.0f} linhas/s)')
+
+        self.stdout.write('Recalculando totais, status e saldos...')
+        importador.recalcular()
+        self.stdout.write(self.style.SUCCESS(f'Importação concluída — linhas rejeitadas: {importador.rejeitadas}'))
+
+    def relatar(self, mensagem):
+        if self.verbosity >= 2 or 'ignorada' in mensagem:
+            self.stdout.write(mensagem)
@@ -0,0 +1,55 @@
+import csv
+import json
+from django.core.management.base import BaseCommand, CommandError
+from crediario.lote_pagamentos import ACEITO, CLIENTES_POR_TRANSACAO, registrar_lote
+
+
+class Command(BaseCommand):
+    help = (
+        'Lança pagamentos em lote a partir de CSV ou JSON (colunas cliente_id, nota_id, valor_pagamento, '
+        'data_pagamento, metodo, ref)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Arquivo .csv ou .json (lista de objetos ou {"pagamentos": [...]})')
+        parser.add_argument('--clientes-por-transacao', type=int, default=CLIENTES_POR_TRANSACAO,
+                            help='Clientes travados e gravados por transação')
+        parser.add_argument('--relatorio', help="Grava o resultado de cada pagamento em JSON ('-' para stdout)")
+
+    def handle(self, *args, **options):
+        entradas = self.ler(options['arquivo'])
+        resultados = registrar_lote(entradas, clientes_por_transacao=options['clientes_por_transacao'])
+
+        for r in resultados:
+            if r.status != ACEITO:
+                ref = f' ({r.ref})' if r.ref else ''
+                self.stdout.write(f'Linha {r.indice + 1}{ref}: {r.erro}')
+
+        if options['relatorio']:
+            dados = json.dumps([r.como_dict() for r in resultados], indent=2)
+            if options['relatorio'] == '-':
+                self.stdout.write(dados)
+            else:
+                with open(options['relatorio'], 'w', encoding='utf-8') as f:
+                    f.write(dados)
+
+        aceitos = sum(1 for r in resultados if r.status == ACEITO)
+        self.stdout.write(self.style.SUCCESS(
+            f'Pagamentos aceitos: {aceitos} — recusados: {len(resultados) - aceitos}'
+        ))
+
+    def ler(self, caminho):
+        try:
+            with open(caminho, encoding='utf-8-sig', newline='') as f:
+                if caminho.lower().endswith('.csv'):
+                    return list(csv.DictReader(f))
+                dados = json.load(f)
+        except OSError as e:
+            raise CommandError(f'Não foi possível ler {caminho}: {e}')
+        except ValueError as e:
+            raise CommandError(f'JSON inválido em {caminho}: {e}')
+        if isinstance(dados, dict):
+            dados = dados.get('pagamentos')
+        if not isinstance(dados, list):
+            raise CommandError('Esperada uma lista de pagamentos')
+        return dados
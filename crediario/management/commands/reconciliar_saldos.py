@@ -0,0 +1,88 @@
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Max, Min
+from django.utils import timezone
+from crediario.models import Cliente
+from crediario.reconciliacao import corrigir, verificar_faixa
+
+
+def _iniciar_worker():
+    django.setup()
+
+
+def _verificar(faixa):
+    try:
+        return verificar_faixa(*faixa)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Confere o saldo de cada cliente contra notas - pagamentos e corrige divergências com lançamentos de ajuste'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Só reporta, não corrige')
+        parser.add_argument('--lote', type=int, default=5000, help='Tamanho da faixa de ids de cliente por tarefa')
+        parser.add_argument('--workers', type=int, default=1, help='Processos em paralelo')
+        parser.add_argument('--relatorio', help="Grava o relatório em JSON neste arquivo ('-' para stdout)")
+
+    def handle(self, *args, **options):
+        inicio_execucao = time.monotonic()
+        limites = Cliente.objects.aggregate(min=Min('pk'), max=Max('pk'))
+        faixas = []
+        if limites['min'] is not None:
+            lote = options['lote']
+            faixas = [(i, i + lote) for i in range(limites['min'], limites['max'] + 1, lote)]
+
+        workers = options['workers']
+        if workers > 1 and len(faixas) > 1:
+            # nada de conexões herdadas pelos processos filhos
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_worker) as pool:
+                resultados = list(pool.map(_verificar, faixas))
+        else:
+            resultados = [verificar_faixa(*faixa) for faixa in faixas]
+
+        verificados = sum(r[0] for r in resultados)
+        divergencias = [d for r in resultados for d in r[1]]
+        for cliente_id, atual, esperado in divergencias:
+            self.stdout.write(f'Cliente {cliente_id}: saldo={atual} esperado={esperado} diferença={esperado - atual}')
+
+        corrigidos = 0
+        if not options['dry_run']:
+            lote = options['lote']
+            for i in range(0, len(divergencias), lote):
+                corrigidos += corrigir(divergencias[i:i + lote])
+
+        if options['relatorio']:
+            self.gravar_relatorio(options['relatorio'], {
+                'gerado_em': timezone.now().isoformat(),
+                'dry_run': options['dry_run'],
+                'clientes_verificados': verificados,
+                'corrigidos': corrigidos,
+                'duracao_s': round(time.monotonic() - inicio_execucao, 3),
+                'divergencias': [
+                    {
+                        'cliente_id': cliente_id,
+                        'saldo_atual': str(atual),
+                        'saldo_esperado': str(esperado),
+                        'diferenca': str(esperado - atual),
+                    }
+                    for cliente_id, atual, esperado in divergencias
+                ],
+            })
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Clientes verificados: {verificados} — divergentes: {len(divergencias)} — corrigidos: {corrigidos}'
+        ))
+
+    def gravar_relatorio(self, destino, relatorio):
+        if destino == '-':
+            self.stdout.write(json.dumps(relatorio, indent=2))
+            return
+        with open(destino, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, indent=2)
@@ -0,0 +1,50 @@
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from crediario.semeadura import Distribuicao, semear
+
+
+class Command(BaseCommand):
+    help = 'Gera clientes, notas, itens e pagamentos sintéticos em massa (bulk insert), para testes de carga'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, default=1000)
+        parser.add_argument('--notas-min', type=int, default=1, help='Mínimo de notas por cliente')
+        parser.add_argument('--notas-max', type=int, default=40, help='Máximo de notas por cliente')
+        parser.add_argument('--notas-distribuicao', choices=['uniforme', 'pareto'], default='uniforme')
+        parser.add_argument('--itens-min', type=int, default=1)
+        parser.add_argument('--itens-max', type=int, default=5)
+        parser.add_argument('--preco-max', type=Decimal, default=Decimal('50.00'))
+        parser.add_argument('--pagas', type=float, default=0.5, help='Fração de notas quitadas')
+        parser.add_argument('--parciais', type=float, default=0.25, help='Fração de notas pagas pela metade')
+        parser.add_argument('--dias', type=int, default=365, help='Dias de histórico')
+        parser.add_argument('--bloco', type=int, default=1000, help='Clientes por transação')
+        parser.add_argument('--semente', type=int, default=42)
+
+    def handle(self, *args, **options):
+        dist = Distribuicao(
+            notas_min=options['notas_min'],
+            notas_max=options['notas_max'],
+            notas_distribuicao=options['notas_distribuicao'],
+            itens_min=options['itens_min'],
+            itens_max=options['itens_max'],
+            preco_max=options['preco_max'],
+            pagas=options['pagas'],
+            parciais=options['parciais'],
+            dias_historico=options['dias'],
+        )
+        inicio = time.monotonic()
+
+        def progresso(contagens):
+            if options['verbosity'] >= 2:
+                self.stdout.write(f"{contagens['clientes']} clientes ({time.monotonic() - inicio:.1f}s)")
+
+        contagens = semear(options['clientes'], dist, semente=options['semente'],
+                           bloco=options['bloco'], progresso=progresso)
+        duracao = time.monotonic() - inicio
+        total = sum(contagens.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Gerados {contagens['clientes']} clientes, {contagens['notas']} notas, "
+            f"{contagens['itens']} itens e {contagens['pagamentos']} pagamentos "
+            f"em {duracao:.1f}s ({total / duracao if duracao else 0:.0f} linhas/s)"
+        ))
@@ -0,0 +1,210 @@
+# crediario/metricas.py
+"""
+Métricas por requisição: latência da view, número de consultas, tempo total
+de SQL (medido com connection.execute_wrapper) e as consultas mais lentas.
+
+Ligado por METRICAS=True (ver core/settings.py), que põe MetricasMiddleware
+no topo do MIDDLEWARE. Requisições acima de CREDIARIO_METRICAS_LIMITE_MS vão
+para o logger 'crediario.lentas' como uma linha JSON. Os agregados (contadores
+e histogramas por view) ficam em memória no processo e são expostos em
+/metricas/ no formato texto do Prometheus; com vários workers, cada um expõe
+os seus.
+
+O custo por consulta é uma chamada de função e dois perf_counter(); as mais
+lentas são mantidas num heap de tamanho fixo. Em respostas em streaming só
+conta o que roda antes da resposta ser devolvida.
+"""
+import heapq
+import json
+import logging
+import threading
+import time
+from contextlib import ExitStack
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('crediario.lentas')
+
+# limites (em segundos) dos buckets dos histogramas
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MAIS_LENTAS = 5
+TAMANHO_SQL = 500
+
+
+class ColetorSQL:
+    """execute_wrapper que conta consultas, soma o tempo e guarda as mais lentas."""
+
+    def __init__(self):
+        self.consultas = 0
+        self.segundos = 0.0
+        self._lentas = []  # heap de (segundos, ordem, sql)
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracao = time.perf_counter() - inicio
+            self.consultas += 1
+            self.segundos += duracao
+            item = (duracao, self.consultas, sql)
+            if len(self._lentas) < MAIS_LENTAS:
+                heapq.heappush(self._lentas, item)
+            elif duracao > self._lentas[0][0]:
+                heapq.heapreplace(self._lentas, item)
+
+    def mais_lentas(self):
+        return [
+            {'sql': sql[:TAMANHO_SQL], 'ms': round(segundos * 1000, 2)}
+            for segundos, _, sql in sorted(self._lentas, reverse=True)
+        ]
+
+
+class Histograma:
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.soma = 0.0
+        self.contagem = 0
+
+    def observar(self, valor):
+        self.soma += valor
+        self.contagem += 1
+        for i, limite in enumerate(BUCKETS):
+            if valor <= limite:
+                self.buckets[i] += 1
+                break
+
+
+class Registro:
+    """Agregados do processo, protegidos por um lock (views rodam em threads)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.limpar()
+
+    def limpar(self):
+        self.requisicoes = {}   # (view, método, status) -> n
+        self.latencia = {}      # view -> Histograma
+        self.sql = {}           # view -> Histograma
+        self.consultas = {}     # view -> n
+        self.lentas = {}        # view -> n
+
+    def registrar(self, view, metodo, status, duracao, coletor, lenta):
+        with self.lock:
+            chave = (view, metodo, str(status))
+            self.requisicoes[chave] = self.requisicoes.get(chave, 0) + 1
+            self.latencia.setdefault(view, Histograma()).observar(duracao)
+            self.sql.setdefault(view, Histograma()).observar(coletor.segundos)
+            self.consultas[view] = self.consultas.get(view, 0) + coletor.consultas
+            if lenta:
+                self.lentas[view] = self.lentas.get(view, 0) + 1
+
+    def prometheus(self):
+        """Agregados no formato texto de exposição do Prometheus."""
+        with self.lock:
+            linhas = []
+            linhas += [
+                '# HELP crediario_requisicoes_total Requisições por view, método e status.',
+                '# TYPE crediario_requisicoes_total counter',
+            ]
+            for (view, metodo, status), n in sorted(self.requisicoes.items()):
+                linhas.append(
+                    f'crediario_requisicoes_total{{view="{view}",metodo="{metodo}",status="{status}"}} {n}'
+                )
+            linhas += _histograma('crediario_requisicao_segundos', 'Latência da view.', self.latencia)
+            linhas += _histograma('crediario_sql_segundos', 'Tempo total de SQL por requisição.', self.sql)
+            linhas += [
+                '# HELP crediario_sql_consultas_total Consultas SQL executadas.',
+                '# TYPE crediario_sql_consultas_total counter',
+            ]
+            linhas += [f'crediario_sql_consultas_total{{view="{v}"}} {n}' for v, n in sorted(self.consultas.items())]
+            linhas += [
+                '# HELP crediario_requisicoes_lentas_total Requisições acima do limite do log de lentas.',
+                '# TYPE crediario_requisicoes_lentas_total counter',
+            ]
+            linhas += [f'crediario_requisicoes_lentas_total{{view="{v}"}} {n}' for v, n in sorted(self.lentas.items())]
+        return '\n'.join(linhas) + '\n'
+
+
+def _histograma(nome, ajuda, por_view):
+    linhas = [f'# HELP {nome} {ajuda}', f'# TYPE {nome} histogram']
+    for view, h in sorted(por_view.items()):
+        acumulado = 0
+        for limite, n in zip(BUCKETS, h.buckets):
+            acumulado += n
+            linhas.append(f'{nome}_bucket{{view="{view}",le="{limite}"}} {acumulado}')
+        linhas.append(f'{nome}_bucket{{view="{view}",le="+Inf"}} {h.contagem}')
+        linhas.append(f'{nome}_sum{{view="{view}"}} {h.soma:.6f}')
+        linhas.append(f'{nome}_count{{view="{view}"}} {h.contagem}')
+    return linhas
+
+
+registro = Registro()
+
+
+def _limite():
+    return getattr(settings, 'CREDIARIO_METRICAS_LIMITE_MS', 500) / 1000
+
+
+def _nome_da_view(request):
+    # o nome da rota, não o caminho: mantém a cardinalidade dos rótulos baixa
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'nao_resolvida'
+
+
+class MetricasMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def _instalar(pilha, coletor):
+        for conexao in connections.all():
+            pilha.enter_context(conexao.execute_wrapper(coletor))
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        coletor = ColetorSQL()
+        inicio = time.perf_counter()
+        with ExitStack() as pilha:
+            self._instalar(pilha, coletor)
+            response = self.get_response(request)
+        self.registrar(request, response, time.perf_counter() - inicio, coletor)
+        return response
+
+    async def __acall__(self, request):
+        coletor = ColetorSQL()
+        inicio = time.perf_counter()
+        # as conexões são por thread e o ORM assíncrono (e as views síncronas)
+        # roda as consultas na thread de sync_to_async desta requisição, não
+        # na do event loop: o wrapper tem de ser instalado (e tirado) lá
+        pilha = ExitStack()
+        await sync_to_async(self._instalar)(pilha, coletor)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(pilha.close)()
+        self.registrar(request, response, time.perf_counter() - inicio, coletor)
+        return response
+
+    def registrar(self, request, response, duracao, coletor):
+        view = _nome_da_view(request)
+        lenta = duracao >= _limite()
+        registro.registrar(view, request.method, response.status_code, duracao, coletor, lenta)
+        if lenta:
+            logger.warning(json.dumps({
+                'metodo': request.method,
+                'caminho': request.path,
+                'view': view,
+                'status': response.status_code,
+                'duracao_ms': round(duracao * 1000, 2),
+                'consultas': coletor.consultas,
+                'sql_ms': round(coletor.segundos * 1000, 2),
+                'mais_lentas': coletor.mais_lentas(),
+            }, ensure_ascii=False))
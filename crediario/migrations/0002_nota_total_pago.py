@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:46
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def preencher_total_pago(apps, schema_editor):
+    Nota = apps.get_model('crediario', 'Nota')
+    Pagamento = apps.get_model('crediario', 'Pagamento')
+    soma = (
+        Pagamento.objects.filter(nota=OuterRef('pk'))
+        .values('nota')
+        .annotate(s=Sum('valor_pagamento'))
+        .values('s')
+    )
+    zero = Value(Decimal('0.00'), output_field=models.DecimalField(max_digits=12, decimal_places=2))
+    Nota.objects.update(total_pago=Coalesce(Subquery(soma), zero))
+    Nota.objects.update(saldo_restante=F('total') - F('total_pago'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crediario', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='nota',
+            name='saldo_restante',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='nota',
+            name='total_pago',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12),
+        ),
+        migrations.RunPython(preencher_total_pago, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:48
+
+from django.db import migrations, models
+
+
+# Índice de prefixo case-insensitive (nome__istartswith) só existe com
+# operator classes do PostgreSQL; nos outros bancos a busca continua
+# funcionando, apenas sem esse índice. telefone__startswith já usa o índice
+# _like que o Django cria no PostgreSQL para o db_index=True de telefone.
+INDICES_POSTGRES = [
+    ('idx_clientes_nome_busca', 'clientes', 'UPPER(nome) text_pattern_ops'),
+]
+
+
+def criar_indices_busca(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for nome, tabela, expressao in INDICES_POSTGRES:
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {nome} ON {tabela} ({expressao})')
+
+
+def remover_indices_busca(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for nome, _tabela, _expressao in INDICES_POSTGRES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {nome}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crediario', '0002_nota_total_pago'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['nome', 'id'], name='idx_clientes_nome_id'),
+        ),
+        migrations.AddIndex(
+            model_name='nota',
+            index=models.Index(fields=['numero_nota'], name='idx_notas_numero', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.RunPython(criar_indices_busca, remover_indices_busca),
+    ]
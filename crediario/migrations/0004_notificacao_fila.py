@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crediario', '0003_indices_busca'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notificacao',
+            index=models.Index(fields=['status', 'data_agendada'], name='idx_notif_status_agendada'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crediario', '0004_notificacao_fila'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='nota',
+            name='idx_notas_status_data',
+        ),
+        migrations.AddIndex(
+            model_name='nota',
+            index=models.Index(fields=['data_nota', 'id'], name='idx_notas_data_id'),
+        ),
+        migrations.AddIndex(
+            model_name='nota',
+            index=models.Index(fields=['status', 'data_nota', 'id'], name='idx_notas_status_data'),
+        ),
+    ]
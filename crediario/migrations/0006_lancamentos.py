@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crediario', '0005_indices_listagem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cliente',
+            name='saldo_lancamento_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='Lancamento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=20)),
+                ('valor', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lancamentos', to='crediario.cliente')),
+                ('nota', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='lancamentos', to='crediario.nota')),
+                ('pagamento', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='lancamentos', to='crediario.pagamento')),
+            ],
+            options={
+                'db_table': 'lancamentos',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['cliente', 'id'], name='idx_lancamentos_cliente_id')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crediario', '0006_lancamentos'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='pagamento',
+            name='idx_pagamentos_cliente',
+        ),
+        migrations.AddIndex(
+            model_name='nota',
+            index=models.Index(fields=['cliente', 'data_nota', 'id'], name='idx_notas_cliente_data'),
+        ),
+        migrations.AddIndex(
+            model_name='pagamento',
+            index=models.Index(fields=['cliente', 'data_pagamento', 'id'], name='idx_pagamentos_cliente_data'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crediario', '0007_indices_extrato'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notificacao',
+            index=models.Index(fields=['data_agendada', 'id'], name='idx_notif_agendada_id'),
+        ),
+        migrations.AddIndex(
+            model_name='pagamento',
+            index=models.Index(fields=['data_pagamento', 'id'], name='idx_pagamentos_data_id'),
+        ),
+    ]
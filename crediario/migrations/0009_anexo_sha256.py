@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crediario', '0008_indices_admin'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='anexo',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='anexo',
+            constraint=models.UniqueConstraint(fields=('nota', 'sha256'), name='uniq_anexo_nota_sha256'),
+        ),
+    ]
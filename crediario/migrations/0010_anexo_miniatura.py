@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crediario', '0009_anexo_sha256'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='anexo',
+            name='miniatura_gerada',
+            field=models.BooleanField(default=False),
+        ),
+    ]
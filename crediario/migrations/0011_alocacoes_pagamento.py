@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crediario', '0010_anexo_miniatura'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlocacaoPagamento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('valor', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('nota', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alocacoes', to='crediario.nota')),
+                ('pagamento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alocacoes', to='crediario.pagamento')),
+            ],
+            options={
+                'db_table': 'alocacoes_pagamento',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['nota'], name='idx_alocacoes_nota'), models.Index(fields=['pagamento'], name='idx_alocacoes_pagamento')],
+            },
+        ),
+    ]
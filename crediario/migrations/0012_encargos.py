@@ -0,0 +1,40 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:22
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crediario', '0011_alocacoes_pagamento'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='nota',
+            name='total_encargos',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12),
+        ),
+        migrations.CreateModel(
+            name='Encargo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=10)),
+                ('data', models.DateField()),
+                ('base', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('dias', models.IntegerField(default=0)),
+                ('valor', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='encargos', to='crediario.cliente')),
+                ('nota', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='encargos', to='crediario.nota')),
+            ],
+            options={
+                'db_table': 'encargos',
+                'ordering': ['data', 'id'],
+                'indexes': [models.Index(fields=['cliente', 'data', 'id'], name='idx_encargos_cliente_data')],
+                'constraints': [models.UniqueConstraint(fields=('nota', 'tipo', 'data'), name='uniq_encargo_nota_tipo_data')],
+            },
+        ),
+    ]
@@ -0,0 +1,151 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:27
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crediario', '0012_encargos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotaArquivada',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('numero_nota', models.CharField(blank=True, max_length=50, null=True)),
+                ('data_nota', models.DateField()),
+                ('vencimento', models.DateField(blank=True, null=True)),
+                ('total', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('total_pago', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('saldo_restante', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('total_encargos', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('status', models.CharField(max_length=20)),
+                ('criado_em', models.DateTimeField()),
+                ('atualizado_em', models.DateTimeField()),
+                ('arquivada_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('cliente', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='notas_arquivadas', to='crediario.cliente')),
+            ],
+            options={
+                'db_table': 'notas_arquivo',
+                'ordering': ['-data_nota'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ItemNotaArquivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('descricao', models.TextField()),
+                ('quantidade', models.DecimalField(decimal_places=4, max_digits=18)),
+                ('preco_unitario', models.DecimalField(decimal_places=4, max_digits=18)),
+                ('subtotal', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('criado_em', models.DateTimeField()),
+                ('nota', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='itens', to='crediario.notaarquivada')),
+            ],
+            options={
+                'db_table': 'itens_nota_arquivo',
+                'ordering': ['criado_em'],
+            },
+        ),
+        migrations.CreateModel(
+            name='EncargoArquivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('tipo', models.CharField(max_length=10)),
+                ('data', models.DateField()),
+                ('base', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('dias', models.IntegerField()),
+                ('valor', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('criado_em', models.DateTimeField()),
+                ('cliente', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='encargos_arquivados', to='crediario.cliente')),
+                ('nota', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='encargos', to='crediario.notaarquivada')),
+            ],
+            options={
+                'db_table': 'encargos_arquivo',
+                'ordering': ['data', 'id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='AnexoArquivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('arquivo', models.FileField(upload_to='notas/')),
+                ('mime_type', models.CharField(blank=True, max_length=100, null=True)),
+                ('tamanho_bytes', models.BigIntegerField(blank=True, null=True)),
+                ('sha256', models.CharField(blank=True, db_index=True, max_length=64, null=True)),
+                ('miniatura_gerada', models.BooleanField(default=False)),
+                ('criado_em', models.DateTimeField()),
+                ('nota', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='anexos', to='crediario.notaarquivada')),
+            ],
+            options={
+                'db_table': 'anexos_arquivo',
+                'ordering': ['-criado_em'],
+            },
+        ),
+        migrations.CreateModel(
+            name='NotificacaoArquivada',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('tipo', models.CharField(max_length=50)),
+                ('canal', models.CharField(max_length=20)),
+                ('destinatario', models.CharField(blank=True, max_length=200, null=True)),
+                ('conteudo', models.TextField(blank=True, null=True)),
+                ('status', models.CharField(max_length=20)),
+                ('tentativa', models.IntegerField()),
+                ('data_agendada', models.DateTimeField(blank=True, null=True)),
+                ('criado_em', models.DateTimeField()),
+                ('enviado_em', models.DateTimeField(blank=True, null=True)),
+                ('cliente', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='crediario.cliente')),
+                ('nota', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notificacoes', to='crediario.notaarquivada')),
+            ],
+            options={
+                'db_table': 'notificacoes_arquivo',
+                'ordering': ['-data_agendada', '-criado_em'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PagamentoArquivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('valor_pagamento', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('data_pagamento', models.DateField()),
+                ('metodo', models.CharField(blank=True, max_length=50, null=True)),
+                ('criado_em', models.DateTimeField()),
+                ('cliente', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='pagamentos_arquivados', to='crediario.cliente')),
+                ('nota', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='pagamentos', to='crediario.notaarquivada')),
+            ],
+            options={
+                'db_table': 'pagamentos_arquivo',
+                'ordering': ['-data_pagamento'],
+            },
+        ),
+        migrations.CreateModel(
+            name='AlocacaoArquivada',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('valor', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('criado_em', models.DateTimeField()),
+                ('nota', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alocacoes', to='crediario.notaarquivada')),
+                ('pagamento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alocacoes', to='crediario.pagamentoarquivado')),
+            ],
+            options={
+                'db_table': 'alocacoes_pagamento_arquivo',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='notaarquivada',
+            index=models.Index(fields=['cliente', 'data_nota', 'id'], name='idx_notas_arq_cliente_data'),
+        ),
+        migrations.AddIndex(
+            model_name='encargoarquivado',
+            index=models.Index(fields=['cliente', 'data', 'id'], name='idx_encargos_arq_cliente'),
+        ),
+        migrations.AddIndex(
+            model_name='pagamentoarquivado',
+            index=models.Index(fields=['cliente', 'data_pagamento', 'id'], name='idx_pagamentos_arq_cliente'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crediario', '0013_arquivo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportacaoEstado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chave', models.CharField(max_length=100, unique=True)),
+                ('dados', models.JSONField(default=dict)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'importacao_estado',
+            },
+        ),
+    ]
@@ -3,27 +3,67 @@ from django.db import models
 from django.utils import timezone
 from django.db import transaction
 from django.core.exceptions import ValidationError
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Round
+
+class ClienteQuerySet(models.QuerySet):
+    def com_saldo_atual(self):
+        """
+        Anota `saldo_corrente` (snapshot + lançamentos posteriores ao
+        checkpoint) na mesma consulta, para listagens sem N+1.
+        """
+        cauda = (
+            Lancamento.objects.filter(cliente=OuterRef('pk'), pk__gt=OuterRef('saldo_lancamento_id'))
+            .order_by()
+            .values('cliente')
+            .annotate(s=Sum('valor'))
+            .values('s')
+        )
+        dinheiro = models.DecimalField(max_digits=12, decimal_places=2)
+        return self.annotate(saldo_corrente=models.ExpressionWrapper(
+            F('saldo_devedor') + Coalesce(Subquery(cauda, output_field=dinheiro), Value(Decimal('0.00'), output_field=dinheiro)),
+            output_field=dinheiro,
+        ))
 
 class Cliente(models.Model):
     nome = models.CharField(max_length=200)
     telefone = models.CharField(max_length=30, blank=True, null=True, db_index=True)
     endereco = models.TextField(blank=True, null=True)
     limite_crediario = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    # snapshot do saldo até o lançamento saldo_lancamento_id (ver Lancamento e
+    # consolidar_saldos); o saldo atual é saldo_atual()
     saldo_devedor = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    saldo_lancamento_id = models.BigIntegerField(default=0)
     criado_em = models.DateTimeField(auto_now_add=True)
     atualizado_em = models.DateTimeField(auto_now=True)
 
+    objects = ClienteQuerySet.as_manager()
+
     class Meta:
         db_table = 'clientes'
         indexes = [
             models.Index(fields=['telefone'], name='idx_clientes_telefone'),
             models.Index(fields=['saldo_devedor'], name='idx_clientes_saldo'),
+            models.Index(fields=['nome', 'id'], name='idx_clientes_nome_id'),
         ]
         ordering = ['nome']
 
     def __str__(self):
         return self.nome
 
+    def saldo_atual(self):
+        """
+        Saldo devedor atual: o snapshot mais a soma dos lançamentos posteriores
+        ao checkpoint (uma agregação curta pelo índice (cliente, id)).
+        """
+        anotado = getattr(self, 'saldo_corrente', None)
+        if anotado is not None:
+            return anotado
+        cauda = self.lancamentos.filter(pk__gt=self.saldo_lancamento_id).aggregate(
+            s=Sum('valor')
+        )['s'] or Decimal('0.00')
+        return (self.saldo_devedor or Decimal('0.00')) + cauda
+
 class Nota(models.Model):
     STATUS_ABERTA = 'aberta'
     STATUS_PARCIAL = 'parcial'
@@ -41,6 +81,11 @@ class Nota(models.Model):
     data_nota = models.DateField(default=timezone.localdate)
     vencimento = models.DateField(blank=True, null=True)
     total = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    # desnormalizados: mantidos por delta em Pagamento.save() (ver aplicar_pagamento)
+    total_pago = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    saldo_restante = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    # multa e juros já lançados (ver Encargo), incluídos em total
+    total_encargos = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_ABERTA)
     criado_em = models.DateTimeField(auto_now_add=True)
     atualizado_em = models.DateTimeField(auto_now=True)
@@ -49,7 +94,13 @@ class Nota(models.Model):
         db_table = 'notas'
         indexes = [
             models.Index(fields=['vencimento'], name='idx_notas_vencimento'),
-            models.Index(fields=['status', 'data_nota'], name='idx_notas_status_data'),
+            # listagem por cursor: (-data_nota, -id), com ou sem filtro de status
+            models.Index(fields=['data_nota', 'id'], name='idx_notas_data_id'),
+            models.Index(fields=['status', 'data_nota', 'id'], name='idx_notas_status_data'),
+            # extrato do cliente: (data_nota, id) dentro do cliente
+            models.Index(fields=['cliente', 'data_nota', 'id'], name='idx_notas_cliente_data'),
+            # busca por prefixo (LIKE 'x%') no autocomplete
+            models.Index(fields=['numero_nota'], name='idx_notas_numero', opclasses=['varchar_pattern_ops']),
         ]
         ordering = ['-data_nota']
 
@@ -62,52 +113,126 @@ class Nota(models.Model):
             self.total = soma
             self.save(update_fields=['total', 'atualizado_em'])
 
+    @classmethod
+    def status_por_pagamento(cls, total, total_pago):
+        total_pago = total_pago or Decimal('0.00')
+        if total_pago >= (total or Decimal('0.00')):
+            return cls.STATUS_PAGA
+        if total_pago > 0:
+            return cls.STATUS_PARCIAL
+        return cls.STATUS_ABERTA
+
     def update_status_after_pagamentos(self):
-        total_pago = self.pagamentos.aggregate(total=models.Sum('valor_pagamento'))['total'] or Decimal('0.00')
-        if total_pago >= self.total:
-            novo = self.STATUS_PAGA
-        elif total_pago > 0:
-            novo = self.STATUS_PARCIAL
-        else:
-            novo = self.STATUS_ABERTA
+        novo = self.status_por_pagamento(self.total, self.total_pago)
         if novo != self.status:
             self.status = novo
             self.save(update_fields=['status', 'atualizado_em'])
 
+    def aplicar_pagamento(self, valor):
+        """
+        Soma `valor` (pode ser negativo, em estornos/edições) ao total pago e
+        atualiza saldo_restante e status num único UPDATE, sem reagregar os
+        pagamentos. Deve ser chamado com a linha da nota travada
+        (select_for_update) dentro da transação do pagamento.
+        """
+        self.total_pago = (self.total_pago or Decimal('0.00')) + valor
+        self.saldo_restante = (self.total or Decimal('0.00')) - self.total_pago
+        self.status = self.status_por_pagamento(self.total, self.total_pago)
+        self.atualizado_em = timezone.now()
+        Nota.objects.filter(pk=self.pk).update(
+            total_pago=self.total_pago,
+            saldo_restante=self.saldo_restante,
+            status=self.status,
+            atualizado_em=self.atualizado_em,
+        )
+
+    # desnormalizados: gravados só por UPDATE (aplicar_pagamento, alocação,
+    # encargos). Um save() completo não os regrava a partir da memória.
+    CAMPOS_DERIVADOS = ('total_pago', 'saldo_restante', 'status', 'total_encargos')
+
     def save(self, *args, **kwargs):
         """
-        Ao salvar a nota, garantimos que o cliente.saldo_devedor seja ajustado
-        apenas pela diferença entre o novo total e o antigo (delta).
+        Ao salvar a nota, registramos no livro de lançamentos do cliente apenas
+        a diferença entre o novo total e o antigo (delta). O saldo do cliente
+        não é mais reescrito aqui, então não há lock na linha do cliente.
+
+        Numa nota já gravada, o save() completo deixa de fora CAMPOS_DERIVADOS
+        (uma instância lida antes de um pagamento não o apaga); só quem os
+        passa em update_fields os grava. Se o total muda, saldo_restante e
+        status são recalculados no banco, a partir do total pago de lá.
         """
-        # obter valor anterior (antes de salvar) — 0 se nova
-        old_total = Decimal('0.00')
-        if self.pk:
-            try:
-                old_total = Nota.objects.values_list('total', flat=True).get(pk=self.pk) or Decimal('0.00')
-            except Nota.DoesNotExist:
-                old_total = Decimal('0.00')
+        from .services import status_por_pagamento_sql
+
+        nova = self._state.adding or kwargs.get('force_insert')
+        if not nova and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.CAMPOS_DERIVADOS
+            ]
+        update_fields = kwargs.get('update_fields')
+
+        with transaction.atomic():
+            # total anterior (0 se nova), com a linha travada até o lançamento
+            old_total = Decimal('0.00')
+            if not nova:
+                old_total = (
+                    Nota.objects.select_for_update().filter(pk=self.pk).values_list('total', flat=True).first()
+                    or Decimal('0.00')
+                )
+            else:
+                self.saldo_restante = (self.total or Decimal('0.00')) - (self.total_pago or Decimal('0.00'))
 
-        # chama super para persistir mudança do total caso já tenha sido setado
-        super().save(*args, **kwargs)
+            super().save(*args, **kwargs)
 
-        # depois de salvo, read total atual (em caso de quantization)
-        new_total = self.total or Decimal('0.00')
-        delta = new_total - (old_total or Decimal('0.00'))
+            new_total = self.total or Decimal('0.00')
+            if update_fields is not None and 'total' not in update_fields:
+                return
+            delta = new_total - old_total
 
-        if delta != Decimal('0.00'):
-            # atualiza cliente com lock para evitar race conditions
-            with transaction.atomic():
-                cliente = Cliente.objects.select_for_update().get(pk=self.cliente_id)
-                cliente.saldo_devedor = (cliente.saldo_devedor or Decimal('0.00')) + delta
-                cliente.save(update_fields=['saldo_devedor', 'atualizado_em'])
+            if delta != Decimal('0.00'):
+                if not nova:
+                    Nota.objects.filter(pk=self.pk).update(
+                        # Round: no SQLite os decimais viram REAL
+                        saldo_restante=Round(F('total') - F('total_pago'), 2), status=status_por_pagamento_sql(),
+                    )
+                    self.total_pago, self.saldo_restante, self.status = Nota.objects.values_list(
+                        'total_pago', 'saldo_restante', 'status'
+                    ).get(pk=self.pk)
+                Lancamento.objects.create(
+                    cliente_id=self.cliente_id, nota=self, tipo=Lancamento.TIPO_NOTA, valor=delta
+                )
 
     def recompute_total(self):
+        # o total é a soma dos itens mais os encargos lançados (multa/juros)
         soma = self.itens.aggregate(total=models.Sum('subtotal'))['total'] or Decimal('0.00')
+        soma += self.total_encargos or Decimal('0.00')
         if soma != self.total:
             # atualiza total e aciona save para aplicar delta corretamente
             self.total = soma
             # salva usando o método save acima que aplica delta ao cliente
-            self.save(update_fields=['total', 'atualizado_em'])        
+            self.save(update_fields=['total', 'atualizado_em'])
+
+    def delete(self, *args, **kwargs):
+        """
+        Estorna a nota antes de apagá-la: registra o total inverso no livro, e
+        o que foi pago nela (pagamentos diretos, que ficam sem nota, e as
+        alocações, apagadas em cascata) volta a ser crédito do cliente,
+        realocado nas outras notas em aberto. Como em Pagamento.delete,
+        queryset.delete não passa por aqui (ver admin.ExclusaoPorObjeto).
+        """
+        from .alocacao import alocar_pagamentos
+
+        with transaction.atomic():
+            # mesma ordem do motor de alocação: cliente antes das notas
+            list(Cliente.objects.select_for_update().filter(pk=self.cliente_id).order_by().values_list('pk'))
+            total = Nota.objects.select_for_update().filter(pk=self.pk).values_list('total', flat=True).first()
+            resultado = super().delete(*args, **kwargs)
+            if total is None:
+                return resultado
+            if total:
+                Lancamento.objects.create(cliente_id=self.cliente_id, tipo=Lancamento.TIPO_NOTA, valor=-total)
+            alocar_pagamentos(self.cliente_id, travado=True)
+            return resultado
 
 class ItemNota(models.Model):
     nota = models.ForeignKey(Nota, on_delete=models.CASCADE, related_name='itens')
@@ -155,7 +280,10 @@ class Pagamento(models.Model):
         db_table = 'pagamentos'
         indexes = [
             models.Index(fields=['nota'], name='idx_pagamentos_nota'),
-            models.Index(fields=['cliente'], name='idx_pagamentos_cliente'),
+            # extrato do cliente: (data_pagamento, id) dentro do cliente
+            models.Index(fields=['cliente', 'data_pagamento', 'id'], name='idx_pagamentos_cliente_data'),
+            # admin e exportação: ordem e date_hierarchy por data_pagamento
+            models.Index(fields=['data_pagamento', 'id'], name='idx_pagamentos_data_id'),
         ]
         ordering = ['-data_pagamento']
 
@@ -164,40 +292,55 @@ class Pagamento(models.Model):
 
     def save(self, *args, **kwargs):
         """
-        Atualiza o saldo do cliente de forma idempotente e previne pagamentos que
-        excedam o valor devido na nota. Usa transaction + select_for_update para
-        evitar condições de corrida.
+        Registra o pagamento no livro de lançamentos do cliente (pelo delta) e
+        previne pagamentos que excedam o valor devido na nota. Usa transaction +
+        select_for_update nas notas envolvidas para evitar condições de corrida.
+        Pagamentos sem nota são distribuídos entre as notas em aberto do
+        cliente pelo motor de alocação (alocacao.alocar_pagamentos).
         """
+        # alocacao importa este módulo
+        from .alocacao import alocar_pagamentos, desfazer_alocacoes
+
         is_create = self.pk is None
 
-        # lê valor anterior se existe (antes de salvar)
+        # lê valor e nota anteriores se existe (antes de salvar)
         old_val = None
+        old_nota_id = None
         if not is_create:
             try:
-                old_val = Pagamento.objects.get(pk=self.pk).valor_pagamento
+                old_val, old_nota_id = Pagamento.objects.values_list(
+                    'valor_pagamento', 'nota_id'
+                ).get(pk=self.pk)
             except Pagamento.DoesNotExist:
                 old_val = None
 
         new_val = self.valor_pagamento or Decimal('0.00')
         old_val = old_val or Decimal('0.00')
         delta = new_val - old_val  # se positivo, reduz saldo (cliente deve menos)
+        do_cliente = self.nota_id is None
+        era_do_cliente = not is_create and old_nota_id is None
 
-        # salve o pagamento dentro de uma transação com lock no cliente
+        # salve o pagamento dentro de uma transação com lock nas notas
         with transaction.atomic():
-            # lock cliente row to avoid concurrent updates
-            cliente = Cliente.objects.select_for_update().get(pk=self.cliente_id)
+            if do_cliente or era_do_cliente:
+                # mesma ordem do motor de alocação: cliente antes das notas
+                list(Cliente.objects.select_for_update().filter(pk=self.cliente_id).order_by().values_list('pk'))
+            if era_do_cliente:
+                # as alocações antigas saem das notas; o valor novo é realocado abaixo
+                desfazer_alocacoes([self.pk])
+
+            # trava as notas envolvidas (em ordem de id) e lê o total pago mantido
+            nota_ids = sorted({i for i in (self.nota_id, old_nota_id) if i})
+            notas = {n.pk: n for n in Nota.objects.select_for_update().filter(pk__in=nota_ids).order_by('pk')}
+            nota = notas.get(self.nota_id)
+            mesma_nota = old_nota_id == self.nota_id and not era_do_cliente
 
             # --- REGRA: impedir pagamento maior que o valor devido ---
-            if self.nota_id:
-                total_pago = self.nota.pagamentos.aggregate(
-                    total=models.Sum('valor_pagamento')
-                )['total'] or Decimal('0.00')
-
-                falta = (self.nota.total or Decimal('0.00')) - total_pago
-                excesso = delta if self.pk else new_val
+            if nota is not None:
+                falta = nota.saldo_restante
+                excesso = delta if mesma_nota else new_val
 
                 if excesso > falta:
-                    from django.core.exceptions import ValidationError
                     valor_formatado = f"{falta:.2f}".replace('.', ',')
                     raise ValidationError(
                         f"Pagamento excede o valor devido. Falta pagar apenas R$ {valor_formatado}."
@@ -207,38 +350,188 @@ class Pagamento(models.Model):
             # salva/atualiza pagamento
             super().save(*args, **kwargs)
 
-            # atualizar saldo com base no delta
-            cliente.saldo_devedor = (cliente.saldo_devedor or Decimal('0.00')) - delta
-            cliente.save(update_fields=['saldo_devedor', 'atualizado_em'])
+            # lançamento com base no delta (pagamento reduz o saldo)
+            if delta != Decimal('0.00'):
+                Lancamento.objects.create(
+                    cliente_id=self.cliente_id, pagamento=self, tipo=Lancamento.TIPO_PAGAMENTO, valor=-delta
+                )
+
+            # atualizar total pago / status das notas (se aplicável)
+            if mesma_nota:
+                if nota is not None:
+                    nota.aplicar_pagamento(delta)
+            else:
+                if old_nota_id in notas:
+                    notas[old_nota_id].aplicar_pagamento(-old_val)
+                if nota is not None:
+                    nota.aplicar_pagamento(new_val)
+
+            if do_cliente:
+                alocar_pagamentos(self.cliente_id, travado=True)
+
+    def delete(self, *args, **kwargs):
+        """
+        Estorna o pagamento antes de apagá-lo: devolve o valor à nota (ou
+        desfaz as alocações) e registra o lançamento inverso no livro.
+        Exclusões em massa (queryset.delete) não passam por aqui; use
+        check_total_pago e reconciliar_saldos depois delas. No admin,
+        "excluir selecionados" apaga um a um (ver admin.ExclusaoPorObjeto).
+        """
+        from .alocacao import desfazer_alocacoes
 
-            # atualizar status da nota (se aplicável)
-            if self.nota_id:
-                # refresh nota from db in case it changed
-                self.nota.refresh_from_db()
-                self.nota.update_status_after_pagamentos()
+        with transaction.atomic():
+            try:
+                valor, nota_id = Pagamento.objects.values_list('valor_pagamento', 'nota_id').get(pk=self.pk)
+            except Pagamento.DoesNotExist:
+                return super().delete(*args, **kwargs)
+
+            if nota_id is None:
+                list(Cliente.objects.select_for_update().filter(pk=self.cliente_id).order_by().values_list('pk'))
+                desfazer_alocacoes([self.pk])
+            else:
+                nota = Nota.objects.select_for_update().filter(pk=nota_id).first()
+                if nota is not None:
+                    nota.aplicar_pagamento(-valor)
+            if valor:
+                Lancamento.objects.create(cliente_id=self.cliente_id, tipo=Lancamento.TIPO_PAGAMENTO, valor=valor)
+            return super().delete(*args, **kwargs)
+
+class AlocacaoPagamento(models.Model):
+    """
+    Parte de um pagamento sem nota (pagamento do cliente) aplicada a uma nota,
+    gravada pelo motor de alocação (ver alocacao.py). Entra no total_pago da
+    nota junto com os pagamentos feitos direto nela.
+    """
+    pagamento = models.ForeignKey(Pagamento, on_delete=models.CASCADE, related_name='alocacoes')
+    nota = models.ForeignKey(Nota, on_delete=models.CASCADE, related_name='alocacoes')
+    valor = models.DecimalField(max_digits=12, decimal_places=2)
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'alocacoes_pagamento'
+        indexes = [
+            models.Index(fields=['nota'], name='idx_alocacoes_nota'),
+            models.Index(fields=['pagamento'], name='idx_alocacoes_pagamento'),
+        ]
+        ordering = ['id']
+
+    def __str__(self):
+        return f'Alocação {self.pk} — pagamento {self.pagamento_id} → nota {self.nota_id} — R$ {self.valor}'
+
+class Encargo(models.Model):
+    """
+    Multa ou juros de uma nota vencida, lançados pelo comando
+    acumular_encargos (ver encargos.py). Um por (nota, tipo, data): rodar de
+    novo no mesmo dia não cobra duas vezes.
+    """
+    TIPO_MULTA = 'multa'
+    TIPO_JUROS = 'juros'
+
+    nota = models.ForeignKey(Nota, on_delete=models.CASCADE, related_name='encargos')
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='encargos')
+    tipo = models.CharField(max_length=10)
+    data = models.DateField()
+    # valor em aberto sobre o qual foi calculado e dias de juros cobertos
+    base = models.DecimalField(max_digits=12, decimal_places=2)
+    dias = models.IntegerField(default=0)
+    valor = models.DecimalField(max_digits=12, decimal_places=2)
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'encargos'
+        constraints = [
+            models.UniqueConstraint(fields=['nota', 'tipo', 'data'], name='uniq_encargo_nota_tipo_data'),
+        ]
+        indexes = [
+            # extrato do cliente: (data, id) dentro do cliente
+            models.Index(fields=['cliente', 'data', 'id'], name='idx_encargos_cliente_data'),
+        ]
+        ordering = ['data', 'id']
+
+    def __str__(self):
+        return f'Encargo {self.pk} — {self.tipo} — nota {self.nota_id} — R$ {self.valor}'
+
+class Lancamento(models.Model):
+    """
+    Movimento do saldo devedor de um cliente, gravado apenas por inserção.
+    Valor positivo aumenta o saldo (nota), negativo reduz (pagamento).
+    Cliente.saldo_devedor guarda a soma consolidada até saldo_lancamento_id.
+    """
+    TIPO_NOTA = 'nota'
+    TIPO_PAGAMENTO = 'pagamento'
+    TIPO_AJUSTE = 'ajuste'
+    TIPO_IMPORTACAO = 'importacao'
+    TIPO_ENCARGO = 'encargo'
+
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='lancamentos')
+    nota = models.ForeignKey(Nota, on_delete=models.SET_NULL, related_name='lancamentos', null=True, blank=True)
+    pagamento = models.ForeignKey(Pagamento, on_delete=models.SET_NULL, related_name='lancamentos', null=True, blank=True)
+    tipo = models.CharField(max_length=20)
+    valor = models.DecimalField(max_digits=12, decimal_places=2)
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'lancamentos'
+        indexes = [
+            models.Index(fields=['cliente', 'id'], name='idx_lancamentos_cliente_id'),
+        ]
+        ordering = ['id']
+
+    def __str__(self):
+        return f'Lançamento {self.pk} — {self.tipo} — R$ {self.valor}'
+
+class ImportacaoEstado(models.Model):
+    """
+    Progresso de uma importação de CSV (ver importacao.Estado), gravado na
+    mesma transação de cada lote e apagado quando a importação termina.
+    """
+    chave = models.CharField(max_length=100, unique=True)
+    dados = models.JSONField(default=dict)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'importacao_estado'
+
+    def __str__(self):
+        return f'Importação {self.chave}'
 
 class Anexo(models.Model):
     nota = models.ForeignKey(Nota, on_delete=models.CASCADE, related_name='anexos')
     arquivo = models.FileField(upload_to='notas/')
     mime_type = models.CharField(max_length=100, blank=True, null=True)
     tamanho_bytes = models.BigIntegerField(blank=True, null=True)
+    # conteúdo do arquivo; o caminho em notas/ é derivado dele (ver anexos.py)
+    sha256 = models.CharField(max_length=64, blank=True, null=True, db_index=True)
+    # miniatura em miniaturas/ (comando gerar_miniaturas)
+    miniatura_gerada = models.BooleanField(default=False)
     criado_em = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         db_table = 'anexos'
         ordering = ['-criado_em']
+        constraints = [
+            # a mesma foto reenviada para a mesma nota não vira outro anexo
+            models.UniqueConstraint(fields=['nota', 'sha256'], name='uniq_anexo_nota_sha256'),
+        ]
 
     def __str__(self):
         return f'{self.arquivo.name}'
 
 class Notificacao(models.Model):
+    STATUS_PENDENTE = 'pendente'
+    STATUS_PROCESSANDO = 'processando'
+    STATUS_ENVIADA = 'enviada'
+    STATUS_FALHOU = 'falhou'
+
+    TIPO_VENCIMENTO = 'vencimento_aviso'
+
     cliente = models.ForeignKey(Cliente, on_delete=models.SET_NULL, related_name='notificacoes', null=True, blank=True)
     nota = models.ForeignKey(Nota, on_delete=models.SET_NULL, related_name='notificacoes', null=True, blank=True)
     tipo = models.CharField(max_length=50)
     canal = models.CharField(max_length=20, default='log')
     destinatario = models.CharField(max_length=200, blank=True, null=True)
     conteudo = models.TextField(blank=True, null=True)
-    status = models.CharField(max_length=20, default='pendente')
+    status = models.CharField(max_length=20, default=STATUS_PENDENTE)
     tentativa = models.IntegerField(default=0)
     data_agendada = models.DateTimeField(blank=True, null=True)
     criado_em = models.DateTimeField(auto_now_add=True)
@@ -248,8 +541,134 @@ class Notificacao(models.Model):
         db_table = 'notificacoes'
         indexes = [
             models.Index(fields=['nota', 'tipo', 'data_agendada'], name='idx_notif_nota_tipo_data'),
+            # fila do despachante: pendentes/processando por data_agendada
+            models.Index(fields=['status', 'data_agendada'], name='idx_notif_status_agendada'),
+            # admin: ordem e date_hierarchy por data_agendada
+            models.Index(fields=['data_agendada', 'id'], name='idx_notif_agendada_id'),
         ]
         ordering = ['-data_agendada', '-criado_em']
 
     def __str__(self):
-        return f'Notificação {self.pk} — {self.tipo} — {self.status}'
\ No newline at end of file
+        return f'Notificação {self.pk} — {self.tipo} — {self.status}'
+
+# --- Arquivo ---
+# Notas pagas antigas e o que pende delas saem das tabelas acima para estas
+# (comando arquivar_notas, ver arquivo.py), com os mesmos ids. São só
+# leitura: o extrato (?arquivo=1) e o detalhe da nota as consultam.
+
+class NotaArquivada(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='notas_arquivadas', db_index=False)
+    numero_nota = models.CharField(max_length=50, null=True, blank=True)
+    data_nota = models.DateField()
+    vencimento = models.DateField(blank=True, null=True)
+    total = models.DecimalField(max_digits=12, decimal_places=2)
+    total_pago = models.DecimalField(max_digits=12, decimal_places=2)
+    saldo_restante = models.DecimalField(max_digits=12, decimal_places=2)
+    total_encargos = models.DecimalField(max_digits=12, decimal_places=2)
+    status = models.CharField(max_length=20)
+    criado_em = models.DateTimeField()
+    atualizado_em = models.DateTimeField()
+    arquivada_em = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'notas_arquivo'
+        indexes = [
+            # extrato do cliente: (data_nota, id) dentro do cliente
+            models.Index(fields=['cliente', 'data_nota', 'id'], name='idx_notas_arq_cliente_data'),
+        ]
+        ordering = ['-data_nota']
+
+    def __str__(self):
+        return f'Nota arquivada {self.pk} — {self.cliente.nome} — R$ {self.total}'
+
+class ItemNotaArquivado(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    nota = models.ForeignKey(NotaArquivada, on_delete=models.CASCADE, related_name='itens')
+    descricao = models.TextField()
+    quantidade = models.DecimalField(max_digits=18, decimal_places=4)
+    preco_unitario = models.DecimalField(max_digits=18, decimal_places=4)
+    subtotal = models.DecimalField(max_digits=14, decimal_places=2)
+    criado_em = models.DateTimeField()
+
+    class Meta:
+        db_table = 'itens_nota_arquivo'
+        ordering = ['criado_em']
+
+class PagamentoArquivado(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    nota = models.ForeignKey(NotaArquivada, on_delete=models.CASCADE, related_name='pagamentos', null=True, blank=True)
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='pagamentos_arquivados', db_index=False)
+    valor_pagamento = models.DecimalField(max_digits=12, decimal_places=2)
+    data_pagamento = models.DateField()
+    metodo = models.CharField(max_length=50, blank=True, null=True)
+    criado_em = models.DateTimeField()
+
+    class Meta:
+        db_table = 'pagamentos_arquivo'
+        indexes = [
+            models.Index(fields=['cliente', 'data_pagamento', 'id'], name='idx_pagamentos_arq_cliente'),
+        ]
+        ordering = ['-data_pagamento']
+
+class AlocacaoArquivada(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    pagamento = models.ForeignKey(PagamentoArquivado, on_delete=models.CASCADE, related_name='alocacoes')
+    nota = models.ForeignKey(NotaArquivada, on_delete=models.CASCADE, related_name='alocacoes')
+    valor = models.DecimalField(max_digits=12, decimal_places=2)
+    criado_em = models.DateTimeField()
+
+    class Meta:
+        db_table = 'alocacoes_pagamento_arquivo'
+        ordering = ['id']
+
+class EncargoArquivado(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    nota = models.ForeignKey(NotaArquivada, on_delete=models.CASCADE, related_name='encargos')
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='encargos_arquivados', db_index=False)
+    tipo = models.CharField(max_length=10)
+    data = models.DateField()
+    base = models.DecimalField(max_digits=12, decimal_places=2)
+    dias = models.IntegerField()
+    valor = models.DecimalField(max_digits=12, decimal_places=2)
+    criado_em = models.DateTimeField()
+
+    class Meta:
+        db_table = 'encargos_arquivo'
+        indexes = [
+            models.Index(fields=['cliente', 'data', 'id'], name='idx_encargos_arq_cliente'),
+        ]
+        ordering = ['data', 'id']
+
+class AnexoArquivado(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    nota = models.ForeignKey(NotaArquivada, on_delete=models.CASCADE, related_name='anexos')
+    # o arquivo continua no storage, no mesmo caminho
+    arquivo = models.FileField(upload_to='notas/')
+    mime_type = models.CharField(max_length=100, blank=True, null=True)
+    tamanho_bytes = models.BigIntegerField(blank=True, null=True)
+    sha256 = models.CharField(max_length=64, blank=True, null=True, db_index=True)
+    miniatura_gerada = models.BooleanField(default=False)
+    criado_em = models.DateTimeField()
+
+    class Meta:
+        db_table = 'anexos_arquivo'
+        ordering = ['-criado_em']
+
+class NotificacaoArquivada(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    cliente = models.ForeignKey(Cliente, on_delete=models.SET_NULL, related_name='+', null=True, blank=True)
+    nota = models.ForeignKey(NotaArquivada, on_delete=models.CASCADE, related_name='notificacoes', null=True, blank=True)
+    tipo = models.CharField(max_length=50)
+    canal = models.CharField(max_length=20)
+    destinatario = models.CharField(max_length=200, blank=True, null=True)
+    conteudo = models.TextField(blank=True, null=True)
+    status = models.CharField(max_length=20)
+    tentativa = models.IntegerField()
+    data_agendada = models.DateTimeField(blank=True, null=True)
+    criado_em = models.DateTimeField()
+    enviado_em = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        db_table = 'notificacoes_arquivo'
+        ordering = ['-data_agendada', '-criado_em']
@@ -0,0 +1,187 @@
+# crediario/notificacoes.py
+"""
+Envio das notificações agendadas (ver check_vencimentos).
+
+O comando enviar_notificacoes reserva lotes de Notificacao pendentes com
+SELECT ... FOR UPDATE SKIP LOCKED, envia pelos canais configurados em
+settings.CREDIARIO_CANAIS com concorrência limitada (asyncio) e reagenda as
+falhas com backoff exponencial baseado em `tentativa`. Vários processos
+podem rodar o comando ao mesmo tempo sem enviar a mesma notificação duas
+vezes: o resultado só é gravado se a reserva ainda for do worker (status
+'processando' com o data_agendada que ele marcou), e a reserva dura mais
+que o pior caso de um lote (todos os envios estourando o timeout).
+"""
+import asyncio
+import logging
+import math
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import Notificacao
+
+logger = logging.getLogger(__name__)
+
+CANAIS_PADRAO = {
+    'log': 'crediario.notificacoes.CanalLog',
+}
+
+
+class Canal:
+    """
+    Interface de um canal de envio. `enviar` é uma corrotina: deve levantar
+    exceção em caso de falha para que a notificação seja reagendada.
+    """
+
+    async def enviar(self, destinatario, conteudo):
+        raise NotImplementedError
+
+
+class CanalLog(Canal):
+    """Canal padrão: só registra a mensagem no log (mock)."""
+
+    async def enviar(self, destinatario, conteudo):
+        logger.info('MOCK enviar: %s | %s', destinatario, conteudo)
+
+
+class CanalStub(Canal):
+    """
+    Canal em memória para testes. Guarda o que foi enviado em `enviados`,
+    falha para os destinatários em `falhar` e demora `demora` segundos nos
+    destinatários em `lentos`.
+    """
+
+    def __init__(self, falhar=(), lentos=(), demora=1):
+        self.enviados = []
+        self.falhar = set(falhar)
+        self.lentos = set(lentos)
+        self.demora = demora
+
+    async def enviar(self, destinatario, conteudo):
+        if destinatario in self.lentos:
+            await asyncio.sleep(self.demora)
+        if destinatario in self.falhar:
+            raise RuntimeError(f'falha simulada para {destinatario}')
+        self.enviados.append((destinatario, conteudo))
+
+
+def carregar_canais():
+    caminhos = getattr(settings, 'CREDIARIO_CANAIS', CANAIS_PADRAO)
+    return {nome: import_string(caminho)() for nome, caminho in caminhos.items()}
+
+
+def reservar_lote(tamanho, reserva):
+    """
+    Reserva até `tamanho` notificações vencidas, marcando-as como
+    'processando' até agora + `reserva`. Se o worker morrer no meio do envio,
+    a reserva expira e outro worker pega a notificação de novo. Devolve
+    (linhas, fim da reserva); o fim da reserva identifica a reserva em
+    registrar_resultados.
+    """
+    agora = timezone.now()
+    ate = agora + reserva
+    with transaction.atomic():
+        linhas = list(
+            Notificacao.objects.select_for_update(skip_locked=True)
+            .filter(status__in=[Notificacao.STATUS_PENDENTE, Notificacao.STATUS_PROCESSANDO])
+            .filter(Q(data_agendada__lte=agora) | Q(data_agendada__isnull=True))
+            .order_by('data_agendada', 'pk')
+            .values('pk', 'canal', 'destinatario', 'conteudo', 'tentativa')[:tamanho]
+        )
+        if linhas:
+            Notificacao.objects.filter(pk__in=[l['pk'] for l in linhas]).update(
+                status=Notificacao.STATUS_PROCESSANDO,
+                data_agendada=ate,
+            )
+    return linhas, ate
+
+
+async def enviar_lote(linhas, canais, concorrencia, timeout):
+    """Envia as notificações do lote; devolve [(linha, erro ou None)]."""
+    semaforo = asyncio.Semaphore(concorrencia)
+
+    async def enviar(linha):
+        canal = canais.get(linha['canal'])
+        if canal is None:
+            return linha, f"canal desconhecido: {linha['canal']}"
+        async with semaforo:
+            try:
+                await asyncio.wait_for(canal.enviar(linha['destinatario'] or '', linha['conteudo'] or ''), timeout)
+            except Exception as e:
+                return linha, str(e) or e.__class__.__name__
+        return linha, None
+
+    return await asyncio.gather(*(enviar(l) for l in linhas))
+
+
+def registrar_resultados(resultados, max_tentativas, backoff, reservada_ate):
+    """
+    Grava o resultado do lote: um UPDATE para as enviadas e um por valor de
+    `tentativa` para as falhas (reagendadas em backoff * 2**tentativa, ou
+    marcadas como 'falhou' ao atingir max_tentativas). Só valem as linhas
+    ainda reservadas por este worker (`reservada_ate`, de reservar_lote):
+    se a reserva expirou e outro worker a pegou, o resultado dele prevalece.
+    Devolve (enviadas, falhas) efetivamente gravadas.
+    """
+    agora = timezone.now()
+    enviadas = [linha['pk'] for linha, erro in resultados if erro is None]
+    falhas = {}
+    for linha, erro in resultados:
+        if erro is not None:
+            logger.warning('Falha ao enviar notificação %s: %s', linha['pk'], erro)
+            falhas.setdefault(linha['tentativa'], []).append(linha['pk'])
+
+    reservadas = Notificacao.objects.filter(status=Notificacao.STATUS_PROCESSANDO, data_agendada=reservada_ate)
+    n_enviadas = n_falhas = 0
+    with transaction.atomic():
+        if enviadas:
+            n_enviadas = reservadas.filter(pk__in=enviadas).update(
+                status=Notificacao.STATUS_ENVIADA, enviado_em=agora
+            )
+        for tentativa, ids in falhas.items():
+            if tentativa + 1 >= max_tentativas:
+                n_falhas += reservadas.filter(pk__in=ids).update(
+                    status=Notificacao.STATUS_FALHOU, tentativa=F('tentativa') + 1
+                )
+            else:
+                n_falhas += reservadas.filter(pk__in=ids).update(
+                    status=Notificacao.STATUS_PENDENTE,
+                    tentativa=F('tentativa') + 1,
+                    data_agendada=agora + backoff * (2 ** tentativa),
+                )
+    perdidas = len(enviadas) + sum(len(ids) for ids in falhas.values()) - n_enviadas - n_falhas
+    if perdidas:
+        logger.warning('%s notificação(ões) com a reserva expirada: resultado descartado', perdidas)
+    return n_enviadas, n_falhas
+
+
+def duracao_da_reserva(tamanho_lote, concorrencia, timeout, minimo=timedelta(minutes=5)):
+    """
+    Reserva de um lote: o pior caso (todos os envios estouram o timeout, em
+    ondas de `concorrencia`) mais uma folga de 50%, nunca menos que `minimo`.
+    """
+    pior_caso = math.ceil(tamanho_lote / max(concorrencia, 1)) * timeout
+    return max(minimo, timedelta(seconds=pior_caso * 1.5))
+
+
+def despachar(tamanho_lote=100, concorrencia=10, timeout=30, max_tentativas=5,
+              backoff=timedelta(minutes=1), max_lotes=None, canais=None):
+    """
+    Processa lotes até a fila esvaziar (ou max_lotes). `canais` ({nome:
+    instância}) substitui CREDIARIO_CANAIS. Devolve (enviadas, falhas).
+    """
+    canais = canais if canais is not None else carregar_canais()
+    reserva = duracao_da_reserva(tamanho_lote, concorrencia, timeout)
+    total_enviadas = total_falhas = lotes = 0
+    while max_lotes is None or lotes < max_lotes:
+        linhas, reservada_ate = reservar_lote(tamanho_lote, reserva)
+        if not linhas:
+            break
+        resultados = asyncio.run(enviar_lote(linhas, canais, concorrencia, timeout))
+        enviadas, falhas = registrar_resultados(resultados, max_tentativas, backoff, reservada_ate)
+        total_enviadas += enviadas
+        total_falhas += falhas
+        lotes += 1
+    return total_enviadas, total_falhas
@@ -0,0 +1,194 @@
+# crediario/paginacao.py
+"""
+Paginação por cursor (keyset) para as listagens.
+
+Em vez de OFFSET, a próxima página é pedida com os valores da ordenação da
+última linha exibida (codificados no parâmetro `cursor`). Assim a página 1000
+custa o mesmo que a primeira, desde que exista um índice na mesma ordem, e
+não é preciso COUNT(*) para saber se há próxima página.
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 200
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+@dataclass
+class Pagina:
+    itens: list
+    proximo_cursor: str | None
+
+    @property
+    def tem_proxima(self):
+        return self.proximo_cursor is not None
+
+
+def codificar_cursor(valores):
+    dados = json.dumps(valores, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(dados.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """Devolve a lista de valores do cursor, ou None se ausente/inválido."""
+    if not cursor:
+        return None
+    try:
+        dados = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        valores = json.loads(dados)
+    except (binascii.Error, ValueError):
+        return None
+    return valores if isinstance(valores, list) else None
+
+
+def valores_do_cursor(modelo, ordem, cursor):
+    """
+    Valores do `cursor` convertidos para os tipos dos campos de `ordem` em
+    `modelo` (to_python), ou None sem cursor. Um cursor adulterado (valores a
+    mais ou a menos, tipos errados, nulos) levanta CursorInvalido.
+    """
+    if not cursor:
+        return None
+    valores = decodificar_cursor(cursor)
+    if valores is None or len(valores) != len(ordem):
+        raise CursorInvalido('cursor inválido')
+    convertidos = []
+    for campo, valor in zip(ordem, valores):
+        if valor is None or isinstance(valor, (dict, list)):
+            raise CursorInvalido('cursor inválido')
+        try:
+            convertidos.append(modelo._meta.get_field(campo.lstrip('-')).to_python(valor))
+        except (ValidationError, TypeError, ValueError):
+            raise CursorInvalido('cursor inválido')
+    return convertidos
+
+
+def limite_da_requisicao(request, padrao=LIMITE_PADRAO):
+    try:
+        limite = int(request.GET.get('limite', padrao))
+    except ValueError:
+        return padrao
+    return min(max(limite, 1), LIMITE_MAXIMO)
+
+
+def filtro_apos(ordem, valores):
+    """
+    Monta o filtro "linhas depois de `valores`" para a ordenação `ordem`
+    (ex.: ['-data_nota', '-id']), aceitando direções mistas:
+    a >= x AND ((a > x) OR (a = x AND b > y) OR ...)
+
+    O limite simples na primeira coluna é redundante para o resultado, mas é
+    o que deixa o banco começar a varredura do índice (data_nota, id) ou
+    (nome, id) no cursor: só com o OR ele lê e descarta todas as linhas das
+    páginas anteriores, como num OFFSET.
+    """
+    filtro = Q()
+    iguais = {}
+    for campo, valor in zip(ordem, valores):
+        nome = campo.lstrip('-')
+        lookup = 'lt' if campo.startswith('-') else 'gt'
+        filtro |= Q(**iguais, **{f'{nome}__{lookup}': valor})
+        iguais[nome] = valor
+    if len(ordem) > 1 and valores[0] is not None:
+        campo = ordem[0]
+        lookup = 'lte' if campo.startswith('-') else 'gte'
+        filtro &= Q(**{f'{campo.lstrip("-")}__{lookup}': valores[0]})
+    return filtro
+
+
+def _valor(obj, campo):
+    return obj[campo] if isinstance(obj, dict) else getattr(obj, campo)
+
+
+def _consulta_da_pagina(queryset, ordem, cursor, limite, estrito=False):
+    qs = queryset.order_by(*ordem)
+    try:
+        valores = valores_do_cursor(queryset.model, ordem, cursor)
+    except CursorInvalido:
+        if estrito:
+            raise
+        # cursor adulterado: volta para a primeira página
+        valores = None
+    if valores is not None:
+        qs = qs.filter(filtro_apos(ordem, valores))
+    return qs[:limite + 1]
+
+
+def _montar_pagina(itens, ordem, limite):
+    proximo = None
+    if len(itens) > limite:
+        itens = itens[:limite]
+        ultimo = itens[-1]
+        proximo = codificar_cursor([_valor(ultimo, c.lstrip('-')) for c in ordem])
+    return Pagina(itens, proximo)
+
+
+def paginar(queryset, ordem, cursor=None, limite=LIMITE_PADRAO):
+    """
+    Devolve a Pagina de `queryset` ordenado por `ordem` que começa depois do
+    `cursor`. `ordem` deve terminar num campo único (normalmente o id) para
+    que a ordenação seja total. Funciona com instâncias e com .values().
+    """
+    itens = list(_consulta_da_pagina(queryset, ordem, cursor, limite))
+    return _montar_pagina(itens, ordem, limite)
+
+
+async def apaginar(queryset, ordem, cursor=None, limite=LIMITE_PADRAO, estrito=False):
+    """
+    Como paginar(), com o ORM assíncrono (views async de api.py). Com
+    `estrito`, um cursor inválido levanta CursorInvalido em vez de recomeçar.
+    """
+    itens = [item async for item in _consulta_da_pagina(queryset, ordem, cursor, limite, estrito)]
+    return _montar_pagina(itens, ordem, limite)
+
+
+class PaginadorEstimado(Paginator):
+    """
+    Paginator do admin que não faz COUNT(*) em tabelas grandes no PostgreSQL:
+    sem filtros usa pg_class.reltuples (estatística do último ANALYZE); com
+    filtros, a estimativa de linhas do EXPLAIN. Abaixo de LIMITE_EXATO linhas
+    estimadas, ou em outros bancos (SQLite), conta de verdade.
+    """
+    LIMITE_EXATO = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        conexao = connections[getattr(queryset, 'db', 'default')]
+        if conexao.vendor != 'postgresql' or not hasattr(queryset, 'query'):
+            return super().count
+        estimativa = self._estimar(queryset, conexao)
+        if estimativa is None or estimativa < self.LIMITE_EXATO:
+            return super().count
+        return estimativa
+
+    def _estimar(self, queryset, conexao):
+        with conexao.cursor() as cursor:
+            if not queryset.query.where:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                    [queryset.model._meta.db_table],
+                )
+            else:
+                sql, params = queryset.order_by().query.sql_with_params()
+                cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            linha = cursor.fetchone()
+        if linha is None:
+            return None
+        if isinstance(linha[0], (int, float)):
+            # reltuples = -1: tabela nunca analisada
+            return int(linha[0]) if linha[0] >= 0 else None
+        plano = linha[0] if isinstance(linha[0], list) else json.loads(linha[0])
+        return int(plano[0]['Plan']['Plan Rows'])
@@ -0,0 +1,132 @@
+# crediario/reconciliacao.py
+"""
+Reconciliação do saldo dos clientes.
+
+O saldo esperado de um cliente é a soma dos totais das notas menos a soma dos
+pagamentos, contando também os arquivados (ver arquivo.py). verificar_faixa() compara isso com o saldo atual (snapshot +
+lançamentos) para uma faixa de ids de cliente usando só consultas agrupadas,
+então o trabalho pode ser dividido em faixas e espalhado entre processos
+(ver o comando reconciliar_saldos). corrigir() reconfere os clientes
+divergentes numa consulta só, com os dois lados no mesmo instantâneo.
+"""
+from decimal import Decimal
+from django.db import models, transaction
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from .models import Cliente, Nota, NotaArquivada, Pagamento, PagamentoArquivado, Lancamento
+
+CENTAVOS = Decimal('0.01')
+DINHEIRO = models.DecimalField(max_digits=12, decimal_places=2)
+
+
+def _somas_por_cliente(queryset, campo, inicio, fim, ids=None):
+    queryset = queryset.filter(cliente_id__gte=inicio, cliente_id__lt=fim)
+    if ids is not None:
+        queryset = queryset.filter(cliente_id__in=ids)
+    linhas = (
+        queryset
+        .order_by()
+        .values('cliente_id')
+        .annotate(s=Sum(campo))
+        .values_list('cliente_id', 's')
+    )
+    return {cliente_id: s or Decimal('0.00') for cliente_id, s in linhas}
+
+
+def _somar(*somas):
+    total = {}
+    for soma in somas:
+        for cliente_id, valor in soma.items():
+            total[cliente_id] = total.get(cliente_id, Decimal('0.00')) + valor
+    return total
+
+
+def _saldos_esperados(inicio, fim, ids=None):
+    notas = _somar(
+        _somas_por_cliente(Nota.objects.all(), 'total', inicio, fim, ids),
+        _somas_por_cliente(NotaArquivada.objects.all(), 'total', inicio, fim, ids),
+    )
+    pagos = _somar(
+        _somas_por_cliente(Pagamento.objects.all(), 'valor_pagamento', inicio, fim, ids),
+        _somas_por_cliente(PagamentoArquivado.objects.all(), 'valor_pagamento', inicio, fim, ids),
+    )
+    return notas, pagos
+
+
+def _soma_do_cliente(queryset, campo):
+    soma = queryset.filter(cliente=OuterRef('pk')).order_by().values('cliente').annotate(s=Sum(campo)).values('s')
+    return Coalesce(Subquery(soma, output_field=DINHEIRO), Value(Decimal('0.00'), output_field=DINHEIRO))
+
+
+def _comparar(linhas):
+    """(cliente_id, saldo atual, soma das notas, soma dos pagamentos) -> divergências."""
+    divergencias = []
+    for cliente_id, atual, notas, pagos in linhas:
+        atual = Decimal(atual or 0).quantize(CENTAVOS)
+        esperado = (Decimal(notas or 0) - Decimal(pagos or 0)).quantize(CENTAVOS)
+        if atual != esperado:
+            divergencias.append((cliente_id, atual, esperado))
+    return divergencias
+
+
+def verificar_faixa(inicio, fim, ids=None):
+    """
+    Devolve (clientes verificados, divergências) para clientes com
+    inicio <= id < fim (ou só `ids`, se informado). Cada divergência é
+    (cliente_id, saldo_atual, saldo_esperado).
+    """
+    notas, pagos = _saldos_esperados(inicio, fim, ids)
+    clientes = Cliente.objects.com_saldo_atual().filter(pk__gte=inicio, pk__lt=fim)
+    if ids is not None:
+        clientes = clientes.filter(pk__in=ids)
+
+    linhas = [
+        (cliente_id, atual, notas.get(cliente_id), pagos.get(cliente_id))
+        for cliente_id, atual in clientes.order_by().values_list('pk', 'saldo_corrente')
+    ]
+    return len(linhas), _comparar(linhas)
+
+
+def _reverificar(ids):
+    """
+    Como verificar_faixa(ids=ids), mas com o saldo atual e o esperado numa
+    consulta só (subconsultas por cliente): os dois lados saem do mesmo
+    instantâneo, e um pagamento gravado no meio entra nos dois ou em nenhum.
+    """
+    linhas = (
+        Cliente.objects.com_saldo_atual()
+        .filter(pk__in=ids)
+        .annotate(
+            soma_notas=_soma_do_cliente(Nota.objects.all(), 'total')
+            + _soma_do_cliente(NotaArquivada.objects.all(), 'total'),
+            soma_pagos=_soma_do_cliente(Pagamento.objects.all(), 'valor_pagamento')
+            + _soma_do_cliente(PagamentoArquivado.objects.all(), 'valor_pagamento'),
+        )
+        .order_by('pk')
+        .values_list('pk', 'saldo_corrente', 'soma_notas', 'soma_pagos')
+    )
+    return _comparar(linhas)
+
+
+def corrigir(divergencias):
+    """
+    Corrige as divergências com lançamentos de ajuste (um bulk_create), em
+    vez de reescrever o saldo: o livro continua sendo a história completa.
+    Trava os clientes (em ordem de id, como os pagamentos), o que serializa
+    duas correções do mesmo cliente, e só então os reconfere com
+    _reverificar(): notas e pagamentos não travam o cliente e podem entrar a
+    qualquer momento, então saldo e esperado são lidos na mesma consulta e o
+    ajuste não mistura um lado com o pagamento e o outro sem. Devolve a
+    quantidade de clientes ajustados.
+    """
+    if not divergencias:
+        return 0
+    ids = sorted(d[0] for d in divergencias)
+    with transaction.atomic():
+        list(Cliente.objects.select_for_update().filter(pk__in=ids).order_by('pk').values_list('pk', flat=True))
+        atuais = _reverificar(ids)
+        Lancamento.objects.bulk_create([
+            Lancamento(cliente_id=cliente_id, tipo=Lancamento.TIPO_AJUSTE, valor=esperado - atual)
+            for cliente_id, atual, esperado in atuais
+        ])
+    return len(atuais)
@@ -0,0 +1,158 @@
+# crediario/replicas.py
+"""
+Leituras em réplicas do banco (opcional; ver DB_REPLICAS em core/settings.py).
+
+Só vai para uma réplica o que foi marcado com somente_leitura (views de
+listagem, detalhe, extrato e exportação). Todo o resto fica no primário:
+escritas, leituras dentro de transações (os caminhos de Nota.save e
+Pagamento.save correm em transaction.atomic) e qualquer leitura depois de
+uma escrita na mesma requisição.
+
+Para ler o que acabou de gravar mesmo com atraso de replicação, o
+ReplicaMiddleware marca com um cookie curto (CREDIARIO_REPLICA_ATRASO
+segundos) quem escreveu; as requisições seguintes dessa pessoa, como o GET
+depois do redirect de um POST, ficam no primário.
+
+O estado da requisição fica num ContextVar, então funciona em views
+síncronas e assíncronas.
+"""
+import random
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import wraps
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+COOKIE = 'crediario_primario'
+
+
+@dataclass
+class Estado:
+    leitura: bool = False
+    primario: bool = False
+    escreveu: bool = False
+    replica: str | None = None
+
+
+_estado = ContextVar('crediario_replicas', default=None)
+
+
+def _replicas():
+    return getattr(settings, 'CREDIARIO_REPLICAS', [])
+
+
+def estado():
+    """Estado da requisição atual (None fora de requisições e de somente_leitura)."""
+    return _estado.get()
+
+
+class somente_leitura:
+    """
+    Decorator (de views síncronas ou assíncronas) e context manager que
+    manda as leituras do trecho para uma réplica.
+    """
+
+    def __enter__(self):
+        atual = _estado.get()
+        self._token = None
+        self._anterior = atual.leitura if atual is not None else None
+        if atual is None:
+            self._token = _estado.set(Estado(leitura=True))
+        else:
+            atual.leitura = True
+        return self
+
+    def __exit__(self, *exc):
+        if self._token is not None:
+            _estado.reset(self._token)
+        else:
+            _estado.get().leitura = self._anterior
+
+    def __call__(self, funcao):
+        if iscoroutinefunction(funcao):
+            @wraps(funcao)
+            async def envolvida(*args, **kwargs):
+                with somente_leitura():
+                    return await funcao(*args, **kwargs)
+            return envolvida
+
+        @wraps(funcao)
+        def envolvida(*args, **kwargs):
+            with somente_leitura():
+                return funcao(*args, **kwargs)
+        return envolvida
+
+
+class RoteadorReplicas:
+    """Router do Django (DATABASE_ROUTERS) entre o primário e as réplicas."""
+
+    def db_for_read(self, model, **hints):
+        instancia = hints.get('instance')
+        if instancia is not None and instancia._state.db:
+            return instancia._state.db
+        atual = _estado.get()
+        replicas = _replicas()
+        if atual is None or not atual.leitura or atual.primario or atual.escreveu or not replicas:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # leitura dentro de transação: tem de ver o que a transação gravou
+            return DEFAULT_DB_ALIAS
+        if atual.replica not in replicas:
+            # uma réplica por requisição: leituras seguidas veem o mesmo ponto
+            atual.replica = random.choice(replicas)
+        return atual.replica
+
+    def db_for_write(self, model, **hints):
+        atual = _estado.get()
+        if atual is not None:
+            atual.escreveu = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        bancos = {DEFAULT_DB_ALIAS, *_replicas()}
+        if obj1._state.db in bancos and obj2._state.db in bancos:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # as réplicas recebem o esquema por replicação
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaMiddleware:
+    """Mantém no primário, por alguns segundos, quem acabou de escrever."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _antes(self, request):
+        return _estado.set(Estado(primario=COOKIE in request.COOKIES))
+
+    def _depois(self, response):
+        if _estado.get().escreveu:
+            response.set_cookie(
+                COOKIE, '1', max_age=getattr(settings, 'CREDIARIO_REPLICA_ATRASO', 5),
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = self._antes(request)
+        try:
+            return self._depois(self.get_response(request))
+        finally:
+            _estado.reset(token)
+
+    async def __acall__(self, request):
+        token = self._antes(request)
+        try:
+            return self._depois(await self.get_response(request))
+        finally:
+            _estado.reset(token)
@@ -0,0 +1,150 @@
+# crediario/semeadura.py
+"""
+Gerador de dados sintéticos (comando seed_crediario e massa dos testes).
+
+Trabalha em blocos de clientes: cada bloco é gerado em memória, gravado com
+bulk_create numa transação e descartado, então o volume total não pesa na
+memória. Os dados saem coerentes com o que os models gravariam (total =
+soma dos itens, total_pago/saldo_restante/status conforme os pagamentos e
+saldo_devedor do cliente = notas − pagamentos, como snapshot sem
+lançamentos), de modo que check_total_pago e reconciliar_saldos não acusam
+nada.
+"""
+import random
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+from django.db import transaction
+from django.utils import timezone
+from .models import Cliente, ItemNota, Nota, Pagamento
+
+CENTAVOS = Decimal('0.01')
+METODOS = ['dinheiro', 'pix', 'cartao']
+
+
+@dataclass
+class Distribuicao:
+    """
+    Parâmetros da massa. Notas por cliente seguem `notas_distribuicao`:
+    'uniforme' entre notas_min e notas_max, ou 'pareto' (poucos clientes com
+    muitas notas, limitado a notas_max). Itens e preços são uniformes.
+    """
+    notas_min: int = 1
+    notas_max: int = 40
+    notas_distribuicao: str = 'uniforme'
+    itens_min: int = 1
+    itens_max: int = 5
+    preco_min: Decimal = Decimal('1.00')
+    preco_max: Decimal = Decimal('50.00')
+    pagas: float = 0.5
+    parciais: float = 0.25
+    dias_historico: int = 365
+    limite_crediario: Decimal = Decimal('100000.00')
+
+    def notas_do_cliente(self, rnd):
+        if self.notas_distribuicao == 'pareto':
+            return min(int(self.notas_min * rnd.paretovariate(1.2)), self.notas_max)
+        return rnd.randint(self.notas_min, self.notas_max)
+
+
+def _preco(rnd, dist):
+    centavos = rnd.randint(int(dist.preco_min * 100), int(dist.preco_max * 100))
+    return Decimal(centavos) / 100
+
+
+def _gerar_bloco(rnd, dist, inicio, quantidade, hoje):
+    """Gera (clientes, [(nota, itens, pagamento|None)]) sem gravar nada."""
+    clientes, notas = [], []
+    for i in range(inicio, inicio + quantidade):
+        cliente = Cliente(
+            nome=f'Cliente {i:07d}',
+            telefone=f'119{i:08d}',
+            limite_crediario=dist.limite_crediario,
+            saldo_devedor=Decimal('0.00'),
+        )
+        clientes.append(cliente)
+        for n in range(dist.notas_do_cliente(rnd)):
+            data = hoje - timedelta(days=rnd.randint(0, dist.dias_historico))
+            itens = []
+            for _ in range(rnd.randint(dist.itens_min, dist.itens_max)):
+                quantidade_item = Decimal(rnd.randint(1, 5))
+                preco = _preco(rnd, dist)
+                itens.append(ItemNota(
+                    descricao=f'Produto {rnd.randint(1, 500)}',
+                    quantidade=quantidade_item,
+                    preco_unitario=preco,
+                    subtotal=(quantidade_item * preco).quantize(CENTAVOS),
+                ))
+            total = sum((item.subtotal for item in itens), Decimal('0.00'))
+            sorteio = rnd.random()
+            if sorteio < dist.pagas:
+                pago = total
+            elif sorteio < dist.pagas + dist.parciais:
+                pago = (total / 2).quantize(CENTAVOS)
+            else:
+                pago = Decimal('0.00')
+            nota = Nota(
+                cliente=cliente,
+                numero_nota=f'{i}-{n}',
+                data_nota=data,
+                vencimento=data + timedelta(days=30),
+                total=total,
+                total_pago=pago,
+                saldo_restante=total - pago,
+                status=Nota.status_por_pagamento(total, pago),
+            )
+            pagamento = None
+            if pago:
+                pagamento = Pagamento(
+                    cliente=cliente,
+                    valor_pagamento=pago,
+                    data_pagamento=min(data + timedelta(days=rnd.randint(0, 30)), hoje),
+                    metodo=rnd.choice(METODOS),
+                )
+            cliente.saldo_devedor += nota.saldo_restante
+            notas.append((nota, itens, pagamento))
+    return clientes, notas
+
+
+def _gravar_bloco(clientes, notas, batch_size):
+    with transaction.atomic():
+        Cliente.objects.bulk_create(clientes, batch_size=batch_size)
+        for nota, _, _ in notas:
+            nota.cliente_id = nota.cliente.pk
+        Nota.objects.bulk_create([n for n, _, _ in notas], batch_size=batch_size)
+        itens, pagamentos = [], []
+        for nota, itens_nota, pagamento in notas:
+            for item in itens_nota:
+                item.nota_id = nota.pk
+            itens.extend(itens_nota)
+            if pagamento is not None:
+                pagamento.cliente_id = nota.cliente_id
+                pagamento.nota_id = nota.pk
+                pagamentos.append(pagamento)
+        ItemNota.objects.bulk_create(itens, batch_size=batch_size)
+        Pagamento.objects.bulk_create(pagamentos, batch_size=batch_size)
+    return len(itens), len(pagamentos)
+
+
+def semear(clientes, dist=None, semente=42, bloco=1000, batch_size=2000, progresso=None):
+    """
+    Grava `clientes` clientes com suas notas, itens e pagamentos. Chama
+    progresso(contagens) a cada bloco gravado; devolve as contagens finais.
+    """
+    dist = dist or Distribuicao()
+    rnd = random.Random(semente)
+    hoje = timezone.localdate()
+    # continua a numeração de nomes/telefones de execuções anteriores
+    base = Cliente.objects.count()
+    contagens = {'clientes': 0, 'notas': 0, 'itens': 0, 'pagamentos': 0}
+    for inicio in range(0, clientes, bloco):
+        quantidade = min(bloco, clientes - inicio)
+        lista_clientes, notas = _gerar_bloco(rnd, dist, base + inicio, quantidade, hoje)
+        n_itens, n_pagamentos = _gravar_bloco(lista_clientes, notas, batch_size)
+        contagens['clientes'] += len(lista_clientes)
+        contagens['notas'] += len(notas)
+        contagens['itens'] += n_itens
+        contagens['pagamentos'] += n_pagamentos
+        if progresso:
+            progresso(contagens)
+    return contagens
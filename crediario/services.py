@@ -0,0 +1,134 @@
+# crediario/services.py
+from decimal import Decimal
+from django.db import models, transaction
+from django.db.models import Case, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+from .alocacao import alocar_pagamentos
+from .models import AlocacaoPagamento, Cliente, Nota, ItemNota, Pagamento
+
+CENTAVOS = Decimal('0.01')
+DINHEIRO = models.DecimalField(max_digits=12, decimal_places=2)
+ZERO = Value(Decimal('0.00'), output_field=DINHEIRO)
+
+
+def _soma_por_nota(queryset, campo):
+    soma = (
+        queryset.filter(nota=OuterRef('pk'))
+        .order_by()
+        .values('nota')
+        .annotate(s=Sum(campo))
+        .values('s')
+    )
+    return Coalesce(Subquery(soma, output_field=DINHEIRO), ZERO)
+
+
+def soma_pagamentos(pagamentos=Pagamento, alocacoes=AlocacaoPagamento):
+    """
+    Soma real do que foi pago em cada nota (0 se nada): pagamentos feitos na
+    nota mais as alocações de pagamentos do cliente (ver alocacao.py). Para
+    as notas arquivadas, passe os modelos do arquivo.
+    """
+    return models.ExpressionWrapper(
+        _soma_por_nota(pagamentos.objects.all(), 'valor_pagamento')
+        + _soma_por_nota(alocacoes.objects.all(), 'valor'),
+        output_field=DINHEIRO,
+    )
+
+
+def soma_itens():
+    """Subquery com a soma dos subtotais dos itens de cada nota."""
+    return _soma_por_nota(ItemNota.objects.all(), 'subtotal')
+
+
+def status_por_pagamento_sql(total=None):
+    """
+    Mesma regra de Nota.status_por_pagamento, como expressão SQL (mantém
+    canceladas). `total`: expressão do novo total, num UPDATE que o altera.
+    """
+    return Case(
+        When(status=Nota.STATUS_CANCELADA, then=F('status')),
+        When(total_pago__gte=F('total') if total is None else total, then=Value(Nota.STATUS_PAGA)),
+        When(total_pago__gt=0, then=Value(Nota.STATUS_PARCIAL)),
+        default=Value(Nota.STATUS_ABERTA),
+    )
+
+
+def recalcular_pagamentos_notas(notas):
+    """
+    Recalcula total_pago, saldo_restante e status das `notas` (queryset) a
+    partir dos pagamentos, com UPDATEs set-based.
+    """
+    notas.update(total_pago=soma_pagamentos(), atualizado_em=timezone.now())
+    notas.update(saldo_restante=F('total') - F('total_pago'), status=status_por_pagamento_sql())
+
+
+def itens_do_formset(formset):
+    """
+    Extrai os dados dos itens de um ItemFormSet já validado, ignorando
+    formulários vazios ou marcados para remoção.
+    """
+    itens = []
+    for item_form in formset:
+        dados = item_form.cleaned_data
+        if not dados or dados.get('DELETE'):
+            continue
+        if dados.get('descricao') is None:
+            continue
+        itens.append({
+            'descricao': dados['descricao'],
+            'quantidade': dados.get('quantidade') or Decimal('0'),
+            'preco_unitario': dados.get('preco_unitario') or Decimal('0'),
+        })
+    return itens
+
+
+def criar_nota_com_itens(nota, itens):
+    """
+    Cria a nota e todos os seus itens de uma vez.
+
+    Os subtotais e o total são calculados em memória e o limite de crediário é
+    validado antes de qualquer escrita. Depois disso a nota é gravada já com o
+    total final (Nota.save registra um único lançamento com o total) e os
+    itens entram com um único bulk_create, sem passar por ItemNota.save().
+
+    Levanta ValidationError se o limite do cliente for excedido.
+    """
+    objs = []
+    total = Decimal('0.00')
+    for dados in itens:
+        quantidade = dados.get('quantidade') or Decimal('0')
+        preco = dados.get('preco_unitario') or Decimal('0')
+        subtotal = (quantidade * preco).quantize(CENTAVOS)
+        objs.append(ItemNota(
+            descricao=dados['descricao'],
+            quantidade=quantidade,
+            preco_unitario=preco,
+            subtotal=subtotal,
+        ))
+        total += subtotal
+
+    with transaction.atomic():
+        # lock no cliente só aqui: serializa criações de nota concorrentes para
+        # que duas não passem juntas pela validação do limite
+        cliente = Cliente.objects.select_for_update().get(pk=nota.cliente_id)
+        saldo = cliente.saldo_atual()
+        novo_saldo = saldo + total
+        if cliente.limite_crediario is not None and novo_saldo > cliente.limite_crediario:
+            raise ValidationError(
+                f'Limite de crediário excedido: limite {cliente.limite_crediario} / novo saldo {novo_saldo}'
+            )
+
+        nota.total = total
+        nota.save()
+
+        for obj in objs:
+            obj.nota = nota
+        ItemNota.objects.bulk_create(objs)
+
+        if saldo < 0:
+            # saldo negativo: sobrou crédito de pagamento sem nota, que já abate a nota nova
+            alocar_pagamentos(cliente.pk, travado=True)
+
+    return nota
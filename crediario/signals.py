@@ -0,0 +1,34 @@
+# crediario/signals.py
+"""
+Invalidação do cache de páginas (ver cache.py) nas gravações feitas pelo ORM.
+Conectados em CrediarioConfig.ready().
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .cache import invalidar_clientes, invalidar_notas
+from .models import Anexo, Cliente, ItemNota, Nota, Pagamento
+
+
+@receiver([post_save, post_delete], sender=Cliente)
+def cliente_alterado(sender, instance, **kwargs):
+    invalidar_clientes([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Nota)
+def nota_alterada(sender, instance, **kwargs):
+    invalidar_notas([instance.pk])
+    invalidar_clientes([instance.cliente_id])
+
+
+@receiver([post_save, post_delete], sender=ItemNota)
+@receiver([post_save, post_delete], sender=Anexo)
+def filho_da_nota_alterado(sender, instance, **kwargs):
+    invalidar_notas([instance.nota_id])
+
+
+@receiver([post_save, post_delete], sender=Pagamento)
+def pagamento_alterado(sender, instance, **kwargs):
+    # se o pagamento trocou de nota, a nota antiga já teve atualizado_em
+    # alterado por aplicar_pagamento, o que muda a versão dela
+    invalidar_notas([instance.nota_id])
+    invalidar_clientes([instance.cliente_id])
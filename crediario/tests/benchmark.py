@@ -0,0 +1,68 @@
+"""
+Orçamento de consultas e relatório de tempos.
+
+TesteComOrcamento.medir() roda um trecho contando as consultas SQL, falha se
+passar do orçamento e guarda consultas e tempo em RESULTADOS. No fim do
+processo de testes o relatório é gravado em JSON (CREDIARIO_BENCH_RELATORIO,
+padrão logs/benchmark.json) para comparar entre commits com
+`manage.py comparar_benchmark antes.json depois.json`.
+"""
+import atexit
+import json
+import os
+import subprocess
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from .dados import escala
+
+RESULTADOS = {}
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+@atexit.register
+def gravar_relatorio():
+    if not RESULTADOS:
+        return
+    destino = os.getenv('CREDIARIO_BENCH_RELATORIO') or str(settings.BASE_DIR / 'logs' / 'benchmark.json')
+    relatorio = {
+        'gerado_em': timezone.now().isoformat(),
+        'commit': _commit(),
+        'banco': connection.vendor,
+        'escala': escala(),
+        'resultados': dict(sorted(RESULTADOS.items())),
+    }
+    with open(destino, 'w', encoding='utf-8') as f:
+        json.dump(relatorio, f, indent=2)
+
+
+class TesteComOrcamento(TestCase):
+
+    @contextmanager
+    def medir(self, nome, orcamento):
+        """Executa o bloco; falha se fizer mais de `orcamento` consultas."""
+        with CaptureQueriesContext(connection) as consultas:
+            inicio = time.perf_counter()
+            yield consultas
+            duracao = time.perf_counter() - inicio
+        RESULTADOS[nome] = {
+            'consultas': len(consultas),
+            'orcamento': orcamento,
+            'segundos': round(duracao, 6),
+        }
+        if len(consultas) > orcamento:
+            sql = '\n'.join(f'  {q["sql"]}' for q in consultas.captured_queries)
+            self.fail(f'{nome}: {len(consultas)} consultas (orçamento {orcamento})\n{sql}')
@@ -0,0 +1,22 @@
+"""Massa de dados para os testes e benchmarks (ver crediario/semeadura.py)."""
+import os
+from crediario import semeadura
+from crediario.models import Cliente
+
+
+def escala():
+    """Multiplicador do volume (CREDIARIO_BENCH_ESCALA, padrão 1)."""
+    try:
+        return max(int(os.getenv('CREDIARIO_BENCH_ESCALA', '1')), 1)
+    except ValueError:
+        return 1
+
+
+def semear(clientes=50, notas_por_cliente=20, itens_por_nota=3, semente=42):
+    """Cria clientes com número fixo de notas e itens; devolve os clientes."""
+    dist = semeadura.Distribuicao(
+        notas_min=notas_por_cliente, notas_max=notas_por_cliente,
+        itens_min=itens_por_nota, itens_max=itens_por_nota,
+    )
+    semeadura.semear(clientes, dist, semente=semente)
+    return list(Cliente.objects.order_by('pk'))
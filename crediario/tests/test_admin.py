@@ -0,0 +1,102 @@
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from django.contrib.admin import helpers
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from crediario.models import Cliente, Nota, Pagamento
+from crediario.services import criar_nota_com_itens
+
+
+class AdminNotaPagamentoTest(TestCase):
+
+    def setUp(self):
+        usuario = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'x')
+        self.client.force_login(usuario)
+        self.cliente = Cliente.objects.create(nome='Maria', limite_crediario=Decimal('10000.00'))
+        self.nota = criar_nota_com_itens(
+            Nota(cliente=self.cliente, vencimento=date(2024, 1, 10)),
+            [{'descricao': 'Item', 'quantidade': Decimal('1'), 'preco_unitario': Decimal('100.00')}],
+        )
+
+    def pagar(self, valor, nota=None):
+        return Pagamento.objects.create(
+            cliente=self.cliente, nota=nota, valor_pagamento=Decimal(valor), data_pagamento=date(2024, 1, 5),
+        )
+
+    def test_excluir_selecionados_estorna_os_pagamentos(self):
+        pagamentos = [self.pagar('30.00', self.nota), self.pagar('20.00')]
+        self.assertEqual(self.cliente.saldo_atual(), Decimal('50.00'))
+
+        resposta = self.client.post(reverse('admin:crediario_pagamento_changelist'), {
+            'action': 'delete_selected', 'post': 'yes',
+            helpers.ACTION_CHECKBOX_NAME: [p.pk for p in pagamentos],
+        })
+        self.assertEqual(resposta.status_code, 302)
+        self.assertFalse(Pagamento.objects.exists())
+
+        self.nota.refresh_from_db()
+        self.assertEqual((self.nota.total_pago, self.nota.status), (Decimal('0.00'), Nota.STATUS_ABERTA))
+        self.assertFalse(self.nota.alocacoes.exists())
+        self.assertEqual(self.cliente.saldo_atual(), Decimal('100.00'))
+        for comando in ('check_total_pago', 'reconciliar_saldos'):
+            saida = StringIO()
+            call_command(comando, *(['--dry-run'] if comando == 'reconciliar_saldos' else []), stdout=saida)
+            self.assertIn('divergentes: 0', saida.getvalue())
+
+    def test_excluir_nota_estorna_o_livro_e_realoca_os_pagamentos(self):
+        outra = criar_nota_com_itens(
+            Nota(cliente=self.cliente, vencimento=date(2024, 2, 10)),
+            [{'descricao': 'Item', 'quantidade': Decimal('1'), 'preco_unitario': Decimal('50.00')}],
+        )
+        self.pagar('30.00', self.nota)
+        self.pagar('20.00')
+        self.nota.refresh_from_db()
+        self.assertEqual(self.nota.total_pago, Decimal('50.00'))
+
+        resposta = self.client.post(reverse('admin:crediario_nota_changelist'), {
+            'action': 'delete_selected', 'post': 'yes', helpers.ACTION_CHECKBOX_NAME: [self.nota.pk],
+        })
+        self.assertEqual(resposta.status_code, 302)
+        self.assertFalse(Nota.objects.filter(pk=self.nota.pk).exists())
+
+        # os 50,00 pagos na nota apagada voltam ao cliente e quitam a outra
+        outra.refresh_from_db()
+        self.assertEqual((outra.total_pago, outra.status), (Decimal('50.00'), Nota.STATUS_PAGA))
+        self.assertEqual(self.cliente.saldo_atual(), Decimal('0.00'))
+        for comando in ('check_total_pago', 'reconciliar_saldos'):
+            saida = StringIO()
+            call_command(comando, *(['--dry-run'] if comando == 'reconciliar_saldos' else []), stdout=saida)
+            self.assertIn('divergentes: 0', saida.getvalue())
+
+    def test_formulario_da_nota_nao_apaga_pagamento(self):
+        # a nota é lida (instância ou formulário aberto) antes do pagamento
+        antiga = Nota.objects.get(pk=self.nota.pk)
+        self.pagar('40.00', self.nota)
+        antiga.numero_nota = 'N0'
+        antiga.save()
+        resposta = self.client.post(reverse('admin:crediario_nota_change', args=[self.nota.pk]), {
+            'cliente': self.cliente.pk, 'numero_nota': 'N1', 'data_nota': '2024-01-01', 'vencimento': '2024-01-20',
+            'total_pago': '0.00', 'saldo_restante': '100.00', 'status': Nota.STATUS_ABERTA,
+        })
+        self.assertEqual(resposta.status_code, 302)
+
+        self.nota.refresh_from_db()
+        self.assertEqual(
+            (self.nota.numero_nota, self.nota.vencimento, self.nota.total_pago, self.nota.saldo_restante, self.nota.status),
+            ('N1', date(2024, 1, 20), Decimal('40.00'), Decimal('60.00'), Nota.STATUS_PARCIAL),
+        )
+
+    def test_novo_total_recalcula_saldo_e_status_no_banco(self):
+        antiga = Nota.objects.get(pk=self.nota.pk)
+        self.pagar('40.00', self.nota)
+        antiga.total = Decimal('40.00')
+        antiga.save()
+        self.assertEqual(
+            (antiga.total_pago, antiga.saldo_restante, antiga.status), (Decimal('40.00'), Decimal('0.00'), Nota.STATUS_PAGA),
+        )
+        self.nota.refresh_from_db()
+        self.assertEqual((self.nota.saldo_restante, self.nota.status), (Decimal('0.00'), Nota.STATUS_PAGA))
+        self.assertEqual(self.cliente.saldo_atual(), Decimal('0.00'))
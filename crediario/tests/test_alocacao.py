@@ -0,0 +1,104 @@
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.urls import reverse
+from crediario.alocacao import alocar_pagamentos
+from crediario.models import AlocacaoPagamento, Cliente, Nota, Pagamento
+from crediario.services import criar_nota_com_itens
+from .benchmark import TesteComOrcamento
+
+
+class AlocacaoTest(TesteComOrcamento):
+
+    def setUp(self):
+        self.cliente = Cliente.objects.create(nome='Maria', limite_crediario=Decimal('10000.00'))
+
+    def nota(self, total, vencimento, cliente=None):
+        return criar_nota_com_itens(
+            Nota(cliente=cliente or self.cliente, vencimento=vencimento),
+            [{'descricao': 'Item', 'quantidade': Decimal('1'), 'preco_unitario': total}],
+        )
+
+    def pagar(self, valor):
+        return Pagamento.objects.create(cliente=self.cliente, valor_pagamento=Decimal(valor))
+
+    def estado(self, *notas):
+        return [
+            (n.status, n.total_pago, n.saldo_restante)
+            for n in Nota.objects.filter(pk__in=[n.pk for n in notas]).order_by('vencimento')
+        ]
+
+    def test_vencimento_mais_antigo_primeiro(self):
+        nova = self.nota(Decimal('50.00'), date(2024, 3, 10))
+        antiga = self.nota(Decimal('30.00'), date(2024, 1, 10))
+        sem_vencimento = self.nota(Decimal('20.00'), None)
+        pagamento = self.pagar('45.00')
+        self.assertEqual(self.estado(antiga, nova), [
+            (Nota.STATUS_PAGA, Decimal('30.00'), Decimal('0.00')),
+            (Nota.STATUS_PARCIAL, Decimal('15.00'), Decimal('35.00')),
+        ])
+        sem_vencimento.refresh_from_db()
+        self.assertEqual(sem_vencimento.status, Nota.STATUS_ABERTA)
+        self.assertEqual(
+            list(pagamento.alocacoes.values_list('nota_id', 'valor')),
+            [(antiga.pk, Decimal('30.00')), (nova.pk, Decimal('15.00'))],
+        )
+        self.assertEqual(self.cliente.saldo_atual(), Decimal('55.00'))
+
+    def test_consultas_nao_crescem_com_notas(self):
+        consultas = []
+        for i, n_notas in enumerate((2, 20)):
+            cliente = Cliente.objects.create(nome=f'C{i}', limite_crediario=Decimal('10000.00'))
+            for _ in range(n_notas):
+                self.nota(Decimal('10.00'), date(2024, 1, 10), cliente=cliente)
+            with self.medir(f'escrita.pagamento_cliente.{n_notas}_notas', 11) as ctx:
+                Pagamento.objects.create(cliente=cliente, valor_pagamento=Decimal(10 * n_notas))
+            consultas.append(len(ctx))
+            self.assertFalse(Nota.objects.filter(cliente=cliente).exclude(status=Nota.STATUS_PAGA).exists())
+        self.assertEqual(len(set(consultas)), 1, consultas)
+
+    def test_credito_abate_nota_nova(self):
+        primeira = self.nota(Decimal('10.00'), date(2024, 1, 10))
+        self.pagar('25.00')
+        segunda = self.nota(Decimal('40.00'), date(2024, 2, 10))
+        self.assertEqual(self.estado(primeira, segunda), [
+            (Nota.STATUS_PAGA, Decimal('10.00'), Decimal('0.00')),
+            (Nota.STATUS_PARCIAL, Decimal('15.00'), Decimal('25.00')),
+        ])
+        self.assertEqual(alocar_pagamentos(self.cliente.pk), [])
+
+    def test_edicao_e_exclusao_desfazem_alocacoes(self):
+        nota = self.nota(Decimal('30.00'), date(2024, 1, 10))
+        pagamento = self.pagar('30.00')
+        pagamento.valor_pagamento = Decimal('12.00')
+        pagamento.save()
+        self.assertEqual(self.estado(nota), [(Nota.STATUS_PARCIAL, Decimal('12.00'), Decimal('18.00'))])
+        self.assertEqual(pagamento.alocacoes.get().valor, Decimal('12.00'))
+
+        pagamento.delete()
+        self.assertEqual(self.estado(nota), [(Nota.STATUS_ABERTA, Decimal('0.00'), Decimal('30.00'))])
+        self.assertFalse(AlocacaoPagamento.objects.exists())
+        self.assertEqual(self.cliente.saldo_atual(), Decimal('30.00'))
+
+    def test_comando_aloca_pagamentos_antigos(self):
+        nota = self.nota(Decimal('30.00'), date(2024, 1, 10))
+        # bulk_create não passa por Pagamento.save (como em importações antigas)
+        Pagamento.objects.bulk_create([Pagamento(cliente=self.cliente, valor_pagamento=Decimal('30.00'))])
+        saida = StringIO()
+        call_command('alocar_pagamentos', stdout=saida)
+        self.assertIn('Clientes alocados: 1 — alocações: 1', saida.getvalue())
+        self.assertEqual(self.estado(nota), [(Nota.STATUS_PAGA, Decimal('30.00'), Decimal('0.00'))])
+
+        saida = StringIO()
+        call_command('check_total_pago', stdout=saida)
+        self.assertIn('divergentes: 0', saida.getvalue())
+
+    def test_view_pagamento_sem_nota(self):
+        nota = self.nota(Decimal('30.00'), date(2024, 1, 10))
+        dados = {'cliente': self.cliente.pk, 'valor_pagamento': '30.00', 'metodo': 'pix'}
+        resposta = self.client.post(reverse('crediario:pagamento_create'), dados, follow=True)
+        self.assertRedirects(resposta, reverse('crediario:cliente_detail', args=[self.cliente.pk]))
+        self.assertContains(resposta, 'alocado em 1 nota(s)')
+        resposta = self.client.get(reverse('crediario:nota_detail', args=[nota.pk]))
+        self.assertContains(resposta, 'do cliente')
@@ -0,0 +1,144 @@
+import io
+import os
+import shutil
+import tempfile
+from unittest import skipUnless
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from crediario.models import Anexo, Nota
+from .dados import semear
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+JPEG = b'\xff\xd8\xff\xe0' + b'\x00JFIF' + os.urandom(200 * 1024)
+
+
+class AnexoTestBase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        semear(clientes=1, notas_por_cliente=2)
+        cls.notas = list(Nota.objects.order_by('pk'))
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        configuracao = override_settings(MEDIA_ROOT=self.media)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+    def enviar(self, nota, conteudo, nome='foto.jpg', cliente=None):
+        url = reverse('crediario:anexo_upload', args=[nota.pk]) + '?format=json'
+        return (cliente or self.client).post(url, {'arquivo': SimpleUploadedFile(nome, conteudo)})
+
+
+class AnexoUploadTest(AnexoTestBase):
+
+    def test_grava_metadados_e_caminho_pelo_conteudo(self):
+        dados = self.enviar(self.notas[0], JPEG).json()
+        anexo = Anexo.objects.get(pk=dados['anexos'][0]['id'])
+        self.assertEqual(anexo.mime_type, 'image/jpeg')
+        self.assertEqual(anexo.tamanho_bytes, len(JPEG))
+        self.assertEqual(len(anexo.sha256), 64)
+        self.assertEqual(anexo.arquivo.name, f'notas/{anexo.sha256[:2]}/{anexo.sha256[2:4]}/{anexo.sha256}.jpg')
+        with anexo.arquivo.open('rb') as f:
+            self.assertEqual(f.read(), JPEG)
+
+    def test_duplicado_guarda_um_arquivo(self):
+        primeiro = self.enviar(self.notas[0], JPEG).json()['anexos'][0]
+        repetido = self.enviar(self.notas[0], JPEG, nome='outra.jpg').json()['anexos'][0]
+        outra_nota = self.enviar(self.notas[1], JPEG).json()['anexos'][0]
+        self.assertEqual(repetido['id'], primeiro['id'])
+        self.assertFalse(repetido['novo'])
+        self.assertNotEqual(outra_nota['id'], primeiro['id'])
+        arquivos = [f for _, _, nomes in os.walk(os.path.join(self.media, 'notas')) for f in nomes]
+        self.assertEqual(arquivos, [primeiro['sha256'] + '.jpg'])
+
+    def test_recusa_tipo_desconhecido(self):
+        resposta = self.enviar(self.notas[0], b'#!/bin/sh\necho oi\n', nome='foto.jpg')
+        self.assertEqual(resposta.status_code, 400)
+        self.assertFalse(Anexo.objects.exists())
+        self.assertEqual(os.listdir(os.path.join(self.media, 'notas', '.tmp')), [])
+
+    @override_settings(CREDIARIO_ANEXO_MAX_BYTES=100 * 1024)
+    def test_recusa_acima_do_limite(self):
+        resposta = self.enviar(self.notas[0], JPEG)
+        self.assertEqual(resposta.status_code, 400)
+        self.assertIn('limite', resposta.json()['erros'][0])
+        self.assertEqual(os.listdir(os.path.join(self.media, 'notas', '.tmp')), [])
+
+    def test_exige_csrf(self):
+        resposta = self.enviar(self.notas[0], JPEG, cliente=Client(enforce_csrf_checks=True))
+        self.assertEqual(resposta.status_code, 403)
+        self.assertFalse(Anexo.objects.exists())
+        arquivos = [f for _, _, nomes in os.walk(os.path.join(self.media, 'notas')) for f in nomes]
+        self.assertEqual(arquivos, [])
+
+
+class AnexoEntregaTest(AnexoTestBase):
+
+    def setUp(self):
+        super().setUp()
+        dados = self.enviar(self.notas[0], JPEG).json()['anexos'][0]
+        self.anexo = Anexo.objects.get(pk=dados['id'])
+        self.url = reverse('crediario:anexo_arquivo', args=[self.anexo.pk])
+
+    def test_inteiro_com_etag(self):
+        resposta = self.client.get(self.url)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(b''.join(resposta.streaming_content), JPEG)
+        self.assertEqual(resposta['ETag'], f'"{self.anexo.sha256}"')
+        self.assertEqual(resposta['Accept-Ranges'], 'bytes')
+        self.assertIn('immutable', resposta['Cache-Control'])
+
+    def test_if_none_match(self):
+        resposta = self.client.get(self.url, headers={'If-None-Match': f'"{self.anexo.sha256}"'})
+        self.assertEqual(resposta.status_code, 304)
+
+    def test_range(self):
+        resposta = self.client.get(self.url, headers={'Range': 'bytes=10-19'})
+        self.assertEqual(resposta.status_code, 206)
+        self.assertEqual(resposta['Content-Range'], f'bytes 10-19/{len(JPEG)}')
+        self.assertEqual(b''.join(resposta.streaming_content), JPEG[10:20])
+        sufixo = self.client.get(self.url, headers={'Range': 'bytes=-5'})
+        self.assertEqual(b''.join(sufixo.streaming_content), JPEG[-5:])
+
+    def test_range_insatisfazivel_e_if_range(self):
+        resposta = self.client.get(self.url, headers={'Range': f'bytes={len(JPEG)}-'})
+        self.assertEqual(resposta.status_code, 416)
+        resposta = self.client.get(self.url, headers={'Range': 'bytes=0-9', 'If-Range': '"outra"'})
+        self.assertEqual(resposta.status_code, 200)
+
+    def test_offload(self):
+        with self.settings(CREDIARIO_ANEXO_OFFLOAD='x-accel-redirect'):
+            resposta = self.client.get(self.url)
+        self.assertEqual(resposta['X-Accel-Redirect'], '/protegido/' + self.anexo.arquivo.name)
+        self.assertEqual(resposta.content, b'')
+        with self.settings(CREDIARIO_ANEXO_OFFLOAD='x-sendfile'):
+            resposta = self.client.get(self.url)
+        self.assertEqual(resposta['X-Sendfile'], os.path.join(self.media, self.anexo.arquivo.name))
+
+    def test_miniatura_pendente(self):
+        resposta = self.client.get(reverse('crediario:anexo_miniatura', args=[self.anexo.pk]))
+        self.assertEqual(resposta.status_code, 404)
+
+    @skipUnless(Image, 'Pillow não instalado')
+    def test_gerar_miniaturas(self):
+        imagem = io.BytesIO()
+        Image.new('RGB', (1600, 1200), 'red').save(imagem, 'JPEG')
+        dados = self.enviar(self.notas[1], imagem.getvalue()).json()['anexos'][0]
+        call_command('gerar_miniaturas', stdout=io.StringIO(), stderr=io.StringIO())
+        anexo = Anexo.objects.get(pk=dados['id'])
+        self.assertTrue(anexo.miniatura_gerada)
+        resposta = self.client.get(reverse('crediario:anexo_miniatura', args=[anexo.pk]))
+        self.assertEqual(resposta.status_code, 200)
+        with Image.open(io.BytesIO(b''.join(resposta.streaming_content))) as miniatura:
+            self.assertEqual(miniatura.size, (320, 240))
+        # o JPEG aleatório do setUp não decodifica: conta como falha e segue pendente
+        self.anexo.refresh_from_db()
+        self.assertFalse(self.anexo.miniatura_gerada)
@@ -0,0 +1,77 @@
+import json
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.test import override_settings
+from django.urls import reverse
+from crediario.metricas import registro
+from crediario.models import ItemNota, Nota
+from crediario.paginacao import codificar_cursor
+from .benchmark import TesteComOrcamento
+from .dados import escala, semear
+
+
+async def _corpo(resposta):
+    return b''.join([parte async for parte in resposta.streaming_content])
+
+
+class ApiTest(TesteComOrcamento):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.clientes = semear(clientes=20 * escala())
+
+    def get(self, nome, orcamento, url):
+        # a view é assíncrona: passa pelo handler ASGI do AsyncClient
+        with self.medir(nome, orcamento):
+            resposta = async_to_sync(self.async_client.get)(url)
+            conteudo = async_to_sync(_corpo)(resposta) if resposta.streaming else resposta.content
+        return resposta, conteudo
+
+    def test_lista_com_campos_e_cursor(self):
+        url = reverse('crediario:api_listar', args=['notas'])
+        resposta, conteudo = self.get('api.notas', 1, url + '?fields=id,total&limite=5')
+        self.assertEqual(resposta.status_code, 200)
+        dados = json.loads(conteudo)
+        self.assertEqual(len(dados['results']), 5)
+        self.assertEqual(set(dados['results'][0]), {'id', 'total'})
+        # sem espaços: serialização compacta
+        self.assertNotIn(b', ', conteudo)
+
+        _, conteudo = self.get('api.notas.pagina_2', 1, url + f'?fields=id&limite=5&cursor={dados["proximo"]}')
+        ids = [n['id'] for n in dados['results'] + json.loads(conteudo)['results']]
+        esperados = list(Nota.objects.order_by('-data_nota', '-id').values_list('id', flat=True)[:10])
+        self.assertEqual(ids, esperados)
+
+    def test_ndjson_em_streaming(self):
+        cliente = self.clientes[0]
+        url = reverse('crediario:api_listar', args=['itens']) + f'?formato=ndjson&fields=subtotal&cliente={cliente.pk}'
+        resposta, conteudo = self.get('api.itens.ndjson', 1, url)
+        self.assertTrue(resposta.streaming)
+        linhas = [json.loads(l) for l in conteudo.decode().splitlines()]
+        self.assertEqual(len(linhas), ItemNota.objects.filter(nota__cliente=cliente).count())
+        self.assertEqual(set(linhas[0]), {'subtotal'})
+
+    def test_detalhe_e_erros(self):
+        nota = Nota.objects.first()
+        resposta, conteudo = self.get('api.nota', 1, reverse('crediario:api_detalhe', args=['notas', nota.pk]) + '?fields=status')
+        self.assertEqual(json.loads(conteudo), {'status': nota.status})
+        resposta, _ = self.get('api.nota.404', 1, reverse('crediario:api_detalhe', args=['notas', 0]))
+        self.assertEqual(resposta.status_code, 404)
+        url = reverse('crediario:api_listar', args=['notas'])
+        self.assertEqual(self.get('api.campo_invalido', 0, url + '?fields=senha')[0].status_code, 400)
+        self.assertEqual(self.get('api.filtro_invalido', 0, url + '?de=ontem')[0].status_code, 400)
+        self.assertEqual(self.get('api.recurso_invalido', 0, url.replace('notas', 'usuarios'))[0].status_code, 404)
+        for valores in (['abc', 1], {'id': 1}, ['2024-01-01', 'x']):
+            resposta, conteudo = self.get('api.cursor_invalido', 0, url + f'?cursor={codificar_cursor(valores)}')
+            self.assertEqual(resposta.status_code, 400, valores)
+            self.assertIn('erro', json.loads(conteudo))
+
+    @override_settings(MIDDLEWARE=['crediario.metricas.MetricasMiddleware'] + [
+        m for m in settings.MIDDLEWARE if m != 'crediario.metricas.MetricasMiddleware'
+    ])
+    def test_metricas_no_caminho_assincrono(self):
+        registro.limpar()
+        self.get('api.clientes.metricas', 1, reverse('crediario:api_listar', args=['clientes']) + '?fields=nome,saldo')
+        texto = registro.prometheus()
+        self.assertIn('crediario_requisicoes_total{view="crediario:api_listar",metodo="GET",status="200"} 1', texto)
+        self.assertIn('crediario_sql_consultas_total{view="crediario:api_listar"} 1', texto)
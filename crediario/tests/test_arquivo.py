@@ -0,0 +1,112 @@
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.urls import reverse
+from crediario.arquivo import arquivar_notas
+from crediario.extrato import extrato_do_cliente
+from crediario.models import Cliente, ItemNota, Nota, NotaArquivada, Notificacao, Pagamento, PagamentoArquivado
+from crediario.services import criar_nota_com_itens
+from .benchmark import TesteComOrcamento
+
+CORTE = date(2024, 1, 1)
+
+
+class ArquivoTest(TesteComOrcamento):
+
+    def setUp(self):
+        self.cliente = Cliente.objects.create(nome='Maria', limite_crediario=Decimal('10000.00'))
+
+    def nota(self, total, data_nota, cliente=None):
+        return criar_nota_com_itens(
+            Nota(cliente=cliente or self.cliente, data_nota=data_nota, vencimento=data_nota),
+            [{'descricao': 'Item', 'quantidade': Decimal('1'), 'preco_unitario': total}],
+        )
+
+    def pagar(self, valor, data, nota=None, cliente=None):
+        return Pagamento.objects.create(
+            cliente=cliente or self.cliente, nota=nota, valor_pagamento=Decimal(valor), data_pagamento=data,
+        )
+
+    def test_arquiva_notas_pagas_antigas(self):
+        paga = self.nota(Decimal('40.00'), date(2023, 1, 10))
+        self.pagar('40.00', date(2023, 2, 1), nota=paga)
+        # pagamento do cliente que quita duas notas antigas: vai junto
+        a, b = self.nota(Decimal('10.00'), date(2023, 3, 1)), self.nota(Decimal('20.00'), date(2023, 3, 2))
+        self.pagar('30.00', date(2023, 4, 1))
+        # pagamento que caiu numa nota antiga e numa recente: as duas ficam
+        presa = self.nota(Decimal('10.00'), date(2023, 5, 1))
+        recente = self.nota(Decimal('50.00'), date(2024, 5, 1))
+        self.pagar('20.00', date(2024, 5, 2))
+        Notificacao.objects.create(cliente=self.cliente, nota=paga, tipo=Notificacao.TIPO_VENCIMENTO)
+        saldo = self.cliente.saldo_atual()
+        antes = extrato_do_cliente(self.cliente.pk)
+
+        totais = arquivar_notas(CORTE)
+        self.assertEqual(
+            (totais['notas'], totais['itens'], totais['pagamentos'], totais['alocacoes'], totais['notificacoes']),
+            (3, 3, 2, 2, 1),
+        )
+        self.assertEqual(sorted(NotaArquivada.objects.values_list('pk', flat=True)), [paga.pk, a.pk, b.pk])
+        self.assertEqual(sorted(Nota.objects.values_list('pk', flat=True)), [presa.pk, recente.pk])
+        self.assertFalse(ItemNota.objects.filter(nota_id=paga.pk).exists())
+        self.assertEqual(NotaArquivada.objects.get(pk=paga.pk).pagamentos.get().valor_pagamento, Decimal('40.00'))
+        self.assertEqual(PagamentoArquivado.objects.get(nota=None).alocacoes.count(), 2)
+        # rodar de novo não acha mais nada
+        self.assertEqual(arquivar_notas(CORTE)['notas'], 0)
+
+        # saldo e extrato sem o arquivo não mudam; com ele, a história volta inteira
+        self.assertEqual(self.cliente.saldo_atual(), saldo)
+        self.assertEqual(extrato_do_cliente(self.cliente.pk).itens[-1]['saldo'], saldo)
+        completo = extrato_do_cliente(self.cliente.pk, arquivo=True)
+        self.assertEqual([(m['tipo'], m['id']) for m in completo.itens], [(m['tipo'], m['id']) for m in antes.itens])
+        self.assertEqual(completo.itens[-1]['saldo'], saldo)
+
+        for comando in ('check_total_pago', 'reconciliar_saldos'):
+            saida = StringIO()
+            call_command(comando, *(['--dry-run'] if comando == 'reconciliar_saldos' else []), stdout=saida)
+            self.assertNotRegex(saida.getvalue(), r'divergentes: [1-9]')
+
+    def test_detalhe_e_extrato_leem_o_arquivo(self):
+        nota = self.nota(Decimal('40.00'), date(2023, 1, 10))
+        self.pagar('40.00', date(2023, 2, 1), nota=nota)
+        arquivar_notas(CORTE)
+
+        resposta = self.client.get(reverse('crediario:nota_detail', args=[nota.pk]))
+        self.assertContains(resposta, 'arquivada')
+        self.assertNotContains(resposta, 'Enviar anexo')
+        self.assertContains(resposta, 'R$ 40.00 — Feb. 1, 2023')
+
+        url = reverse('crediario:cliente_extrato', args=[self.cliente.pk])
+        self.assertEqual(self.client.get(url, {'format': 'json'}).json()['results'], [])
+        itens = self.client.get(url, {'format': 'json', 'arquivo': '1'}).json()['results']
+        self.assertEqual([m['tipo'] for m in itens], ['nota', 'pagamento'])
+
+    def test_exportacao_inclui_o_arquivo(self):
+        antiga = self.nota(Decimal('40.00'), date(2023, 1, 10))
+        self.pagar('40.00', date(2023, 2, 1), nota=antiga)
+        recente = self.nota(Decimal('50.00'), date(2024, 5, 1))
+        # criada depois, mas mais antiga que a arquivada: a ordem é por data
+        retroativa = self.nota(Decimal('10.00'), date(2022, 6, 1))
+        arquivar_notas(CORTE)
+
+        def exportar(tipo, **filtros):
+            resposta = self.client.get(reverse('crediario:exportar', args=[tipo]), filtros)
+            return [linha.split(',') for linha in b''.join(resposta.streaming_content).decode().splitlines()[1:]]
+
+        self.assertEqual([int(l[0]) for l in exportar('notas')], [retroativa.pk, antiga.pk, recente.pk])
+        self.assertEqual([int(l[1]) for l in exportar('itens')], [retroativa.pk, antiga.pk, recente.pk])
+        self.assertEqual([l[4] for l in exportar('pagamentos', de='2023-01-01', ate='2023-12-31')], ['2023-02-01'])
+        self.assertEqual([int(l[0]) for l in exportar('notas', status='paga')], [antiga.pk])
+
+    def test_consultas_nao_crescem_com_notas(self):
+        consultas = []
+        for i, n_notas in enumerate((2, 20)):
+            cliente = Cliente.objects.create(nome=f'C{i}', limite_crediario=Decimal('10000.00'))
+            for _ in range(n_notas):
+                nota = self.nota(Decimal('10.00'), date(2023, 1, 10), cliente=cliente)
+                self.pagar('10.00', date(2023, 1, 10), nota=nota, cliente=cliente)
+            with self.medir(f'escrita.arquivar_notas.{n_notas}_notas', 29) as ctx:
+                self.assertEqual(arquivar_notas(CORTE)['notas'], n_notas)
+            consultas.append(len(ctx))
+        self.assertEqual(len(set(consultas)), 1, consultas)
@@ -0,0 +1,13 @@
+from django.test import SimpleTestCase
+from crediario.management.commands.carga_crediario import percentil
+
+
+class PercentilTest(SimpleTestCase):
+
+    def test_posicao_mais_proxima(self):
+        valores = [15, 20, 35, 40, 50]
+        self.assertEqual([percentil(valores, p) for p in (0, 5, 30, 40, 50, 90, 100)], [15, 15, 20, 20, 35, 50, 50])
+        # round() daria o 2º valor (0.25 * 10 = 2.5 -> 2); o certo é o 3º
+        self.assertEqual(percentil(list(range(1, 11)), 25), 3)
+        self.assertEqual(percentil(list(range(1, 101)), 99), 99)
+        self.assertIsNone(percentil([], 50))
@@ -0,0 +1,210 @@
+"""
+Orçamento de consultas das views e das operações de escrita.
+
+Os orçamentos são tetos: o importante é que não cresçam com o volume (N+1).
+Por isso várias operações são medidas com tamanhos diferentes e o número de
+consultas precisa ser o mesmo.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from crediario import cache
+from crediario.models import Cliente, Nota, Notificacao, Pagamento
+from .benchmark import TesteComOrcamento
+from .dados import escala, semear
+
+
+class ViewsTest(TesteComOrcamento):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.clientes = semear(clientes=50 * escala())
+        cls.cliente = cls.clientes[0]
+        cls.nota = Nota.objects.filter(cliente=cls.cliente).order_by('pk').first()
+
+    def setUp(self):
+        cache._cache().clear()
+
+    def get(self, nome, orcamento, url):
+        with self.medir(nome, orcamento):
+            resposta = self.client.get(url)
+            if resposta.streaming:
+                b''.join(resposta.streaming_content)
+        self.assertEqual(resposta.status_code, 200)
+        return resposta
+
+    def test_nota_list(self):
+        url = reverse('crediario:nota_list')
+        self.get('view.nota_list', 1, url)
+        self.get('view.nota_list.json', 1, url + '?format=json')
+        self.get('view.nota_list.filtro', 1, url + '?status=aberta&de=2000-01-01')
+        resposta = self.get('view.nota_list.json_200', 1, url + '?format=json&limite=200')
+        self.get('view.nota_list.pagina_2', 1, url + '?format=json&cursor=' + resposta.json()['proximo'])
+
+    def test_clientes_list(self):
+        url = reverse('crediario:clientes_list')
+        self.get('view.clientes_list', 1, url)
+        self.get('view.clientes_list.json', 1, url + '?format=json&devedores=1')
+
+    def test_cliente_detail(self):
+        url = reverse('crediario:cliente_detail', args=[self.cliente.pk])
+        self.get('view.cliente_detail.frio', 3, url)
+        self.get('view.cliente_detail.cache', 1, url)
+
+    def test_nota_detail(self):
+        url = reverse('crediario:nota_detail', args=[self.nota.pk])
+        self.get('view.nota_detail.frio', 6, url)
+        self.get('view.nota_detail.cache', 1, url)
+
+    def test_cache_invalida_com_pagamento(self):
+        nota = Nota.objects.filter(saldo_restante__gt=0).first()
+        url = reverse('crediario:nota_detail', args=[nota.pk])
+        self.client.get(url)
+        # o pagamento muda atualizado_em da nota, logo a versão da entrada
+        Pagamento.objects.create(cliente_id=nota.cliente_id, nota=nota, valor_pagamento=Decimal('0.01'))
+        self.client.get(url)
+        self.assertEqual(cache.estatisticas()['nota'], {'hits': 0, 'misses': 2})
+
+    def test_nota_falta(self):
+        self.get('view.nota_falta', 1, reverse('crediario:nota_falta', args=[self.nota.pk]))
+
+    def test_buscas(self):
+        self.get('view.cliente_buscar', 1, reverse('crediario:cliente_buscar') + '?q=Cli')
+        self.get('view.nota_buscar', 1, reverse('crediario:nota_buscar') + f'?cliente={self.cliente.pk}')
+
+    def test_extrato(self):
+        url = reverse('crediario:cliente_extrato', args=[self.cliente.pk])
+        resposta = self.get('view.cliente_extrato.json', 2, url + '?format=json&limite=5')
+        dados = resposta.json()
+        self.get('view.cliente_extrato.pagina_2', 2, url + '?format=json&limite=5&cursor=' + dados['proximo'])
+        # o saldo acumulado da última linha da primeira página abre a segunda
+        proxima = self.client.get(url + '?format=json&limite=5&cursor=' + dados['proximo']).json()
+        self.assertEqual(proxima['saldo_anterior'], dados['results'][-1]['saldo'])
+
+    def test_extrato_fecha_com_saldo(self):
+        url = reverse('crediario:cliente_extrato', args=[self.cliente.pk])
+        dados = self.client.get(url + '?format=json&limite=200').json()
+        self.assertEqual(Decimal(dados['results'][-1]['saldo']), self.cliente.saldo_atual())
+
+    def test_exportacao(self):
+        for tipo in ('notas', 'itens', 'pagamentos'):
+            self.get(f'view.exportar.{tipo}', 2, reverse('crediario:exportar', args=[tipo]))
+
+    def test_formularios(self):
+        self.get('view.nota_create.get', 0, reverse('crediario:nota_create'))
+        self.get('view.pagamento_create.get', 0, reverse('crediario:pagamento_create'))
+
+    def test_admin_changelists(self):
+        usuario = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'x')
+        self.client.force_login(usuario)
+        call_command('check_vencimentos', '--dias', '0,1,3,7,30', stdout=StringIO())
+        for modelo in ('cliente', 'nota', 'itemnota', 'pagamento', 'anexo', 'notificacao', 'lancamento'):
+            url = reverse(f'admin:crediario_{modelo}_changelist')
+            self.get(f'admin.{modelo}_changelist', 8, url)
+        ano = self.nota.data_nota.year
+        self.get('admin.nota_changelist.data', 8,
+                 reverse('admin:crediario_nota_changelist') + f'?data_nota__year={ano}&status=paga')
+        self.get('admin.lancamento_changelist.filtro', 8,
+                 reverse('admin:crediario_lancamento_changelist') + '?tipo=nota')
+
+    def test_admin_formularios_sem_listar_fks(self):
+        # autocomplete: o formulário não carrega todos os clientes/notas como <option>
+        usuario = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'x')
+        self.client.force_login(usuario)
+        for modelo in ('nota', 'itemnota', 'pagamento'):
+            self.get(f'admin.{modelo}_add', 6, reverse(f'admin:crediario_{modelo}_add'))
+        self.get('admin.autocomplete', 6, reverse('admin:autocomplete') + '?app_label=crediario'
+                 '&model_name=pagamento&field_name=cliente&term=Cliente')
+
+
+class EscritaTest(TesteComOrcamento):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.clientes = semear(clientes=5, notas_por_cliente=5)
+
+    def dados_nota(self, cliente, n_itens):
+        dados = {
+            'cliente': cliente.pk, 'numero_nota': 'N', 'data_nota': '2024-01-10', 'vencimento': '',
+            'itens-TOTAL_FORMS': n_itens, 'itens-INITIAL_FORMS': 0,
+            'itens-MIN_NUM_FORMS': 0, 'itens-MAX_NUM_FORMS': 1000,
+        }
+        for i in range(n_itens):
+            dados.update({
+                f'itens-{i}-descricao': f'Item {i}',
+                f'itens-{i}-quantidade': '2',
+                f'itens-{i}-preco_unitario': '1.50',
+            })
+        return dados
+
+    def test_nota_create_nao_cresce_com_itens(self):
+        consultas = []
+        for n_itens in (1, 10, 50):
+            with self.medir(f'escrita.nota_create.{n_itens}_itens', 11) as ctx:
+                resposta = self.client.post(reverse('crediario:nota_create'), self.dados_nota(self.clientes[1], n_itens))
+            self.assertEqual(resposta.status_code, 302)
+            consultas.append(len(ctx))
+        self.assertEqual(len(set(consultas)), 1, consultas)
+        nota = Nota.objects.order_by('-pk').first()
+        self.assertEqual(nota.total, Decimal('150.00'))
+        self.assertEqual(nota.itens.count(), 50)
+
+    def test_nota_create_acima_do_limite(self):
+        cliente = self.clientes[2]
+        Cliente.objects.filter(pk=cliente.pk).update(limite_crediario=Decimal('0.00'))
+        with self.medir('escrita.nota_create.limite_excedido', 8):
+            resposta = self.client.post(reverse('crediario:nota_create'), self.dados_nota(cliente, 3))
+        self.assertEqual(resposta.status_code, 200)
+        self.assertFalse(Nota.objects.filter(cliente=cliente, numero_nota='N').exists())
+
+    def test_pagamento_create(self):
+        nota = Nota.objects.filter(cliente=self.clientes[3], saldo_restante__gt=0).first()
+        dados = {'cliente': nota.cliente_id, 'nota': nota.pk, 'valor_pagamento': '0.50', 'metodo': 'pix'}
+        with self.medir('escrita.pagamento_create', 12):
+            resposta = self.client.post(reverse('crediario:pagamento_create'), dados)
+        self.assertEqual(resposta.status_code, 302)
+        nota.refresh_from_db()
+        self.assertEqual(nota.total_pago + nota.saldo_restante, nota.total)
+
+    def test_pagamento_acima_do_devido(self):
+        nota = Nota.objects.filter(cliente=self.clientes[4], saldo_restante__gt=0).first()
+        valor = nota.saldo_restante + Decimal('1.00')
+        dados = {'cliente': nota.cliente_id, 'nota': nota.pk, 'valor_pagamento': str(valor), 'metodo': 'pix'}
+        with self.medir('escrita.pagamento_create.acima_do_devido', 13):
+            resposta = self.client.post(reverse('crediario:pagamento_create'), dados)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertContains(resposta, 'excede o valor devido')
+        self.assertFalse(Pagamento.objects.filter(nota=nota, valor_pagamento=valor).exists())
+
+    def test_check_vencimentos_nao_cresce_com_notas(self):
+        daqui_a_3 = timezone.localdate() + timedelta(days=3)
+        Nota.objects.exclude(status=Nota.STATUS_PAGA).update(vencimento=daqui_a_3)
+        # lote maior que o volume: uma leitura, uma gravação e a leitura vazia final
+        with self.medir('comando.check_vencimentos', 4):
+            call_command('check_vencimentos', '--dias', '1,3,7', '--lote', '5000', stdout=StringIO())
+        self.assertTrue(Notificacao.objects.exists())
+        with self.medir('comando.check_vencimentos.repetido', 1):
+            call_command('check_vencimentos', '--dias', '1,3,7', '--lote', '5000', stdout=StringIO())
+
+    def test_check_total_pago(self):
+        # notas quentes + notas arquivadas
+        with self.medir('comando.check_total_pago', 2):
+            saida = StringIO()
+            call_command('check_total_pago', stdout=saida)
+        self.assertIn('divergentes: 0', saida.getvalue())
+
+    def test_reconciliar_saldos(self):
+        # + as somas das notas e pagamentos arquivados
+        with self.medir('comando.reconciliar_saldos', 6):
+            saida = StringIO()
+            call_command('reconciliar_saldos', '--dry-run', stdout=saida)
+        self.assertIn('divergentes: 0', saida.getvalue())
+
+    def test_nota_str_sem_n_mais_1(self):
+        with self.medir('modelo.nota_str.select_related', 1):
+            textos = [str(n) for n in Nota.objects.select_related('cliente')]
+        self.assertTrue(textos)
@@ -0,0 +1,117 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from crediario.encargos import Taxas, _gravar_lote, acumular_encargos
+from crediario.extrato import extrato_do_cliente
+from crediario.models import Cliente, Encargo, Nota, Pagamento
+from crediario.services import criar_nota_com_itens
+from .benchmark import TesteComOrcamento
+
+TAXAS = Taxas(multa=Decimal('2.00'), juros_mes=Decimal('1.00'))
+
+
+class EncargosTest(TesteComOrcamento):
+
+    def setUp(self):
+        self.cliente = Cliente.objects.create(nome='Maria', limite_crediario=Decimal('10000.00'))
+
+    def nota(self, total, vencimento, cliente=None):
+        return criar_nota_com_itens(
+            Nota(cliente=cliente or self.cliente, data_nota=vencimento - timedelta(days=30), vencimento=vencimento),
+            [{'descricao': 'Item', 'quantidade': Decimal('1'), 'preco_unitario': total}],
+        )
+
+    def pagar(self, nota, valor, data):
+        return Pagamento.objects.create(
+            cliente=self.cliente, nota=nota, valor_pagamento=Decimal(valor), data_pagamento=data,
+        )
+
+    def encargos(self, nota):
+        return list(nota.encargos.values_list('tipo', 'data', 'dias', 'valor'))
+
+    def test_multa_uma_vez_e_juros_por_dia(self):
+        nota = self.nota(Decimal('100.00'), date(2024, 1, 10))
+        em_dia = self.nota(Decimal('100.00'), date(2024, 2, 10))
+
+        totais = acumular_encargos(date(2024, 1, 20), TAXAS)
+        self.assertEqual((totais['notas'], totais['valor']), (1, Decimal('2.33')))
+        # mesma data de novo: nada a cobrar
+        self.assertEqual(acumular_encargos(date(2024, 1, 20), TAXAS)['encargos'], 0)
+        # um dia sem execução: a seguinte cobre os dois dias
+        acumular_encargos(date(2024, 1, 22), TAXAS)
+
+        self.assertEqual(self.encargos(nota), [
+            (Encargo.TIPO_MULTA, date(2024, 1, 20), 0, Decimal('2.00')),
+            (Encargo.TIPO_JUROS, date(2024, 1, 20), 10, Decimal('0.33')),
+            (Encargo.TIPO_JUROS, date(2024, 1, 22), 2, Decimal('0.07')),
+        ])
+        nota.refresh_from_db()
+        self.assertEqual(
+            (nota.total, nota.total_encargos, nota.saldo_restante, nota.status),
+            (Decimal('102.40'), Decimal('2.40'), Decimal('102.40'), Nota.STATUS_ABERTA),
+        )
+        self.assertFalse(em_dia.encargos.exists())
+        self.assertEqual(self.cliente.saldo_atual(), Decimal('202.40'))
+
+    def test_pagamento_quita_encargos_e_saldos_conferem(self):
+        nota = self.nota(Decimal('100.00'), date(2024, 1, 10))
+        acumular_encargos(date(2024, 1, 20), TAXAS)
+        self.pagar(nota, '52.33', date(2024, 1, 25))
+        acumular_encargos(date(2024, 2, 19), TAXAS)
+
+        # juros só sobre o principal em aberto (50,00), sem nova multa
+        self.assertEqual(self.encargos(nota)[2:], [(Encargo.TIPO_JUROS, date(2024, 2, 19), 30, Decimal('0.50'))])
+        self.pagar(nota, '50.50', date(2024, 2, 25))
+        nota.refresh_from_db()
+        self.assertEqual((nota.status, nota.saldo_restante), (Nota.STATUS_PAGA, Decimal('0.00')))
+        self.assertEqual(acumular_encargos(date(2024, 3, 1), TAXAS)['encargos'], 0)
+
+        pagina = extrato_do_cliente(self.cliente.pk)
+        self.assertEqual(
+            [(m['tipo'], m['valor']) for m in pagina.itens],
+            [('nota', Decimal('100.00')), ('encargo', Decimal('2.00')), ('encargo', Decimal('0.33')),
+             ('pagamento', Decimal('-52.33')), ('encargo', Decimal('0.50')), ('pagamento', Decimal('-50.50'))],
+        )
+        self.assertEqual(pagina.itens[-1]['saldo'], self.cliente.saldo_atual())
+
+        for comando in ('check_total_pago', 'reconciliar_saldos'):
+            saida = StringIO()
+            call_command(comando, *(['--dry-run'] if comando == 'reconciliar_saldos' else []), stdout=saida)
+            self.assertIn('divergentes: 0', saida.getvalue())
+
+    def test_nota_paga_depois_da_selecao_fica_de_fora(self):
+        nota = self.nota(Decimal('100.00'), date(2024, 1, 10))
+        outra = self.nota(Decimal('100.00'), date(2024, 1, 10))
+        # selecionadas para o lote, mas a primeira é quitada antes da trava
+        lote = [(nota.pk, self.cliente.pk), (outra.pk, self.cliente.pk)]
+        self.pagar(nota, '100.00', date(2024, 1, 19))
+        totais = {'notas': 0, 'encargos': 0, 'valor': Decimal('0.00')}
+        _gravar_lote(lote, date(2024, 1, 20), TAXAS, totais)
+
+        self.assertEqual(totais['notas'], 1)
+        nota.refresh_from_db()
+        self.assertEqual((nota.status, nota.saldo_restante, nota.total_encargos), (Nota.STATUS_PAGA, 0, 0))
+        self.assertFalse(nota.encargos.exists())
+        outra.refresh_from_db()
+        self.assertEqual((outra.status, outra.saldo_restante), (Nota.STATUS_ABERTA, Decimal('102.33')))
+        self.assertEqual(self.cliente.saldo_atual(), Decimal('102.33'))
+
+    def test_consultas_nao_crescem_com_notas(self):
+        consultas = []
+        for i, n_notas in enumerate((2, 40)):
+            cliente = Cliente.objects.create(nome=f'C{i}', limite_crediario=Decimal('10000.00'))
+            for _ in range(n_notas):
+                self.nota(Decimal('10.00'), date(2024, 1, 10), cliente=cliente)
+            # as notas da rodada anterior já têm os juros da data e ficam de fora
+            with self.medir(f'escrita.acumular_encargos.{n_notas}_notas', 9) as ctx:
+                totais = acumular_encargos(date(2024, 2, 1), TAXAS)
+            self.assertEqual(totais['notas'], n_notas)
+            consultas.append(len(ctx))
+        self.assertEqual(len(set(consultas)), 1, consultas)
+
+    def test_comando(self):
+        self.nota(Decimal('100.00'), date(2024, 1, 10))
+        saida = StringIO()
+        call_command('acumular_encargos', '--data', '2024-01-20', '--multa', '10', '--juros', '0', stdout=saida)
+        self.assertIn('Notas com encargos: 1 — encargos: 1 — total: R$ 10.00', saida.getvalue())
@@ -0,0 +1,57 @@
+import csv
+import os
+import tempfile
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from crediario.models import Cliente, Nota, Pagamento
+from crediario.services import criar_nota_com_itens
+
+
+class ExportarCrediarioTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cliente = Cliente.objects.create(nome='Maria, da Silva', limite_crediario=Decimal('10000.00'))
+        cls.notas = [
+            criar_nota_com_itens(
+                Nota(cliente=cls.cliente, numero_nota=numero, data_nota=data_nota),
+                [{'descricao': 'Item', 'quantidade': Decimal('2'), 'preco_unitario': Decimal('12.50')}],
+            )
+            for numero, data_nota in (('B', date(2024, 2, 1)), ('A', date(2024, 1, 1)))
+        ]
+        Pagamento.objects.create(
+            cliente=cls.cliente, nota=cls.notas[1], valor_pagamento=Decimal('25.00'), data_pagamento=date(2024, 1, 5),
+            metodo='pix',
+        )
+
+    def exportar(self, *args):
+        saida = StringIO()
+        call_command('exportar_crediario', *args, stdout=saida)
+        return saida.getvalue()
+
+    def test_csv_na_saida_padrao(self):
+        linhas = list(csv.reader(StringIO(self.exportar('notas'))))
+        b, a = self.notas
+        self.assertEqual(linhas, [
+            ['id', 'cliente_id', 'cliente', 'numero_nota', 'data_nota', 'vencimento', 'total', 'total_pago',
+             'saldo_restante', 'status'],
+            [str(a.pk), str(self.cliente.pk), 'Maria, da Silva', 'A', '2024-01-01', '', '25.00', '25.00', '0.00', 'paga'],
+            [str(b.pk), str(self.cliente.pk), 'Maria, da Silva', 'B', '2024-02-01', '', '25.00', '0.00', '25.00', 'aberta'],
+        ])
+
+        linhas = list(csv.reader(StringIO(self.exportar('pagamentos', '--de', '2024-01-01', '--ate', '2024-01-31'))))
+        self.assertEqual([l[4:] for l in linhas], [['data_pagamento', 'valor_pagamento', 'metodo'], ['2024-01-05', '25.00', 'pix']])
+        self.assertEqual(len(list(csv.reader(StringIO(self.exportar('itens', '--status', 'aberta'))))), 2)
+
+    def test_arquivo_de_saida(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, 'itens.csv')
+            self.assertIn(f'2 linhas exportadas em {caminho}', self.exportar('itens', '--saida', caminho))
+            with open(caminho, newline='', encoding='utf-8') as f:
+                self.assertEqual([l[1] for l in csv.reader(f)][1:], [str(self.notas[1].pk), str(self.notas[0].pk)])
+
+        with self.assertRaisesMessage(CommandError, 'Data inválida'):
+            self.exportar('notas', '--de', '01/02/2024')
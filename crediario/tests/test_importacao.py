@@ -0,0 +1,116 @@
+import os
+import tempfile
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from crediario.conversao import LinhaInvalida, ler_decimal
+from crediario.importacao import Estado, EstadoIncompativel
+from crediario.models import Cliente, ImportacaoEstado, ItemNota, Nota, Pagamento
+
+ARQUIVOS = {
+    'clientes': 'nome,telefone,endereco,limite_crediario\n'
+                'Ana,111,,"1.234,56"\n'
+                'Bia,222,,1500\n',
+    'notas': 'telefone,numero_nota,data_nota,vencimento\n'
+             '111,N1,2024-01-10,10/02/2024\n'
+             '222,N1,2024-01-11,\n',
+    'itens': 'telefone,numero_nota,descricao,quantidade,preco_unitario\n'
+             '111,N1,Fogão,1,"1.200,00"\n'
+             '111,N1,Panela,0.500,102.00\n'
+             '222,N1,Mesa,1,300\n'
+             '222,N9,Cadeira,1,10\n',
+    'pagamentos': 'telefone,numero_nota,valor_pagamento,data_pagamento,metodo\n'
+                  '111,N1,251,2024-02-01,pix\n'
+                  '222,,100.00,2024-02-02,dinheiro\n',
+}
+
+
+class ImportacaoTest(TestCase):
+
+    def setUp(self):
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        self.arquivos = []
+        for tipo, conteudo in ARQUIVOS.items():
+            caminho = os.path.join(pasta.name, f'{tipo}.csv')
+            with open(caminho, 'w', encoding='utf-8') as f:
+                f.write(conteudo)
+            self.arquivos.append((tipo, caminho))
+
+    def importar(self, *extras):
+        saida = StringIO()
+        opcoes = [f'--{tipo}={caminho}' for tipo, caminho in self.arquivos]
+        call_command('importar_crediario', *opcoes, '--lote=1', *extras, stdout=saida)
+        return saida.getvalue()
+
+    def conferir(self):
+        ana, bia = Cliente.objects.get(telefone='111'), Cliente.objects.get(telefone='222')
+        self.assertEqual((ana.limite_crediario, bia.limite_crediario), (Decimal('1234.56'), Decimal('1500.00')))
+        nota = Nota.objects.get(cliente=ana)
+        self.assertEqual(
+            (nota.total, nota.total_pago, nota.status, nota.vencimento),
+            (Decimal('1251.00'), Decimal('251.00'), Nota.STATUS_PARCIAL, date(2024, 2, 10)),
+        )
+        nota = Nota.objects.get(cliente=bia)
+        self.assertEqual((nota.total, nota.total_pago, nota.status), (Decimal('300.00'), Decimal('100.00'), Nota.STATUS_PARCIAL))
+        self.assertEqual((ana.saldo_atual(), bia.saldo_atual()), (Decimal('1000.00'), Decimal('200.00')))
+        self.assertEqual((ItemNota.objects.count(), Pagamento.objects.count()), (3, 2))
+
+        for comando in ('check_total_pago', 'reconciliar_saldos'):
+            saida = StringIO()
+            call_command(comando, *(['--dry-run'] if comando == 'reconciliar_saldos' else []), stdout=saida)
+            self.assertIn('divergentes: 0', saida.getvalue())
+
+    def test_importa_recalcula_e_apaga_o_progresso(self):
+        saida = self.importar()
+        self.assertIn('itens: linha 5 ignorada', saida)
+        self.assertIn('linhas rejeitadas: 1', saida)
+        self.conferir()
+        self.assertFalse(ImportacaoEstado.objects.exists())
+
+    def test_retoma_lote_interrompido_sem_repetir_linhas(self):
+        criar = ItemNota.objects.bulk_create
+        chamadas = []
+
+        def falhar_no_segundo_lote(objs, *args, **kwargs):
+            chamadas.append(objs)
+            if len(chamadas) == 2:
+                raise RuntimeError('conexão perdida')
+            return criar(objs, *args, **kwargs)
+
+        with mock.patch.object(ItemNota.objects, 'bulk_create', side_effect=falhar_no_segundo_lote):
+            with self.assertRaisesMessage(RuntimeError, 'conexão perdida'):
+                self.importar()
+        # o progresso voltou junto com o lote que falhou
+        self.assertEqual(ItemNota.objects.count(), 1)
+        self.assertEqual(
+            ImportacaoEstado.objects.get(chave='importacao').dados['linhas'],
+            {'clientes': 2, 'notas': 2, 'itens': 1},
+        )
+
+        self.importar()
+        self.conferir()
+        self.assertFalse(ImportacaoEstado.objects.exists())
+
+    def test_recusa_retomar_com_outros_arquivos(self):
+        Estado('importacao', self.arquivos).salvar()
+        with open(self.arquivos[0][1], 'a', encoding='utf-8') as f:
+            f.write('Caio,333,,0\n')
+        with self.assertRaises(EstadoIncompativel):
+            Estado('importacao', self.arquivos)
+        with self.assertRaisesMessage(CommandError, '--recomecar'):
+            self.importar()
+        self.importar('--recomecar')
+        self.assertEqual(Cliente.objects.count(), 3)
+
+    def test_decimal(self):
+        for texto, valor in (
+            ('0.250', '0.25'), ('-0.125', '-0.125'), ('1.500', '1.5'), ('1.234', '1.234'), ('1.234,5', '1234.5'),
+            ('1.234.567,00', '1234567'), ('12,50', '12.50'), ('12.50', '12.50'), ('10', '10'),
+        ):
+            self.assertEqual(ler_decimal({'v': texto}, 'v'), Decimal(valor), texto)
+        with self.assertRaises(LinhaInvalida):
+            ler_decimal({'v': '1.2.3'}, 'v')
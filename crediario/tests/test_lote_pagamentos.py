@@ -0,0 +1,110 @@
+import json
+import os
+import tempfile
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from crediario.conversao import LinhaInvalida
+from crediario.lote_pagamentos import ACEITO, RECUSADO, ler_pagamento, registrar_lote
+from crediario.models import Cliente, Nota, Pagamento
+from crediario.services import criar_nota_com_itens
+from .benchmark import TesteComOrcamento
+
+
+class LotePagamentosTest(TesteComOrcamento):
+
+    def setUp(self):
+        self.ana = Cliente.objects.create(nome='Ana', limite_crediario=Decimal('10000.00'))
+        self.bia = Cliente.objects.create(nome='Bia', limite_crediario=Decimal('10000.00'))
+        self.nota_ana = self.nota(self.ana, Decimal('50.00'), date(2024, 1, 10))
+        self.nota_bia_1 = self.nota(self.bia, Decimal('30.00'), date(2024, 1, 10))
+        self.nota_bia_2 = self.nota(self.bia, Decimal('30.00'), date(2024, 2, 10))
+
+    def nota(self, cliente, total, vencimento):
+        return criar_nota_com_itens(
+            Nota(cliente=cliente, vencimento=vencimento),
+            [{'descricao': 'Item', 'quantidade': Decimal('1'), 'preco_unitario': total}],
+        )
+
+    def postar(self, corpo):
+        return self.client.post(reverse('crediario:pagamentos_lote'), json.dumps(corpo), content_type='application/json')
+
+    def test_resultado_por_pagamento(self):
+        resultados = registrar_lote([
+            {'ref': 'a', 'cliente_id': self.ana.pk, 'nota_id': self.nota_ana.pk, 'valor_pagamento': '30.00'},
+            # o primeiro pagamento do lote já conta no que falta
+            {'ref': 'b', 'cliente_id': self.ana.pk, 'nota_id': self.nota_ana.pk, 'valor_pagamento': '30.00'},
+            {'ref': 'c', 'cliente_id': self.bia.pk, 'valor_pagamento': 45, 'metodo': 'cartao'},
+            {'ref': 'd', 'cliente_id': self.bia.pk, 'nota_id': self.nota_ana.pk, 'valor_pagamento': '1.00'},
+            {'ref': 'e', 'cliente_id': 999999, 'valor_pagamento': '1.00'},
+            {'ref': 'f', 'cliente_id': self.ana.pk, 'valor_pagamento': '-1'},
+            'x',
+        ])
+        self.assertEqual(
+            [(r.ref, r.status) for r in resultados],
+            [('a', ACEITO), ('b', RECUSADO), ('c', ACEITO), ('d', RECUSADO), ('e', RECUSADO), ('f', RECUSADO),
+             (None, RECUSADO)],
+        )
+        self.assertEqual(resultados[1].erro, 'Pagamento excede o valor devido. Falta pagar apenas R$ 20,00.')
+        self.assertEqual(resultados[3].erro, 'nota inexistente para este cliente')
+
+        self.nota_ana.refresh_from_db()
+        self.assertEqual((self.nota_ana.status, self.nota_ana.total_pago), (Nota.STATUS_PARCIAL, Decimal('30.00')))
+        self.assertEqual(
+            list(Nota.objects.filter(cliente=self.bia).order_by('vencimento').values_list('status', 'total_pago')),
+            [(Nota.STATUS_PAGA, Decimal('30.00')), (Nota.STATUS_PARCIAL, Decimal('15.00'))],
+        )
+        self.assertEqual(Pagamento.objects.get(pk=resultados[2].pagamento_id).alocacoes.count(), 2)
+        self.assertEqual(self.bia.saldo_atual(), Decimal('15.00'))
+
+        saida = StringIO()
+        call_command('check_total_pago', stdout=saida)
+        self.assertIn('divergentes: 0', saida.getvalue())
+        saida = StringIO()
+        call_command('reconciliar_saldos', '--dry-run', stdout=saida)
+        self.assertIn('divergentes: 0', saida.getvalue())
+
+    def test_valores(self):
+        for valor, esperado in ((12.5, '12.50'), (1234, '1234'), ('1.500', '1.50'), ('1.234,50', '1234.50')):
+            pagamento = ler_pagamento({'cliente_id': self.ana.pk, 'valor_pagamento': valor})
+            self.assertEqual(pagamento.valor_pagamento, Decimal(esperado), valor)
+        # ponto sem vírgula é decimal: três casas não é valor em reais
+        with self.assertRaisesMessage(LinhaInvalida, 'até 2 casas decimais'):
+            ler_pagamento({'cliente_id': self.ana.pk, 'valor_pagamento': '1.234'})
+
+    def test_consultas_nao_crescem_com_o_lote(self):
+        consultas = []
+        for n in (2, 40):
+            pagamentos = [
+                {'cliente_id': cliente.pk, 'nota_id': nota.pk, 'valor_pagamento': '0.01'}
+                for cliente, nota in ((self.ana, self.nota_ana), (self.bia, self.nota_bia_1))
+                for _ in range(n // 2)
+            ] + [{'cliente_id': self.bia.pk, 'valor_pagamento': '0.01'}]
+            with self.medir(f'escrita.pagamentos_lote.{n}', 10) as ctx:
+                resposta = self.postar({'pagamentos': pagamentos})
+            self.assertEqual(resposta.json()['aceitos'], n + 1)
+            consultas.append(len(ctx))
+        self.assertEqual(len(set(consultas)), 1, consultas)
+
+    @override_settings(CREDIARIO_LOTE_PAGAMENTOS_MAX=2)
+    def test_requisicoes_invalidas(self):
+        url = reverse('crediario:pagamentos_lote')
+        self.assertEqual(self.client.get(url).status_code, 405)
+        self.assertEqual(self.client.post(url, 'x', content_type='application/json').status_code, 400)
+        self.assertEqual(self.postar([]).status_code, 400)
+        self.assertEqual(self.postar({'pagamentos': [{}, {}, {}]}).status_code, 413)
+
+    def test_comando_csv(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8') as f:
+            f.write('ref,cliente_id,nota_id,valor_pagamento,data_pagamento,metodo\n')
+            f.write(f'1,{self.ana.pk},{self.nota_ana.pk},"50,00",10/03/2024,pix\n')
+            f.write(f'2,{self.ana.pk},{self.nota_ana.pk},1.00,2024-03-10,pix\n')
+        self.addCleanup(os.remove, f.name)
+        saida = StringIO()
+        call_command('lancar_pagamentos', f.name, stdout=saida)
+        self.assertIn('Linha 2 (2): Pagamento excede o valor devido', saida.getvalue())
+        self.assertIn('aceitos: 1 — recusados: 1', saida.getvalue())
+        self.assertEqual(Pagamento.objects.get(nota=self.nota_ana).data_pagamento, date(2024, 3, 10))
@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from crediario.metricas import registro
+from .dados import semear
+
+MIDDLEWARE = ['crediario.metricas.MetricasMiddleware'] + [
+    m for m in settings.MIDDLEWARE if m != 'crediario.metricas.MetricasMiddleware'
+]
+
+
+@override_settings(MIDDLEWARE=MIDDLEWARE, CREDIARIO_METRICAS_TOKEN='')
+class MetricasTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        semear(clientes=3, notas_por_cliente=3)
+
+    def setUp(self):
+        registro.limpar()
+
+    def test_conta_consultas_e_expoe_prometheus(self):
+        self.client.get(reverse('crediario:nota_list'))
+        self.client.get(reverse('crediario:nota_list'))
+        self.client.force_login(get_user_model().objects.create_user('equipe', is_staff=True))
+        texto = self.client.get(reverse('crediario:metricas')).content.decode()
+        self.assertIn('crediario_requisicoes_total{view="crediario:nota_list",metodo="GET",status="200"} 2', texto)
+        self.assertIn('crediario_sql_consultas_total{view="crediario:nota_list"} 2', texto)
+        self.assertIn('crediario_requisicao_segundos_bucket{view="crediario:nota_list",le="+Inf"} 2', texto)
+
+    @override_settings(CREDIARIO_METRICAS_LIMITE_MS=0)
+    def test_log_de_lentas(self):
+        with self.assertLogs('crediario.lentas', 'WARNING') as logs:
+            self.client.get(reverse('crediario:clientes_list'))
+        self.assertIn('"view": "crediario:clientes_list"', logs.output[0])
+        self.assertIn('"mais_lentas": [{"sql": "SELECT', logs.output[0])
+
+    @override_settings(CREDIARIO_METRICAS_TOKEN='segredo')
+    def test_token(self):
+        self.assertEqual(self.client.get(reverse('crediario:metricas')).status_code, 403)
+        resposta = self.client.get(reverse('crediario:metricas'), headers={'Authorization': 'Bearer segredo'})
+        self.assertEqual(resposta.status_code, 200)
+
+    def test_sem_token_so_para_staff(self):
+        self.assertEqual(self.client.get(reverse('crediario:metricas')).status_code, 404)
+        self.client.force_login(get_user_model().objects.create_user('caixa'))
+        self.assertEqual(self.client.get(reverse('crediario:metricas')).status_code, 404)
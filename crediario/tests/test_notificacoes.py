@@ -0,0 +1,99 @@
+from datetime import timedelta
+from django.test import TestCase
+from django.utils import timezone
+from crediario.models import Notificacao
+from crediario.notificacoes import (
+    CanalStub, despachar, duracao_da_reserva, enviar_lote, registrar_resultados, reservar_lote,
+)
+import asyncio
+
+
+class EnviarNotificacoesTest(TestCase):
+
+    def setUp(self):
+        self.canal = CanalStub()
+
+    def notificacao(self, destinatario, canal='stub'):
+        return Notificacao.objects.create(
+            tipo=Notificacao.TIPO_VENCIMENTO, canal=canal, destinatario=destinatario,
+            conteudo=f'Olá {destinatario}', data_agendada=timezone.now() - timedelta(minutes=1),
+        )
+
+    def despachar(self, **opcoes):
+        return despachar(canais={'stub': self.canal}, **opcoes)
+
+    def test_envia_e_reagenda_falhas_com_backoff(self):
+        ok = self.notificacao('ana')
+        falha = self.notificacao('bia')
+        desconhecido = self.notificacao('caio', canal='pombo')
+        self.canal.falhar.add('bia')
+
+        antes = timezone.now()
+        self.assertEqual(self.despachar(backoff=timedelta(minutes=1)), (1, 2))
+        self.assertEqual(self.canal.enviados, [('ana', 'Olá ana')])
+
+        ok.refresh_from_db()
+        falha.refresh_from_db()
+        desconhecido.refresh_from_db()
+        self.assertEqual((ok.status, ok.tentativa), (Notificacao.STATUS_ENVIADA, 0))
+        self.assertIsNotNone(ok.enviado_em)
+        self.assertEqual((falha.status, falha.tentativa), (Notificacao.STATUS_PENDENTE, 1))
+        self.assertGreaterEqual(falha.data_agendada, antes + timedelta(minutes=1))
+        self.assertEqual(desconhecido.status, Notificacao.STATUS_PENDENTE)
+
+        # a segunda falha espera o dobro
+        Notificacao.objects.filter(pk=falha.pk).update(data_agendada=timezone.now())
+        antes = timezone.now()
+        self.despachar(backoff=timedelta(minutes=1), max_lotes=1)
+        falha.refresh_from_db()
+        self.assertEqual(falha.tentativa, 2)
+        self.assertGreaterEqual(falha.data_agendada, antes + timedelta(minutes=2))
+
+    def test_desiste_depois_de_max_tentativas(self):
+        notificacao = self.notificacao('bia')
+        self.canal.falhar.add('bia')
+        # sem backoff a notificação volta logo para a fila, até esgotar as tentativas
+        self.assertEqual(self.despachar(backoff=timedelta(0), max_tentativas=3), (0, 3))
+        notificacao.refresh_from_db()
+        self.assertEqual((notificacao.status, notificacao.tentativa), (Notificacao.STATUS_FALHOU, 3))
+
+    def test_timeout_conta_como_falha(self):
+        lenta = self.notificacao('lenta')
+        self.notificacao('rapida')
+        self.canal.lentos.add('lenta')
+        self.assertEqual(self.despachar(timeout=0.05), (1, 1))
+        lenta.refresh_from_db()
+        self.assertEqual((lenta.status, lenta.tentativa), (Notificacao.STATUS_PENDENTE, 1))
+
+    def test_reserva_expirada_nao_grava_resultado_duplicado(self):
+        notificacao = self.notificacao('ana')
+        linhas, reserva_1 = reservar_lote(10, timedelta(minutes=5))
+        self.assertEqual([l['pk'] for l in linhas], [notificacao.pk])
+        # reservada: outro worker não pega
+        self.assertEqual(reservar_lote(10, timedelta(minutes=5))[0], [])
+
+        # a reserva expira e outro worker pega de novo
+        Notificacao.objects.filter(pk=notificacao.pk).update(data_agendada=timezone.now() - timedelta(seconds=1))
+        linhas_2, reserva_2 = reservar_lote(10, timedelta(minutes=5))
+        self.assertEqual(len(linhas_2), 1)
+
+        canais = {'stub': self.canal}
+        atrasado = asyncio.run(enviar_lote(linhas, canais, 10, 1))
+        self.assertEqual(registrar_resultados(atrasado, 5, timedelta(minutes=1), reserva_1), (0, 0))
+        notificacao.refresh_from_db()
+        self.assertEqual(notificacao.status, Notificacao.STATUS_PROCESSANDO)
+
+        atual = asyncio.run(enviar_lote(linhas_2, canais, 10, 1))
+        self.assertEqual(registrar_resultados(atual, 5, timedelta(minutes=1), reserva_2), (1, 0))
+        notificacao.refresh_from_db()
+        self.assertEqual(notificacao.status, Notificacao.STATUS_ENVIADA)
+
+    def test_reserva_cobre_o_pior_caso_do_lote(self):
+        # 100 envios, 10 por vez, todos estourando 30s: 300s
+        self.assertGreater(duracao_da_reserva(100, 10, 30), timedelta(seconds=300))
+        self.assertEqual(duracao_da_reserva(10, 10, 1), timedelta(minutes=5))
+
+    def test_canal_stub_sem_estado_compartilhado(self):
+        CanalStub(falhar=['x']).enviados.append(('x', ''))
+        outro = CanalStub()
+        self.assertEqual((outro.enviados, outro.falhar), ([], set()))
@@ -0,0 +1,57 @@
+from datetime import date
+from decimal import Decimal
+from django.urls import reverse
+from crediario.models import Cliente, Nota
+from crediario.paginacao import codificar_cursor, filtro_apos, paginar
+from .benchmark import TesteComOrcamento
+
+
+class PaginacaoTest(TesteComOrcamento):
+
+    @classmethod
+    def setUpTestData(cls):
+        cliente = Cliente.objects.create(nome='Ana', limite_crediario=Decimal('10000.00'))
+        for nome in ('Bia', 'Bia', 'Caio', 'Duda'):
+            Cliente.objects.create(nome=nome, limite_crediario=Decimal('10000.00'))
+        # datas repetidas: o id desempata
+        for dia in (1, 1, 1, 2, 2, 3, 4, 4):
+            Nota.objects.create(cliente=cliente, data_nota=date(2024, 1, dia))
+
+    def percorrer(self, queryset, ordem, limite):
+        vistos, cursor = [], None
+        while True:
+            pagina = paginar(queryset, ordem, cursor, limite)
+            vistos += [obj.pk for obj in pagina.itens]
+            if not pagina.tem_proxima:
+                return vistos
+            cursor = pagina.proximo_cursor
+
+    def test_paginas_cobrem_tudo_na_ordem(self):
+        for queryset, ordem in (
+            (Nota.objects.all(), ['-data_nota', '-id']),
+            (Cliente.objects.all(), ['nome', 'id']),
+        ):
+            for limite in (1, 2, 3):
+                self.assertEqual(
+                    self.percorrer(queryset, ordem, limite),
+                    list(queryset.order_by(*ordem).values_list('pk', flat=True)),
+                )
+
+    def test_cursor_limita_a_primeira_coluna(self):
+        # sem o limite simples na coluna da frente o índice não serve de ponto de partida
+        url = reverse('crediario:nota_list')
+        proximo = self.client.get(url, {'format': 'json', 'limite': 2}).json()['proximo']
+        with self.medir('view.nota_list.cursor', 1) as ctx:
+            self.client.get(url, {'format': 'json', 'limite': 2, 'cursor': proximo})
+        self.assertIn('"notas"."data_nota" <= ', ctx.captured_queries[0]['sql'])
+
+        sql = str(Cliente.objects.filter(filtro_apos(['nome', 'id'], ['Bia', 2])).query)
+        self.assertIn('"clientes"."nome" >= Bia', sql)
+
+    def test_cursor_adulterado_volta_ao_inicio(self):
+        url = reverse('crediario:nota_list')
+        primeira = self.client.get(url, {'format': 'json', 'limite': 2}).json()
+        for valores in (['abc', 1], {'data_nota': '2024-01-01'}, ['2024-01-01', 'x'], ['2024-01-01'], [None, 1]):
+            resposta = self.client.get(url, {'format': 'json', 'limite': 2, 'cursor': codificar_cursor(valores)})
+            self.assertEqual(resposta.status_code, 200, valores)
+            self.assertEqual(resposta.json(), primeira, valores)
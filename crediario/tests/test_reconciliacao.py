@@ -0,0 +1,66 @@
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from crediario.models import Cliente, Lancamento, Nota, Pagamento
+from crediario.reconciliacao import corrigir, verificar_faixa
+from crediario.services import criar_nota_com_itens
+from .benchmark import TesteComOrcamento
+
+
+class ReconciliacaoTest(TesteComOrcamento):
+
+    def setUp(self):
+        self.clientes = []
+        for nome in ('Ana', 'Bia', 'Caio'):
+            cliente = Cliente.objects.create(nome=nome, limite_crediario=Decimal('10000.00'))
+            nota = criar_nota_com_itens(
+                Nota(cliente=cliente, vencimento=date(2024, 1, 10)),
+                [{'descricao': 'Item', 'quantidade': Decimal('1'), 'preco_unitario': Decimal('50.00')}],
+            )
+            Pagamento.objects.create(
+                cliente=cliente, nota=nota, valor_pagamento=Decimal('20.00'), data_pagamento=date(2024, 1, 5),
+            )
+            self.clientes.append(cliente)
+
+    def desviar(self, cliente, valor):
+        Lancamento.objects.create(cliente=cliente, tipo=Lancamento.TIPO_AJUSTE, valor=Decimal(valor))
+
+    def reconciliar(self, *opcoes):
+        saida = StringIO()
+        call_command('reconciliar_saldos', *opcoes, stdout=saida)
+        return saida.getvalue()
+
+    def test_corrige_com_lancamento_de_ajuste(self):
+        ana, bia, caio = self.clientes
+        self.desviar(ana, '5.00')
+        self.desviar(caio, '-1.50')
+
+        saida = self.reconciliar()
+        self.assertIn(f'Cliente {ana.pk}: saldo=35.00 esperado=30.00', saida)
+        self.assertIn('divergentes: 2 — corrigidos: 2', saida)
+        self.assertEqual(
+            list(Lancamento.objects.filter(tipo=Lancamento.TIPO_AJUSTE).order_by('pk').values_list('cliente', 'valor')),
+            [(ana.pk, Decimal('5.00')), (caio.pk, Decimal('-1.50')), (ana.pk, Decimal('-5.00')), (caio.pk, Decimal('1.50'))],
+        )
+        self.assertEqual([c.saldo_atual() for c in self.clientes], [Decimal('30.00')] * 3)
+        self.assertIn('divergentes: 0', self.reconciliar('--dry-run'))
+
+    def test_reconfere_so_os_clientes_informados(self):
+        ana, bia, caio = self.clientes
+        self.desviar(ana, '5.00')
+        self.desviar(bia, '7.00')
+        _, divergencias = verificar_faixa(ana.pk, caio.pk + 1)
+        # Ana foi corrigida por outro processo depois da leitura
+        self.desviar(ana, '-5.00')
+
+        with self.medir('escrita.reconciliacao.corrigir', 5) as ctx:
+            self.assertEqual(corrigir(divergencias), 1)
+        self.assertEqual(Lancamento.objects.filter(tipo=Lancamento.TIPO_AJUSTE).latest('pk').valor, Decimal('-7.00'))
+        self.assertEqual([c.saldo_atual() for c in self.clientes], [Decimal('30.00')] * 3)
+
+        # saldo atual e esperado na mesma consulta, só dos clientes informados
+        [reconferencia] = [q['sql'] for q in ctx.captured_queries if 'saldo_corrente' in q['sql']]
+        for tabela in ('notas', 'notas_arquivo', 'pagamentos', 'pagamentos_arquivo', 'lancamentos'):
+            self.assertIn(f'FROM "{tabela}"', reconferencia)
+        self.assertRegex(reconferencia, r'"clientes"."id" IN \(')
@@ -0,0 +1,69 @@
+import asyncio
+from django.db import router, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TransactionTestCase, override_settings
+from crediario.models import Nota
+from crediario.replicas import COOKIE, ReplicaMiddleware, somente_leitura
+
+
+@somente_leitura()
+def view_leitura(request):
+    return HttpResponse(Nota.objects.all().db)
+
+
+@somente_leitura()
+def view_que_escreve(request):
+    router.db_for_write(Nota)
+    return HttpResponse(Nota.objects.all().db)
+
+
+@somente_leitura()
+async def view_async(request):
+    return HttpResponse(Nota.objects.all().db)
+
+
+# as réplicas só são nomeadas: o router decide sem abrir conexão com elas
+@override_settings(
+    DATABASE_ROUTERS=['crediario.replicas.RoteadorReplicas'],
+    CREDIARIO_REPLICAS=['replica_1'],
+)
+class RoteadorReplicasTest(TransactionTestCase):
+
+    def setUp(self):
+        self.fabrica = RequestFactory()
+
+    def chamar(self, view, **cookies):
+        request = self.fabrica.get('/')
+        request.COOKIES.update(cookies)
+        return ReplicaMiddleware(view)(request)
+
+    def test_so_leitura_marcada_vai_para_a_replica(self):
+        self.assertEqual(Nota.objects.all().db, 'default')
+        with somente_leitura():
+            self.assertEqual(Nota.objects.all().db, 'replica_1')
+        self.assertEqual(Nota.objects.all().db, 'default')
+
+    def test_transacao_fica_no_primario(self):
+        with somente_leitura(), transaction.atomic():
+            self.assertEqual(Nota.objects.all().db, 'default')
+
+    def test_depois_de_escrever_fica_no_primario(self):
+        resposta = self.chamar(view_leitura)
+        self.assertEqual(resposta.content, b'replica_1')
+        self.assertNotIn(COOKIE, resposta.cookies)
+
+        resposta = self.chamar(view_que_escreve)
+        self.assertEqual(resposta.content, b'default')
+        self.assertEqual(resposta.cookies[COOKIE]['max-age'], 5)
+
+        # a próxima requisição de quem escreveu (ex.: GET depois do redirect)
+        self.assertEqual(self.chamar(view_leitura, **{COOKIE: '1'}).content, b'default')
+
+    def test_view_async(self):
+        middleware = ReplicaMiddleware(view_async)
+        resposta = asyncio.run(middleware(self.fabrica.get('/')))
+        self.assertEqual(resposta.content, b'replica_1')
+
+    @override_settings(CREDIARIO_REPLICAS=[])
+    def test_sem_replicas(self):
+        self.assertEqual(self.chamar(view_leitura).content, b'default')
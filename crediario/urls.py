@@ -1,14 +1,30 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 app_name = 'crediario'
 
 urlpatterns = [
     path('clientes/', views.clientes_list, name='clientes_list'),
     path('clientes/<int:pk>/', views.cliente_detail, name='cliente_detail'),
+    path('clientes/<int:pk>/extrato/', views.cliente_extrato, name='cliente_extrato'),
+    path('clientes/buscar/', views.cliente_buscar, name='cliente_buscar'),
     path('notas/', views.nota_list, name='nota_list'),
     path('notas/<int:pk>/', views.nota_detail, name='nota_detail'),
     path('notas/novo/', views.nota_create, name='nota_create'),
+    path('notas/<int:pk>/falta/', views.nota_falta, name='nota_falta'),
+    path('notas/buscar/', views.nota_buscar, name='nota_buscar'),
+    path('notas/<int:pk>/anexos/', views.anexo_upload, name='anexo_upload'),
+    path('anexos/<int:pk>/', views.anexo_arquivo, name='anexo_arquivo'),
+    path('anexos/<int:pk>/miniatura/', views.anexo_miniatura, name='anexo_miniatura'),
 
     path('pagamentos/novo/', views.pagamento_create, name='pagamento_create'),
+    path('pagamentos/lote/', views.pagamentos_lote, name='pagamentos_lote'),
+
+    path('exportar/<str:tipo>.csv', views.exportar, name='exportar'),
+
+    path('metricas/', views.metricas, name='metricas'),
+
+    # API JSON somente leitura, assíncrona (ver api.py)
+    path('api/<str:recurso>/', api.listar, name='api_listar'),
+    path('api/<str:recurso>/<int:pk>/', api.detalhe, name='api_detalhe'),
 ]
\ No newline at end of file
@@ -1,78 +1,346 @@
+import json
 from decimal import Decimal
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_date
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from django.views.decorators.http import require_POST, require_safe
 from django.urls import reverse
 from django.db import transaction
 from django.contrib import messages
-from .models import Cliente, Nota, ItemNota, Pagamento, Anexo
+from django.core.exceptions import ValidationError
+from django.db.models import Max, OuterRef, Q, Subquery
+from . import cache as cache_paginas
+from .models import Cliente, Nota, ItemNota, Pagamento, Anexo, Lancamento, AnexoArquivado, NotaArquivada
 from .forms import ClienteForm, NotaForm, ItemFormSet, PagamentoForm
+from .anexos import AnexoUploadHandler, caminho_da_miniatura, resposta_de_arquivo
+from .extrato import extrato_do_cliente
+from .lote_pagamentos import ACEITO, registrar_lote
+from .metricas import registro as registro_metricas
+from .exportacao import TIPOS as TIPOS_EXPORTACAO, linhas_csv
+from .paginacao import paginar, limite_da_requisicao
+from .replicas import somente_leitura
+from .services import criar_nota_com_itens, itens_do_formset
+
+def _data_do_get(request, nome):
+    """Data (AAAA-MM-DD) vinda da querystring; None se ausente ou inválida."""
+    try:
+        return parse_date(request.GET.get(nome) or '')
+    except ValueError:
+        return None
 
 # --- Clientes ---
+@somente_leitura()
 def clientes_list(request):
-    clientes = Cliente.objects.all().order_by('nome')
-    return render(request, 'crediario/clientes_list.html', {'clientes': clientes})
+    clientes = Cliente.objects.com_saldo_atual()
+    q = request.GET.get('q', '').strip()
+    if q:
+        clientes = clientes.filter(nome__istartswith=q)
+    if request.GET.get('devedores'):
+        clientes = clientes.filter(saldo_corrente__gt=0)
 
-def cliente_detail(request, pk):
-    cliente = get_object_or_404(Cliente, pk=pk)
+    if request.GET.get('format') == 'json':
+        clientes = clientes.values('id', 'nome', 'telefone', 'limite_crediario', 'saldo_corrente')
+    pagina = paginar(clientes, ['nome', 'id'], request.GET.get('cursor'), limite_da_requisicao(request))
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse({'results': pagina.itens, 'proximo': pagina.proximo_cursor})
+    return render(request, 'crediario/clientes_list.html', {'clientes': pagina.itens, 'pagina': pagina})
+
+def _versao_cliente(pk):
+    """
+    (nome, versão) do cliente numa consulta só: muda quando o cliente, o livro
+    de lançamentos (saldo) ou qualquer nota dele (status) muda.
+    """
+    ultimo_lancamento = Lancamento.objects.filter(cliente=OuterRef('pk')).order_by('-id').values('id')[:1]
+    notas_em = (
+        Nota.objects.filter(cliente=OuterRef('pk')).order_by().values('cliente')
+        .annotate(m=Max('atualizado_em')).values('m')
+    )
+    linha = (
+        Cliente.objects.filter(pk=pk)
+        .annotate(ultimo_lancamento=Subquery(ultimo_lancamento), notas_em=Subquery(notas_em))
+        .values_list('nome', 'atualizado_em', 'ultimo_lancamento', 'notas_em')
+        .first()
+    )
+    if linha is None:
+        raise Http404('Cliente inexistente')
+    nome, *versao = linha
+    return nome, '|'.join(str(v) for v in versao)
+
+def _render_cliente_detail(pk):
+    cliente = get_object_or_404(Cliente.objects.com_saldo_atual(), pk=pk)
     notas = cliente.notas.order_by('-data_nota')[:20]
-    return render(request, 'crediario/cliente_detail.html', {'cliente': cliente, 'notas': notas})
+    return render_to_string('crediario/_cliente_detail_conteudo.html', {'cliente': cliente, 'notas': notas})
+
+@require_safe
+@somente_leitura()
+def cliente_detail(request, pk):
+    nome, versao = _versao_cliente(pk)
+    conteudo = cache_paginas.obter(cache_paginas.CLIENTE, pk, versao, lambda: _render_cliente_detail(pk))
+    return render(request, 'crediario/cliente_detail.html', {'pk': pk, 'nome': nome, 'conteudo': conteudo})
+
+@require_safe
+@somente_leitura()
+def cliente_extrato(request, pk):
+    """
+    Notas e pagamentos do cliente em ordem cronológica, com saldo acumulado.
+    ?arquivo=1 inclui as notas arquivadas.
+    """
+    cliente = get_object_or_404(Cliente.objects.com_saldo_atual(), pk=pk)
+    arquivo = request.GET.get('arquivo') == '1'
+    pagina = extrato_do_cliente(cliente.pk, request.GET.get('cursor'), limite_da_requisicao(request), arquivo)
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'saldo_anterior': pagina.saldo_anterior,
+            'results': [
+                {k: v for k, v in m.items() if k != 'ordem'} for m in pagina.itens
+            ],
+            'proximo': pagina.proximo_cursor,
+        })
+    return render(request, 'crediario/cliente_extrato.html', {'cliente': cliente, 'pagina': pagina, 'arquivo': arquivo})
+
+# --- Busca (autocomplete dos formulários) ---
+BUSCA_LIMITE = 20
+
+def _pagina_busca(request):
+    try:
+        return max(int(request.GET.get('pagina', 1)), 1)
+    except ValueError:
+        return 1
+
+def _resposta_busca(linhas, pagina, formatar):
+    # buscamos LIMITE + 1 linhas para saber se há próxima página sem COUNT(*)
+    mais = len(linhas) > BUSCA_LIMITE
+    return JsonResponse({
+        'results': [formatar(l) for l in linhas[:BUSCA_LIMITE]],
+        'pagina': pagina,
+        'mais': mais,
+    })
+
+@require_safe
+@somente_leitura()
+def cliente_buscar(request):
+    """Clientes por prefixo do nome ou do telefone, em páginas de BUSCA_LIMITE."""
+    q = request.GET.get('q', '').strip()
+    pagina = _pagina_busca(request)
+    clientes = Cliente.objects.order_by('nome', 'id')
+    if q[:1].isdigit() or q[:1] in '(+':
+        clientes = clientes.filter(telefone__startswith=q)
+    elif q:
+        clientes = clientes.filter(nome__istartswith=q)
+    inicio = (pagina - 1) * BUSCA_LIMITE
+    linhas = list(clientes.values_list('pk', 'nome', 'telefone')[inicio:inicio + BUSCA_LIMITE + 1])
+    return _resposta_busca(linhas, pagina, lambda l: {
+        'id': l[0],
+        'text': f'{l[1]} — {l[2]}' if l[2] else l[1],
+    })
+
+@require_safe
+@somente_leitura()
+def nota_buscar(request):
+    """
+    Notas pelo id ou prefixo do numero_nota, opcionalmente de um cliente
+    (?cliente=) e só as em aberto (?abertas=1). Mais recentes primeiro.
+    """
+    q = request.GET.get('q', '').strip()
+    pagina = _pagina_busca(request)
+    notas = Nota.objects.order_by('-id')
+    if q:
+        filtro = Q(numero_nota__startswith=q)
+        if q.isdigit():
+            filtro |= Q(pk=int(q))
+        notas = notas.filter(filtro)
+    cliente_id = request.GET.get('cliente', '')
+    if cliente_id.isdigit():
+        notas = notas.filter(cliente_id=int(cliente_id))
+    if request.GET.get('abertas'):
+        notas = notas.filter(status__in=[Nota.STATUS_ABERTA, Nota.STATUS_PARCIAL])
+    inicio = (pagina - 1) * BUSCA_LIMITE
+    linhas = list(notas.values_list(
+        'pk', 'total', 'cliente_id', 'cliente__nome'
+    )[inicio:inicio + BUSCA_LIMITE + 1])
+    return _resposta_busca(linhas, pagina, lambda l: {
+        'id': l[0],
+        'text': f'Nota {l[0]} — {l[3]} — R$ {l[1]}',
+        'cliente': {'id': l[2], 'text': l[3]},
+    })
 
 # --- Notas (create with items) ---
+@somente_leitura()
 def nota_list(request):
-    notas = Nota.objects.select_related('cliente').order_by('-data_nota')[:100]
-    return render(request, 'crediario/nota_list.html', {'notas': notas})
+    notas = Nota.objects.all()
+    status = request.GET.get('status')
+    if status:
+        notas = notas.filter(status=status)
+    data_de = _data_do_get(request, 'de')
+    if data_de:
+        notas = notas.filter(data_nota__gte=data_de)
+    data_ate = _data_do_get(request, 'ate')
+    if data_ate:
+        notas = notas.filter(data_nota__lte=data_ate)
 
-def nota_detail(request, pk):
-    nota = get_object_or_404(Nota, pk=pk)
-    itens = nota.itens.all()
-    anexos = nota.anexos.all()
-    pagamentos = nota.pagamentos.all()
-    return render(request, 'crediario/nota_detail.html', {
-        'nota': nota, 'itens': itens, 'anexos': anexos, 'pagamentos': pagamentos
+    if request.GET.get('format') == 'json':
+        notas = notas.values(
+            'id', 'cliente_id', 'cliente__nome', 'numero_nota', 'data_nota', 'vencimento',
+            'total', 'total_pago', 'saldo_restante', 'status',
+        )
+    else:
+        notas = notas.select_related('cliente')
+    pagina = paginar(notas, ['-data_nota', '-id'], request.GET.get('cursor'), limite_da_requisicao(request))
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse({'results': pagina.itens, 'proximo': pagina.proximo_cursor})
+    return render(request, 'crediario/nota_list.html', {
+        'notas': pagina.itens, 'pagina': pagina, 'status_choices': Nota.STATUS_CHOICES,
+    })
+
+def _render_nota_detail(pk, modelo=Nota):
+    nota = get_object_or_404(modelo.objects.select_related('cliente'), pk=pk)
+    return render_to_string('crediario/_nota_detail_conteudo.html', {
+        'nota': nota,
+        'arquivada': modelo is NotaArquivada,
+        'itens': nota.itens.all(),
+        'anexos': nota.anexos.all(),
+        'pagamentos': nota.pagamentos.all(),
+        'alocacoes': nota.alocacoes.select_related('pagamento'),
+        # sem multa/juros lançados, nem consulta
+        'encargos': nota.encargos.all() if nota.total_encargos else [],
     })
 
+@require_safe
+@somente_leitura()
+def nota_detail(request, pk):
+    # versão: atualizado_em da nota (muda com pagamentos e total) e do cliente (nome)
+    versao = Nota.objects.filter(pk=pk).values_list('atualizado_em', 'cliente__atualizado_em').first()
+    if versao is None:
+        # nota arquivada (ver arquivo.py): não muda mais, fica fora do cache
+        conteudo = _render_nota_detail(pk, NotaArquivada)
+        return render(request, 'crediario/nota_detail.html', {'pk': pk, 'conteudo': conteudo, 'arquivada': True})
+    conteudo = cache_paginas.obter(
+        cache_paginas.NOTA, pk, '|'.join(str(v) for v in versao), lambda: _render_nota_detail(pk)
+    )
+    return render(request, 'crediario/nota_detail.html', {'pk': pk, 'conteudo': conteudo})
+
+# --- Anexos ---
+@csrf_exempt
+@require_POST
+def anexo_upload(request, pk):
+    """
+    Recebe um ou mais arquivos no campo `arquivo` em streaming (ver
+    anexos.py). O handler tem de ser trocado antes de o corpo ser lido, e o
+    CsrfViewMiddleware lê o corpo; por isso a checagem de CSRF fica em
+    _anexo_upload, depois da troca.
+    """
+    get_object_or_404(Nota.objects.only('id'), pk=pk)
+    request.upload_handlers = [AnexoUploadHandler(request)]
+    response = _anexo_upload(request, pk)
+    if response.status_code == 403:
+        # CSRF recusado depois de o corpo já ter sido gravado: remove o que é só deste upload
+        for recebido in request.FILES.getlist('arquivo'):
+            if not recebido.duplicado and not Anexo.objects.filter(sha256=recebido.sha256).exists():
+                default_storage.delete(recebido.nome)
+    return response
+
+@csrf_protect
+def _anexo_upload(request, pk):
+    erros = request.upload_handlers[0].erros
+    anexos = []
+    for recebido in request.FILES.getlist('arquivo'):
+        anexo, criado = Anexo.objects.get_or_create(
+            nota_id=pk,
+            sha256=recebido.sha256,
+            defaults={'arquivo': recebido.nome, 'mime_type': recebido.mime, 'tamanho_bytes': recebido.tamanho},
+        )
+        anexos.append({
+            'id': anexo.pk,
+            'nome': recebido.nome_original,
+            'sha256': anexo.sha256,
+            'tamanho': anexo.tamanho_bytes,
+            'mime': anexo.mime_type,
+            'novo': criado,
+        })
+
+    if request.GET.get('format') == 'json':
+        status = 400 if erros and not anexos else 200
+        return JsonResponse({'anexos': anexos, 'erros': erros}, status=status)
+    for erro in erros:
+        messages.error(request, erro)
+    if anexos:
+        novos = sum(a['novo'] for a in anexos)
+        messages.success(request, f'{len(anexos)} anexo(s) recebido(s), {len(anexos) - novos} já existia(m).')
+    return redirect('crediario:nota_detail', pk=pk)
+
+def _anexo(pk, *campos):
+    # anexos de notas arquivadas continuam servidos (o arquivo fica no storage)
+    anexo = Anexo.objects.only(*campos).filter(pk=pk).first()
+    return anexo or get_object_or_404(AnexoArquivado.objects.only(*campos), pk=pk)
+
+@require_safe
+@somente_leitura()
+def anexo_arquivo(request, pk):
+    anexo = _anexo(pk, 'arquivo', 'mime_type', 'sha256')
+    return resposta_de_arquivo(
+        request, anexo.arquivo.name, anexo.mime_type or 'application/octet-stream', etag=anexo.sha256
+    )
+
+@require_safe
+@somente_leitura()
+def anexo_miniatura(request, pk):
+    anexo = _anexo(pk, 'sha256', 'miniatura_gerada')
+    if not anexo.miniatura_gerada:
+        raise Http404('Miniatura ainda não gerada')
+    return resposta_de_arquivo(
+        request, caminho_da_miniatura(anexo.sha256), 'image/jpeg', etag=f'{anexo.sha256}-m'
+    )
+
+@require_safe
+def nota_falta(request, pk):
+    """
+    Total, pago e quanto falta de uma nota, em JSON. Uma única consulta pela PK
+    (campos desnormalizados) e ETag/Last-Modified derivados de atualizado_em,
+    para que trocas repetidas de nota no formulário de pagamento virem 304.
+    """
+    try:
+        dados = Nota.objects.values('total', 'total_pago', 'saldo_restante', 'atualizado_em').get(pk=pk)
+    except Nota.DoesNotExist:
+        raise Http404('Nota não encontrada')
+
+    modificado = dados['atualizado_em'].timestamp()
+    etag = quote_etag(f'{pk}-{int(modificado * 1_000_000)}')
+    response = get_conditional_response(request, etag=etag, last_modified=int(modificado))
+    if response is None:
+        response = JsonResponse({
+            'id': pk,
+            'total': f"{dados['total']:.2f}",
+            'pago': f"{dados['total_pago']:.2f}",
+            'falta': f"{dados['saldo_restante']:.2f}",
+        })
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(modificado)
+    # o navegador sempre revalida, mas a revalidação custa só o 304
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
 def nota_create(request):
     if request.method == 'POST':
         form = NotaForm(request.POST)
         formset = ItemFormSet(request.POST)
         if form.is_valid() and formset.is_valid():
-            with transaction.atomic():
-                nota = form.save(commit=False)
-                # Temporarily set total 0; will compute after items saved
-                nota.total = Decimal('0.00')
-                nota.save()
-                total = Decimal('0.00')
-                for item_form in formset:
-                    if not item_form.cleaned_data:
-                        continue
-                    descricao = item_form.cleaned_data.get('descricao')
-                    quantidade = item_form.cleaned_data.get('quantidade') or Decimal('0')
-                    preco = item_form.cleaned_data.get('preco_unitario') or Decimal('0')
-                    if descricao is None:
-                        continue
-                    item = ItemNota(
-                        nota=nota,
-                        descricao=descricao,
-                        quantidade=quantidade,
-                        preco_unitario=preco,
-                        subtotal=(quantidade * preco).quantize(Decimal('0.01'))
-                    )
-                    item.save()
-                    total += item.subtotal
-                # valida limite de crediario do cliente
-                cliente = nota.cliente
-                novo_saldo = (cliente.saldo_devedor or Decimal('0.00')) + total
-                if cliente.limite_crediario is not None and novo_saldo > cliente.limite_crediario:
-                    # rollback atomic
-                    transaction.set_rollback(True)
-                    messages.error(request, f'Limite de crediário excedido: limite {cliente.limite_crediario} / novo saldo {novo_saldo}')
-                else:
-                    # atualiza total da nota e saldo do cliente
-                    nota.total = total
-                    nota.save(update_fields=['total'])
-                    cliente.saldo_devedor = novo_saldo
-                    cliente.save(update_fields=['saldo_devedor'])
-                    messages.success(request, 'Nota criada com sucesso.')
-                    return redirect('crediario:nota_detail', pk=nota.pk)
+            nota = form.save(commit=False)
+            try:
+                criar_nota_com_itens(nota, itens_do_formset(formset))
+            except ValidationError as e:
+                messages.error(request, ' '.join(e.messages))
+            else:
+                messages.success(request, 'Nota criada com sucesso.')
+                return redirect('crediario:nota_detail', pk=nota.pk)
     else:
         form = NotaForm()
         formset = ItemFormSet()
@@ -83,15 +351,86 @@ def pagamento_create(request):
     if request.method == 'POST':
         form = PagamentoForm(request.POST)
         if form.is_valid():
-            with transaction.atomic():
-                pagamento = form.save()   # model.Pagamento.save() faz a atualização do saldo
-                # NÃO atualize o cliente aqui — o model já faz isso.
-                # Também o model chama nota.update_status_after_pagamentos() se a implementação existir.
-                messages.success(request, 'Pagamento registrado.')
+            try:
+                with transaction.atomic():
+                    pagamento = form.save()   # model.Pagamento.save() faz a atualização do saldo
+                    # NÃO atualize o cliente aqui — o model já faz isso.
+                    # Também o model chama nota.update_status_after_pagamentos() se a implementação existir.
+            except ValidationError as e:
+                # ex.: pagamento acima do que falta na nota
+                messages.error(request, ' '.join(e.messages))
+            else:
                 if pagamento.nota:
+                    messages.success(request, 'Pagamento registrado.')
                     return redirect('crediario:nota_detail', pk=pagamento.nota.pk)
                 else:
-                    return redirect('crediario:nota_list')
+                    # sem nota: o model distribuiu o valor entre as notas em aberto
+                    alocadas = pagamento.alocacoes.count()
+                    messages.success(request, f'Pagamento registrado e alocado em {alocadas} nota(s).')
+                    return redirect('crediario:cliente_detail', pk=pagamento.cliente_id)
     else:
         form = PagamentoForm()
-    return render(request, 'crediario/pagamento_form.html', {'form': form})
\ No newline at end of file
+    return render(request, 'crediario/pagamento_form.html', {'form': form})
+
+@require_POST
+def pagamentos_lote(request):
+    """
+    Recebe {"pagamentos": [...]} em JSON (ver lote_pagamentos.py) e devolve
+    o resultado de cada pagamento, na ordem enviada.
+    """
+    try:
+        corpo = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'erro': 'JSON inválido'}, status=400)
+    entradas = corpo.get('pagamentos') if isinstance(corpo, dict) else None
+    if not isinstance(entradas, list):
+        return JsonResponse({'erro': 'esperado {"pagamentos": [...]}'}, status=400)
+    maximo = settings.CREDIARIO_LOTE_PAGAMENTOS_MAX
+    if len(entradas) > maximo:
+        return JsonResponse({'erro': f'no máximo {maximo} pagamentos por lote'}, status=413)
+
+    resultados = registrar_lote(entradas)
+    aceitos = sum(1 for r in resultados if r.status == ACEITO)
+    return JsonResponse({
+        'aceitos': aceitos,
+        'recusados': len(resultados) - aceitos,
+        'resultados': [r.como_dict() for r in resultados],
+    })
+
+# --- Exportação (contabilidade) ---
+@require_safe
+@somente_leitura()
+def exportar(request, tipo):
+    """
+    CSV de notas, itens ou pagamentos, em streaming. Filtros: ?cliente=,
+    ?status= (da nota), ?de= e ?ate= (AAAA-MM-DD).
+    """
+    if tipo not in TIPOS_EXPORTACAO:
+        raise Http404('Exportação inexistente')
+    cliente = request.GET.get('cliente', '')
+    linhas = linhas_csv(
+        tipo,
+        cliente=int(cliente) if cliente.isdigit() else None,
+        status=request.GET.get('status') or None,
+        de=_data_do_get(request, 'de'),
+        ate=_data_do_get(request, 'ate'),
+    )
+    response = StreamingHttpResponse(linhas, content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{tipo}.csv"'
+    return response
+
+# --- Métricas (Prometheus) ---
+@require_safe
+def metricas(request):
+    """
+    Agregados do MetricasMiddleware, para usuários staff ou com o token de
+    CREDIARIO_METRICAS_TOKEN (Authorization: Bearer). Sem token configurado
+    a página fica fechada para os demais (404), em vez de pública.
+    """
+    token = getattr(settings, 'CREDIARIO_METRICAS_TOKEN', '')
+    if not request.user.is_staff:
+        if not token:
+            raise Http404
+        if request.headers.get('Authorization') != f'Bearer {token}':
+            return HttpResponse(status=403)
+    return HttpResponse(registro_metricas.prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')